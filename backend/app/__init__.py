@@ -72,4 +72,24 @@ def create_app(config_name=None):
     from app.modules.rental.routes import rental_bp
     app.register_blueprint(rental_bp, url_prefix='/api/rental')
     
-    return app
\ No newline at end of file
+    # 注册截止时间处理函数
+    from app.modules.rental import deadlines as rental_deadlines  # noqa: F401
+    
+    return app
+
+
+def start_background_workers(app):
+    """按配置在当前进程内启动调度线程和比价线程池（仅由python run.py单进程开发服务器调用）
+
+    create_app不启动任何后台线程：gunicorn的每个worker、wsgi.py和所有flask CLI命令都会调用create_app，
+    生产环境应单独运行flask run-deadlines和flask run-compare-workers。
+    """
+    if app.config.get('DEADLINE_SCHEDULER_ENABLED') and 'deadline_scheduler' not in app.extensions:
+        from app.utils.deadlines import DeadlineScheduler
+        app.extensions['deadline_scheduler'] = DeadlineScheduler(app)
+        app.extensions['deadline_scheduler'].start()
+    
+    if app.config.get('COMPARE_WORKER_ENABLED') and 'compare_workers' not in app.extensions:
+        from app.modules.compare.worker import CompareWorkerPool
+        app.extensions['compare_workers'] = CompareWorkerPool(app)
+        app.extensions['compare_workers'].start()
\ No newline at end of file
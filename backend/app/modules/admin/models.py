@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.dialects import mysql
 from app import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
@@ -36,12 +37,19 @@ class AdminUser(db.Model, UserMixin):
 class ItemReview(db.Model):
     """商品审核模型"""
     __tablename__ = 'item_reviews'
+    __table_args__ = (
+        db.Index('ix_item_reviews_queue', 'status', 'priority', 'created_at'),  # 待审核队列：高风险优先
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
     admin_id = db.Column(db.Integer, db.ForeignKey('admin_users.id'))
     status = db.Column(db.String(20), nullable=False, default='pending')  # pending, approved, rejected
     comment = db.Column(db.Text)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # 审核优先级，命中敏感词的商品更高
+    match_reasons = db.Column(db.JSON)  # 自动预审命中的关键词：[{field, keyword, category}]
+    auto_reviewed = db.Column(db.Boolean, nullable=False, default=False)  # 是否由自动预审直接通过
+    manual_required = db.Column(db.Boolean, nullable=False, default=False)  # 曾被驳回，之后的修改都需人工审核
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     reviewed_at = db.Column(db.DateTime)
     
@@ -56,11 +64,15 @@ class ItemReview(db.Model):
             'admin_id': self.admin_id,
             'status': self.status,
             'comment': self.comment,
+            'priority': self.priority,
+            'match_reasons': self.match_reasons or [],
+            'auto_reviewed': self.auto_reviewed,
+            'manual_required': self.manual_required,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'reviewed_at': self.reviewed_at.isoformat() if self.reviewed_at else None,
             'item': {
                 'id': self.item.id,
-                'title': self.item.title,
+                'title': self.item.name,
                 'user_id': self.item.user_id
             } if self.item else None
         }
@@ -171,7 +183,7 @@ class SystemConfig(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(100), unique=True, nullable=False)
-    value = db.Column(db.Text, nullable=False)
+    value = db.Column(db.Text().with_variant(mysql.LONGTEXT(), 'mysql'), nullable=False)  # 商品预审词表也存于此，MySQL的TEXT最多64KB
     description = db.Column(db.Text)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -182,4 +194,43 @@ class SystemConfig(db.Model):
             'value': self.value,
             'description': self.description,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+
+class IdempotencyRecord(db.Model):
+    """幂等键记录：保存请求指纹和首次执行的响应，用于重试时直接回放"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='_user_idempotency_key_uc'),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # 请求方法、路径和请求体的SHA256
+    status = db.Column(db.String(20), nullable=False, default='processing')  # processing(处理中), completed(已完成)
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class Deadline(db.Model):
+    """业务截止时间：到期后由调度器调用对应类型的处理函数"""
+    __tablename__ = 'deadlines'
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'target_id', name='_kind_target_uc'),
+        db.Index('ix_deadlines_status_due_at', 'status', 'due_at'),  # 加载即将到期的截止时间
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # 截止时间类型，如rental_payment_timeout
+    target_id = db.Column(db.Integer, nullable=False)  # 关联的业务记录ID
+    due_at = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending(待触发), fired(已触发), canceled(已取消)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # 处理失败的次数
+    last_error = db.Column(db.String(255))
+    fired_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
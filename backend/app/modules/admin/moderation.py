@@ -0,0 +1,285 @@
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.modules.admin.models import ItemReview, SystemLog, SystemConfig
+from app.modules.item.models import Item
+from app.utils.aho_corasick import AhoCorasick
+
+
+# 单次批量审核的最大条数
+MAX_BULK_REVIEWS = 500
+
+# 预审敏感词表保存在系统配置中，每行一个关键词，可用“关键词|类别”注明命中原因；
+# 白名单中的词组包含的敏感词不算命中（例如敏感词“枪”、白名单“水枪”）
+BLOCKLIST_KEY = 'moderation_blocklist'
+ALLOWLIST_KEY = 'moderation_allowlist'
+KEYWORD_KEYS = (BLOCKLIST_KEY, ALLOWLIST_KEY)
+
+# 词表版本号，管理员修改词表时更新，各进程据此判断是否需要重建自动机
+KEYWORDS_VERSION_KEY = 'moderation_keywords_version'
+
+# 命中敏感词的审核记录优先级
+RISKY_PRIORITY = 10
+
+# 预审检查的商品字段
+SCANNED_FIELDS = ('name', 'description')
+
+WHITESPACE = re.compile(r'\s+')
+
+# 审核结果对应的商品状态
+ITEM_STATUS = {'approved': 'active', 'rejected': 'rejected'}
+
+
+class ReviewConflict(Exception):
+    """审核记录在批量审核期间被其他管理员修改"""
+
+
+def bulk_review(admin_id, decisions, default_comment=None, ip_address=None, now=None):
+    """批量审核商品，返回每条审核记录的结果列表（由本函数提交）
+
+    decisions为[{'id', 'status', 'comment'}]。先锁定涉及的审核记录，
+    再按(审核结果, 备注)分组用集合UPDATE更新审核记录和商品状态，日志一次批量写入。
+    每条结果的outcome为approved、rejected、not_found、already_reviewed、invalid或duplicate。
+    """
+    now = now or datetime.utcnow()
+    outcomes = {}
+    order = []
+    valid = {}
+
+    for decision in decisions:
+        review_id = decision.get('id') if isinstance(decision, dict) else None
+        if not isinstance(review_id, int) or isinstance(review_id, bool):
+            order.append((None, {'id': review_id, 'outcome': 'invalid', 'message': '无效的审核记录ID'}))
+            continue
+        if review_id in valid or review_id in outcomes:
+            order.append((None, {'id': review_id, 'outcome': 'duplicate', 'message': '重复的审核记录'}))
+            continue
+        status = decision.get('status')
+        if status not in ITEM_STATUS:
+            outcomes[review_id] = {'id': review_id, 'outcome': 'invalid', 'message': '无效的审核结果'}
+        else:
+            valid[review_id] = (status, decision.get('comment', default_comment))
+        order.append((review_id, None))
+
+    if valid:
+        rows = db.session.query(ItemReview.id, ItemReview.item_id, ItemReview.status).filter(
+            ItemReview.id.in_(list(valid))
+        ).with_for_update().all()
+        found = {row.id: row for row in rows}
+
+        groups = {}
+        for review_id, decision in valid.items():
+            row = found.get(review_id)
+            if row is None:
+                outcomes[review_id] = {'id': review_id, 'outcome': 'not_found', 'message': '审核记录不存在'}
+            elif row.status != 'pending':
+                outcomes[review_id] = {'id': review_id, 'outcome': 'already_reviewed', 'message': '商品已审核'}
+            else:
+                groups.setdefault(decision, []).append(row)
+
+        logs = []
+        for (status, comment), group in groups.items():
+            review_ids = [row.id for row in group]
+            updated = ItemReview.query.filter(
+                ItemReview.id.in_(review_ids),
+                ItemReview.status == 'pending'
+            ).update({
+                'status': status,
+                'admin_id': admin_id,
+                'comment': comment,
+                'reviewed_at': now
+            }, synchronize_session=False)
+            if updated != len(review_ids):
+                db.session.rollback()
+                raise ReviewConflict()
+
+            Item.query.filter(Item.id.in_([row.item_id for row in group])).update(
+                {'status': ITEM_STATUS[status], 'reviewed_at': now}, synchronize_session=False
+            )
+            for row in group:
+                outcomes[row.id] = {'id': row.id, 'item_id': row.item_id, 'outcome': status}
+                logs.append({
+                    'log_type': 'admin_action',
+                    'admin_id': admin_id,
+                    'action': 'review_item',
+                    'details': f'商品ID {row.item_id} 审核结果: {status}（批量）',
+                    'ip_address': ip_address,
+                    'created_at': now
+                })
+
+        if logs:
+            db.session.bulk_insert_mappings(SystemLog, logs)
+        db.session.commit()
+
+    return [outcomes[review_id] if review_id is not None else result for review_id, result in order]
+
+
+class _Keywords:
+    """一次构建的敏感词自动机"""
+
+    def __init__(self, version, automaton, blocked, allowed):
+        self.version = version
+        self.automaton = automaton
+        self.blocked = blocked
+        self.allowed = allowed
+        self.checked_at = time.monotonic()
+
+
+_keywords = None
+_keywords_lock = threading.Lock()
+
+
+def normalize(text):
+    """统一全角半角和大小写并去掉空白，避免用空格、全角字符绕过关键词"""
+    return WHITESPACE.sub('', unicodedata.normalize('NFKC', text or '').casefold())
+
+
+def parse_keywords(value):
+    """解析词表配置，返回{规范化后的关键词: (原关键词, 类别)}"""
+    keywords = {}
+    for line in (value or '').splitlines():
+        keyword, _, category = line.partition('|')
+        keyword = keyword.strip()
+        normalized = normalize(keyword)
+        if normalized:
+            keywords[normalized] = (keyword, category.strip() or None)
+    return keywords
+
+
+def scan(text):
+    """返回文本命中的敏感词[(关键词, 类别)]，去掉被白名单词组覆盖的命中，匹配时间与文本长度成正比"""
+    keywords = _current_keywords()
+    if not keywords.blocked:
+        return []
+
+    allowed_spans = []
+    blocked = []
+    for start, end, (kind, keyword, category) in keywords.automaton.iter(normalize(text)):
+        if kind == 'allow':
+            allowed_spans.append((start, end))
+        else:
+            blocked.append((start, end, keyword, category))
+
+    hits = []
+    for start, end, keyword, category in blocked:
+        if any(allow_start <= start and end <= allow_end for allow_start, allow_end in allowed_spans):
+            continue
+        if (keyword, category) not in hits:
+            hits.append((keyword, category))
+    return hits
+
+
+def prefilter(item, now=None):
+    """发布、编辑或重新上架商品后自动预审（由调用方提交），返回审核记录
+
+    未命中敏感词的商品直接通过并上架；命中的商品进入待审核队列并提高优先级，命中原因记录在审核记录中。
+    敏感词表为空或关闭MODERATION_AUTO_APPROVE时，所有商品按原流程等待人工审核。
+    曾被驳回的商品之后每次修改都进入人工审核；卖家已下架或已交易的商品保持原状态，只更新命中原因。
+    """
+    now = now or datetime.utcnow()
+    reasons = []
+    for field in SCANNED_FIELDS:
+        for keyword, category in scan(getattr(item, field)):
+            reasons.append({'field': field, 'keyword': keyword, 'category': category})
+
+    review = item.review
+    if item.status in ('removed', 'sold', 'rented'):
+        if review is not None:
+            review.match_reasons = reasons
+            review.priority = RISKY_PRIORITY if reasons else 0
+        return review
+
+    if review is None:
+        review = ItemReview(item_id=item.id)
+        db.session.add(review)
+    if review.status == 'rejected' or item.status == 'rejected':
+        review.manual_required = True
+
+    auto_approve = (
+        not reasons
+        and not review.manual_required
+        and current_app.config.get('MODERATION_AUTO_APPROVE', True)
+        and _current_keywords().blocked > 0
+    )
+
+    review.created_at = now
+    review.admin_id = None
+    review.match_reasons = reasons
+    review.priority = RISKY_PRIORITY if reasons else 0
+    review.auto_reviewed = auto_approve
+    if auto_approve:
+        review.status = 'approved'
+        review.comment = '自动预审通过：未命中敏感词'
+        review.reviewed_at = now
+        item.status = 'active'
+        item.reviewed_at = now
+        db.session.add(SystemLog(
+            log_type='system_event',
+            action='auto_review_item',
+            details=f'商品ID {item.id} 自动预审通过',
+            created_at=now
+        ))
+    else:
+        review.status = 'pending'
+        review.comment = None
+        review.reviewed_at = None
+        item.status = 'pending'
+    return review
+
+
+def invalidate_keywords():
+    """标记词表已变更：写入新版本号（随调用方的事务提交），并丢弃本进程的自动机
+
+    其他进程最多在MODERATION_KEYWORDS_CHECK_SECONDS秒后发现版本号变化并重新构建。
+    """
+    global _keywords
+    version = uuid.uuid4().hex
+    updated = SystemConfig.query.filter_by(key=KEYWORDS_VERSION_KEY).update(
+        {'value': version}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(SystemConfig(key=KEYWORDS_VERSION_KEY, value=version, description='商品预审词表版本号'))
+    _keywords = None
+
+
+def _current_keywords():
+    """返回当前有效的自动机；超过检查间隔时读取一次版本号，版本变化才重新构建"""
+    global _keywords
+    keywords = _keywords
+    interval = current_app.config.get('MODERATION_KEYWORDS_CHECK_SECONDS', 5)
+    if keywords is not None and time.monotonic() - keywords.checked_at < interval:
+        return keywords
+
+    with _keywords_lock:
+        keywords = _keywords
+        if keywords is not None and time.monotonic() - keywords.checked_at < interval:
+            return keywords
+
+        version = db.session.query(SystemConfig.value).filter_by(key=KEYWORDS_VERSION_KEY).scalar()
+        if keywords is not None and keywords.version == version:
+            keywords.checked_at = time.monotonic()
+            return keywords
+
+        _keywords = _build_keywords(version)
+        return _keywords
+
+
+def _build_keywords(version):
+    """读取黑白名单并构建一个自动机，白名单与敏感词相同时以白名单为准"""
+    values = dict(db.session.query(SystemConfig.key, SystemConfig.value).filter(SystemConfig.key.in_(KEYWORD_KEYS)))
+    blocked = parse_keywords(values.get(BLOCKLIST_KEY))
+    allowed = parse_keywords(values.get(ALLOWLIST_KEY))
+
+    patterns = {normalized: ('block', keyword, category) for normalized, (keyword, category) in blocked.items()}
+    patterns.update(
+        (normalized, ('allow', keyword, category)) for normalized, (keyword, category) in allowed.items()
+    )
+    automaton = AhoCorasick(patterns)
+    blocked_count = sum(1 for kind, _, _ in patterns.values() if kind == 'block')
+    current_app.logger.info(f'商品预审词表已加载: 敏感词 {blocked_count} 个, 白名单 {len(allowed)} 个')
+    return _Keywords(version, automaton, blocked_count, len(allowed))
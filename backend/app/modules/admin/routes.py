@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, create_access_token, get_jwt_identity
 from datetime import datetime, timedelta
 from app import db
@@ -9,6 +9,11 @@ from app.modules.admin.models import (
 from app.modules.item.models import ItemCategory
 from app.modules.item.models import Item
 from app.modules.transaction.models import Transaction
+from app.modules.transaction.export import EXPORT_FORMATS, build_export_query, export_response
+from app.modules.rental import analytics as rental_analytics
+from app.modules.compare import worker as compare_worker
+from app.modules.admin import moderation
+from app.utils import reference_data
 from app.modules.user.models import User
 import functools
 
@@ -129,8 +134,8 @@ def get_item_reviews():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    # 构建查询
-    query = ItemReview.query.filter_by(status=status).order_by(ItemReview.created_at.desc())
+    # 构建查询：命中敏感词的高优先级记录排在前面
+    query = ItemReview.query.filter_by(status=status).order_by(ItemReview.priority.desc(), ItemReview.created_at.desc())
     
     # 分页
     pagination = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -142,18 +147,20 @@ def get_item_reviews():
         review_dict = review.to_dict()
         # 添加商品详细信息
         if review.item:
+            campus = reference_data.campus(review.item.user.campus_id)
+            school = reference_data.school(campus.school_id) if campus else None
             review_dict['item_details'] = {
                 'id': review.item.id,
-                'title': review.item.title,
+                'title': review.item.name,
                 'description': review.item.description,
                 'price': review.item.price,
-                'images': [img.url for img in review.item.images],
+                'images': [img.url for img in review.item.item_images],
                 'user_info': {
                     'id': review.item.user.id,
                     'username': review.item.user.username,
-                    'school': review.item.user.school.name if review.item.user.school else None,
-                    'campus': review.item.user.campus.name if review.item.user.campus else None,
-                    'major': review.item.user.major.name if review.item.user.major else None
+                    'school': school.name if school else None,
+                    'campus': campus.name if campus else None,
+                    'major': reference_data.major_name(review.item.user.major_id)
                 }
             }
         result.append(review_dict)
@@ -214,6 +221,40 @@ def review_item(review_id):
     return jsonify({'message': message}), 200
 
 
+@admin_bp.route('/item_reviews/bulk', methods=['POST'])
+@admin_required()
+def bulk_review_items():
+    """批量审核商品
+    
+    请求体：{"reviews": [{"id": 审核记录ID, "status": "approved"|"rejected", "comment": 可选}], "comment": 默认备注}
+    返回每条审核记录的处理结果，无效或已审核的记录不影响其他记录。
+    """
+    admin_id = get_jwt_identity()
+    data = request.get_json() or {}
+    decisions = data.get('reviews')
+    
+    if not isinstance(decisions, list) or not decisions:
+        return jsonify({'message': 'reviews必须是非空列表'}), 400
+    if len(decisions) > moderation.MAX_BULK_REVIEWS:
+        return jsonify({'message': f'单次最多审核{moderation.MAX_BULK_REVIEWS}条'}), 400
+    
+    try:
+        results = moderation.bulk_review(admin_id, decisions, data.get('comment'), request.remote_addr)
+    except moderation.ReviewConflict:
+        return jsonify({'message': '部分审核记录已被其他管理员处理，请刷新后重试'}), 409
+    
+    summary = {}
+    for result in results:
+        summary[result['outcome']] = summary.get(result['outcome'], 0) + 1
+    reviewed = summary.get('approved', 0) + summary.get('rejected', 0)
+    
+    return jsonify({
+        'message': f'已审核{reviewed}条',
+        'summary': summary,
+        'results': results
+    }), 200
+
+
 @admin_bp.route('/complaints', methods=['GET'])
 @admin_required()
 def get_complaints():
@@ -347,6 +388,86 @@ def get_user_detail(user_id):
     return jsonify(user.to_dict()), 200
 
 
+@admin_bp.route('/transactions/export', methods=['GET'])
+@admin_required()
+def export_transactions():
+    """导出交易记录（format=csv或jsonl），支持按状态、用户和时间范围筛选"""
+    status = request.args.get('status')
+    transaction_type = request.args.get('transaction_type')
+    user_id = request.args.get('user_id', type=int)
+    start_time = request.args.get('start_time')
+    end_time = request.args.get('end_time')
+    export_format = request.args.get('format', 'csv')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': '不支持的导出格式'}), 400
+    
+    filters = []
+    
+    # 按状态筛选
+    if status:
+        filters.append(Transaction.status == status)
+    
+    # 按交易类型筛选
+    if transaction_type:
+        filters.append(Transaction.transaction_type == transaction_type)
+    
+    # 按买家或卖家筛选
+    if user_id:
+        filters.append((Transaction.buyer_id == user_id) | (Transaction.seller_id == user_id))
+    
+    # 按时间范围筛选
+    try:
+        if start_time:
+            filters.append(Transaction.created_at >= datetime.fromisoformat(start_time))
+        if end_time:
+            filters.append(Transaction.created_at <= datetime.fromisoformat(end_time))
+    except ValueError:
+        return jsonify({'message': '时间格式不正确'}), 400
+    
+    # 记录日志
+    log = SystemLog(
+        log_type='admin_action',
+        admin_id=get_jwt_identity(),
+        action='export_transactions',
+        details=f'导出交易记录: {request.query_string.decode()}',
+        ip_address=request.remote_addr
+    )
+    db.session.add(log)
+    db.session.commit()
+    
+    return export_response(build_export_query(*filters), export_format, 'transactions')
+
+
+@admin_bp.route('/rental/analytics', methods=['GET'])
+@admin_required()
+def get_rental_analytics():
+    """获取全站租赁商品的月度出租率和分类季节性，可按出租方或商品筛选"""
+    months = request.args.get('months', 12, type=int)
+    owner_id = request.args.get('owner_id', type=int)
+    item_id = request.args.get('item_id', type=int)
+    
+    if months < 1 or months > 24:
+        return jsonify({'message': '月数须在1-24之间'}), 400
+    
+    return jsonify({
+        'months': months,
+        'items': rental_analytics.get_item_utilization(months, owner_id=owner_id, item_id=item_id),
+        'categories': rental_analytics.get_category_seasonality(months)
+    }), 200
+
+
+@admin_bp.route('/compare/queue', methods=['GET'])
+@admin_required()
+def get_compare_queue():
+    """获取比价任务队列深度，以及本进程比价线程池的处理统计"""
+    pool = current_app.extensions.get('compare_workers')
+    return jsonify({
+        'queue': compare_worker.queue_stats(),
+        'workers': pool.snapshot() if pool else None
+    }), 200
+
+
 @admin_bp.route('/schools', methods=['GET'])
 @admin_required()
 def get_schools():
@@ -402,6 +523,7 @@ def create_school():
     )
     
     db.session.add(school)
+    reference_data.invalidate()
     db.session.commit()
     
     # 记录日志
@@ -468,6 +590,7 @@ def create_campus():
     )
     
     db.session.add(campus)
+    reference_data.invalidate()
     db.session.commit()
     
     # 记录日志
@@ -533,6 +656,7 @@ def create_major():
     )
     
     db.session.add(major)
+    reference_data.invalidate()
     db.session.commit()
     
     # 记录日志
@@ -553,6 +677,52 @@ def create_major():
     }), 201
 
 
+@admin_bp.route('/categories', methods=['POST'])
+@admin_required()
+def create_category():
+    """添加商品分类"""
+    data = request.get_json()
+    
+    # 检查分类是否已存在
+    if ItemCategory.query.filter_by(name=data['name']).first():
+        return jsonify({'message': '分类已存在'}), 400
+    
+    parent_id = data.get('parent_id')
+    if parent_id and not reference_data.category(parent_id):
+        return jsonify({'message': '上级分类不存在'}), 400
+    
+    # 创建分类
+    category = ItemCategory(
+        name=data['name'],
+        parent_id=parent_id
+    )
+    
+    db.session.add(category)
+    reference_data.invalidate()
+    db.session.commit()
+    
+    # 记录日志
+    admin_id = get_jwt_identity()
+    log = SystemLog(
+        log_type='admin_action',
+        admin_id=admin_id,
+        action='create_category',
+        details=f'添加商品分类: {category.name} (上级分类ID: {category.parent_id})',
+        ip_address=request.remote_addr
+    )
+    db.session.add(log)
+    db.session.commit()
+    
+    return jsonify({
+        'message': '分类添加成功',
+        'category': {
+            'id': category.id,
+            'name': category.name,
+            'parent_id': category.parent_id
+        }
+    }), 201
+
+
 @admin_bp.route('/system_logs', methods=['GET'])
 @admin_required(role='super_admin')
 def get_system_logs():
@@ -641,6 +811,10 @@ def update_system_config(key):
         if 'description' in data:
             config.description = data['description']
     
+    # 敏感词表变更后，各进程重新构建预审自动机
+    if key in moderation.KEYWORD_KEYS:
+        moderation.invalidate_keywords()
+    
     db.session.commit()
     
     # 记录日志
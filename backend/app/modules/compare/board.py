@@ -0,0 +1,175 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from flask import current_app
+from app import db
+from app.modules.compare.models import CompareTask, CompareTaskLike, CompareBoardEntry
+from app.modules.item.models import Item
+from app.modules.user.models import User
+
+
+# 比价结果没有商品图片时使用的占位图片
+PLACEHOLDER_IMAGE = '/assets/images/product_placeholder.jpg'
+
+# 加载榜单时多取的倍数，同一商品去重后仍能填满榜单
+DEDUP_FACTOR = 3
+
+_board = {'entries': None, 'loaded_at': 0}
+_lock = threading.Lock()
+
+
+def record(task_ids, results, now=None):
+    """为刚完成的任务生成榜单条目（由调用方提交），同一批任务共享同一份比价结果"""
+    if not task_ids:
+        return
+    now = now or datetime.utcnow()
+    tasks = db.session.query(
+        CompareTask.id, CompareTask.item_id, CompareTask.url_hash, CompareTask.like_count, User.username
+    ).outerjoin(User, User.id == CompareTask.user_id).filter(CompareTask.id.in_(task_ids)).all()
+    item_ids = {task.item_id for task in tasks if task.item_id}
+    item_names = dict(db.session.query(Item.id, Item.name).filter(Item.id.in_(item_ids))) if item_ids else {}
+
+    products = [{
+        'name': result['platform'] + '商品',
+        'platform': result['platform'],
+        'price': result['price'],
+        'image': PLACEHOLDER_IMAGE
+    } for result in results]
+    best = min(results, key=lambda result: result['price']) if results else None
+
+    db.session.bulk_insert_mappings(CompareBoardEntry, [{
+        'task_id': task.id,
+        'url_hash': task.url_hash,
+        'title': item_names.get(task.item_id) or f'商品比价任务 #{task.id}',
+        'creator_name': task.username or '匿名用户',
+        'products': products,
+        'best_price': best['price'] if best else None,
+        'best_platform': best['platform'] if best else None,
+        'like_count': task.like_count,
+        'completed_at': now
+    } for task in tasks])
+
+
+def like(task_id, user_id):
+    """点赞（由调用方提交），已点过赞时返回False"""
+    try:
+        with db.session.begin_nested():
+            db.session.add(CompareTaskLike(task_id=task_id, user_id=user_id))
+    except IntegrityError:
+        return False
+    _add_likes(task_id, 1)
+    return True
+
+
+def unlike(task_id, user_id):
+    """取消点赞（由调用方提交），没有点过赞时返回False"""
+    if not CompareTaskLike.query.filter_by(task_id=task_id, user_id=user_id).delete(synchronize_session=False):
+        return False
+    _add_likes(task_id, -1)
+    return True
+
+
+def hot(limit=4):
+    """热门比价榜：最近COMPARE_HOT_BOARD_DAYS天完成的任务按点赞数、完成时间排序，同一商品只保留一条
+
+    榜单缓存在进程内，超过COMPARE_HOT_BOARD_TTL_SECONDS或本进程有任务完成时重新加载；
+    本进程的点赞直接更新缓存。
+    """
+    size = current_app.config.get('COMPARE_HOT_BOARD_SIZE', 20)
+    ttl = current_app.config.get('COMPARE_HOT_BOARD_TTL_SECONDS', 60)
+    limit = min(limit, size)
+
+    with _lock:
+        if _board['entries'] is not None and time.monotonic() - _board['loaded_at'] < ttl:
+            return _board['entries'][:limit]
+
+    entries = _load(size)
+    with _lock:
+        _board['entries'] = entries
+        _board['loaded_at'] = time.monotonic()
+    return entries[:limit]
+
+
+def apply_like(task_id, delta):
+    """点赞提交后更新缓存中的点赞数并重新排序"""
+    with _lock:
+        entries = _board['entries']
+        if entries is None:
+            return
+        for entry in entries:
+            if entry['id'] == task_id:
+                entry['likes'] += delta
+                entries.sort(key=lambda entry: (entry['likes'], entry['completed_at']), reverse=True)
+                return
+
+
+def invalidate():
+    """有任务完成后使缓存失效（在事务提交之后调用）"""
+    with _lock:
+        _board['entries'] = None
+
+
+def purge(now=None):
+    """删除超出统计窗口的榜单条目，返回删除数量"""
+    now = now or datetime.utcnow()
+    count = CompareBoardEntry.query.filter(CompareBoardEntry.completed_at < now - _window()).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    return count
+
+
+def rebuild(now=None):
+    """根据点赞记录和统计窗口内已完成的任务全量重建点赞数和榜单条目，返回条目数"""
+    now = now or datetime.utcnow()
+    counts = dict(db.session.query(CompareTaskLike.task_id, func.count(CompareTaskLike.id)).group_by(
+        CompareTaskLike.task_id
+    ).all())
+    CompareTask.query.filter(CompareTask.like_count != 0).update({'like_count': 0}, synchronize_session=False)
+    for task_id, count in counts.items():
+        CompareTask.query.filter_by(id=task_id).update({'like_count': count}, synchronize_session=False)
+
+    CompareBoardEntry.query.delete(synchronize_session=False)
+    tasks = CompareTask.query.filter(
+        CompareTask.status == 'completed',
+        CompareTask.completed_at >= now - _window()
+    ).all()
+    for task in tasks:
+        record([task.id], (task.result or {}).get('prices') or [], task.completed_at)
+    db.session.commit()
+    invalidate()
+    return len(tasks)
+
+
+def _add_likes(task_id, delta):
+    CompareTask.query.filter_by(id=task_id).update(
+        {'like_count': CompareTask.like_count + delta}, synchronize_session=False
+    )
+    CompareBoardEntry.query.filter_by(task_id=task_id).update(
+        {'like_count': CompareBoardEntry.like_count + delta}, synchronize_session=False
+    )
+
+
+def _load(size):
+    rows = CompareBoardEntry.query.filter(
+        CompareBoardEntry.completed_at >= datetime.utcnow() - _window()
+    ).order_by(
+        CompareBoardEntry.like_count.desc(), CompareBoardEntry.completed_at.desc()
+    ).limit(size * DEDUP_FACTOR).all()
+
+    entries = []
+    seen = set()
+    for row in rows:
+        if row.url_hash and row.url_hash in seen:
+            continue
+        seen.add(row.url_hash)
+        entries.append(row.to_dict())
+        if len(entries) >= size:
+            break
+    return entries
+
+
+def _window():
+    return timedelta(days=current_app.config.get('COMPARE_HOT_BOARD_DAYS', 7))
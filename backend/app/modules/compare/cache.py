@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from flask import current_app
+from app import db
+from app.modules.compare.models import CrawlCache
+
+
+def get(url_hash, now=None):
+    """返回未过期的缓存抓取结果并累计命中次数（随调用方的事务提交），未命中时返回None"""
+    now = now or datetime.utcnow()
+    entry = db.session.query(CrawlCache.id, CrawlCache.results).filter(
+        CrawlCache.url_hash == url_hash,
+        CrawlCache.expires_at > now
+    ).first()
+    if entry is None:
+        return None
+    CrawlCache.query.filter_by(id=entry.id).update({'hits': CrawlCache.hits + 1}, synchronize_session=False)
+    return entry.results
+
+
+def store(url_hash, canonical_url, results, now=None):
+    """保存抓取结果，有效期COMPARE_CACHE_TTL_SECONDS秒（由调用方提交）"""
+    now = now or datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config.get('COMPARE_CACHE_TTL_SECONDS', 3600))
+    values = {'results': results, 'fetched_at': now, 'expires_at': expires_at}
+
+    if CrawlCache.query.filter_by(url_hash=url_hash).update(values, synchronize_session=False):
+        return
+
+    # 首次缓存该链接，在保存点内插入，并发插入冲突时改为更新
+    try:
+        with db.session.begin_nested():
+            db.session.add(CrawlCache(url_hash=url_hash, canonical_url=canonical_url, hits=0, **values))
+    except IntegrityError:
+        CrawlCache.query.filter_by(url_hash=url_hash).update(values, synchronize_session=False)
+
+
+def purge_expired(now=None):
+    """删除过期的缓存记录，返回删除数量"""
+    now = now or datetime.utcnow()
+    count = CrawlCache.query.filter(CrawlCache.expires_at <= now).delete(synchronize_session=False)
+    db.session.commit()
+    return count
@@ -0,0 +1,60 @@
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+# 各平台常见的跟踪参数，不影响商品本身，规范化时去掉
+TRACKING_PARAMS = {
+    'spm', 'scm', 'pvid', 'abbucket', 'ali_refid', 'ali_trackid', 'ns', 'share_crt_v',
+    'sharetype', 'shareurl', 'short_name', 'sourcetype', 'sp_tk', 'suid', 'tbsocialpopkey', 'tk', 'un', 'ut_sk',
+    'wh_weex', 'xId', 'from', 'source', 'share_token', 'refer_page_name', 'refer_page_id', 'refer_page_sn',
+    '_wvx', '_wv', 'page_from', 'thumb_url', 'share_uin', 'jd_pop', 'cu', 'fbclid', 'gclid'
+}
+
+JD_ITEM_PATTERN = re.compile(r'/(?:product/)?(\d+)\.html')
+
+
+def canonicalize(url):
+    """把商品链接规范化：统一协议和域名，按平台只保留标识商品的部分，去掉跟踪参数
+
+    同一商品不同来源（App分享、手机版、带推广参数）的链接得到相同结果。
+    无法识别的链接按通用规则处理：去掉跟踪参数和锚点，剩余参数排序。
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    params = dict(parse_qsl(parts.query, keep_blank_values=False))
+
+    # 京东：item.jd.com/123.html、item.m.jd.com/product/123.html
+    if host == 'jd.com' or host.endswith('.jd.com'):
+        match = JD_ITEM_PATTERN.search(parts.path)
+        if match:
+            return f'https://item.jd.com/{match.group(1)}.html'
+
+    # 淘宝、天猫：商品由id参数标识
+    if host.endswith('taobao.com') or host.endswith('tmall.com'):
+        item_id = params.get('id')
+        if item_id and item_id.isdigit():
+            domain = 'detail.tmall.com' if host.endswith('tmall.com') else 'item.taobao.com'
+            return f'https://{domain}/item.htm?id={item_id}'
+
+    # 拼多多：商品由goods_id参数标识
+    if host.endswith('yangkeduo.com') or host.endswith('pinduoduo.com'):
+        goods_id = params.get('goods_id')
+        if goods_id and goods_id.isdigit():
+            return f'https://mobile.yangkeduo.com/goods.html?goods_id={goods_id}'
+
+    query = urlencode(sorted(
+        (key, value) for key, value in params.items()
+        if key not in TRACKING_PARAMS and not key.startswith('utm_')
+    ))
+    netloc = host if parts.port in (None, 80, 443) else f'{host}:{parts.port}'
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), netloc, path, query, ''))
+
+
+def url_hash(canonical_url):
+    """规范化链接的摘要，用作缓存和任务合并的键"""
+    return hashlib.sha256(canonical_url.encode('utf-8')).hexdigest()
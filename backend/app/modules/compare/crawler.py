@@ -0,0 +1,53 @@
+from flask import current_app
+from app.modules.compare import extractors
+from app.modules.compare.fetcher import fetch_pages
+
+
+def crawl_product_prices(url):
+    """爬取单个商品链接的价格"""
+    results, _ = crawl_many([url])
+    return results[url]
+
+
+def crawl_many(urls, budget_seconds=None):
+    """批量爬取商品价格，返回({url: 比价结果列表}, {url: 错误信息})
+
+    每个链接由注册表中匹配的提取器处理（见extractors）：不需要页面的提取器直接返回价格；
+    其他链接交给异步抓取器一起并发抓取，由抓取器负责连接复用、按主机限速、robots协议和整批的时间预算。
+    抓取或提取失败的链接结果为空列表，失败原因（robots禁止、超时、HTTP状态码等）记录在错误信息中。
+    """
+    results = {url: [] for url in urls}
+    errors = {}
+    to_fetch = {}
+
+    for url in urls:
+        extractor = extractors.for_url(url)
+        if extractor.needs_page:
+            to_fetch[url] = extractor
+        else:
+            _extract(results, errors, url, extractor, None)
+
+    if to_fetch:
+        pages = fetch_pages(list(to_fetch), budget_seconds)
+        for url, extractor in to_fetch.items():
+            page = pages[url]
+            if page.error:
+                errors[url] = f'抓取失败: {page.error}'
+                current_app.logger.warning(f'比价抓取失败: {url} {page.error}')
+                continue
+            _extract(results, errors, url, extractor, page.text)
+
+    return results, errors
+
+
+def _extract(results, errors, url, extractor, html):
+    try:
+        price = extractor.extract(html, url)
+    except Exception as e:
+        errors[url] = f'价格提取失败({extractor.name}): {e}'
+        current_app.logger.exception(f'比价价格提取失败: {url} {extractor.name}')
+        return
+    if price:
+        results[url].append({'platform': extractor.platform, 'price': price, 'url': url})
+    else:
+        errors[url] = f'页面中未找到价格({extractor.name})'
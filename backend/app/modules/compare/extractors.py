@@ -0,0 +1,254 @@
+import json
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+
+# 价格数字，允许千分位逗号
+PRICE_NUMBER = re.compile(r'\d[\d,]*\.?\d*')
+
+# 结构化数据：JSON-LD脚本和带价格的meta标签
+JSON_LD_SCRIPT = re.compile(r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.I | re.S)
+META_PRICE = re.compile(
+    r'<meta[^>]+(?:property|itemprop|name)=["\'](?:product:price:amount|og:price:amount|price)["\'][^>]*>', re.I
+)
+META_CONTENT = re.compile(r'content=["\']([^"\']+)["\']', re.I)
+
+# 简单选择器：.class、#id、tag[attr*="value"]
+SELECTOR_PATTERN = re.compile(r'^(?:\.([\w-]+)|#([\w-]+)|(\w+)\[(\w+)\*="([^"]+)"\])$')
+
+# 没有结束标签的元素
+VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'source', 'track', 'wbr'
+))
+
+
+def to_fen(text):
+    """把价格文本转换为分，无法识别时返回None"""
+    try:
+        return round(float(str(text).replace(',', '')) * 100)
+    except ValueError:
+        return None
+
+
+def compile_selector(selector):
+    """把选择器编译为判断函数(tag, attrs) -> bool"""
+    match = SELECTOR_PATTERN.match(selector)
+    if not match:
+        raise ValueError(f'不支持的选择器: {selector}')
+    class_name, element_id, tag_name, attr, value = match.groups()
+    if class_name:
+        return lambda tag, attrs: class_name in (attrs.get('class') or '').split()
+    if element_id:
+        return lambda tag, attrs: attrs.get('id') == element_id
+    return lambda tag, attrs: tag == tag_name and value in (attrs.get(attr) or '')
+
+
+def extract_structured_price(html):
+    """从JSON-LD（schema.org Product/Offer）或meta标签中提取价格（分），没有结构化数据时返回None"""
+    for script in JSON_LD_SCRIPT.findall(html):
+        try:
+            price = _offer_price(json.loads(script))
+        except ValueError:
+            continue
+        if price is not None:
+            return price
+
+    for tag in META_PRICE.findall(html):
+        content = META_CONTENT.search(tag)
+        if content:
+            price = to_fen(content.group(1))
+            if price is not None:
+                return price
+    return None
+
+
+def _offer_price(data):
+    """在JSON-LD数据中查找Product的offers价格"""
+    if isinstance(data, list):
+        for entry in data:
+            price = _offer_price(entry)
+            if price is not None:
+                return price
+        return None
+    if not isinstance(data, dict):
+        return None
+    if '@graph' in data:
+        return _offer_price(data['@graph'])
+
+    types = data.get('@type')
+    types = types if isinstance(types, list) else [types]
+    if 'Product' in types:
+        return _offer_price(data.get('offers'))
+    if 'Offer' in types or 'AggregateOffer' in types:
+        price = data.get('price', data.get('lowPrice'))
+        return to_fen(price) if price is not None else None
+    return None
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _PriceScanner(HTMLParser):
+    """按文档顺序查找第一个匹配选择器且包含价格的元素，找到后立即停止解析"""
+
+    def __init__(self, matchers):
+        super().__init__(convert_charrefs=True)
+        self.matchers = matchers
+        self.depth = 0
+        self.text = []
+        self.price = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.depth:
+            if tag not in VOID_ELEMENTS:
+                self.depth += 1
+            return
+        if tag in VOID_ELEMENTS:
+            return
+        attrs = dict(attrs)
+        for matcher in self.matchers:
+            if matcher(tag, attrs):
+                self.depth = 1
+                self.text = []
+                return
+
+    def handle_endtag(self, tag):
+        if not self.depth:
+            return
+        self.depth -= 1
+        if not self.depth:
+            # 元素结束：价格可能位于文本末尾
+            self._take(''.join(self.text), final=True)
+            self.text = []
+
+    def handle_data(self, data):
+        if self.depth:
+            self.text.append(data)
+            self._take(''.join(self.text).rstrip(), final=False)
+
+    def _take(self, text, final):
+        match = PRICE_NUMBER.search(text)
+        # 数字后面还有内容（或元素已结束）时才能确定价格完整，例如<span>129<em>.00</em></span>
+        if match and (final or match.end() < len(text)):
+            self.price = to_fen(match.group())
+            raise _StopParsing()
+
+
+def scan_price(html, matchers):
+    """用匹配函数列表在页面中查找价格（分）"""
+    scanner = _PriceScanner(matchers)
+    try:
+        scanner.feed(html)
+        scanner.close()
+    except _StopParsing:
+        pass
+    return scanner.price
+
+
+class PriceExtractor:
+    """价格提取器基类
+
+    hosts为适用的域名（含子域名），为空表示通用提取器；
+    needs_page为False的提取器不需要抓取页面（平台示例提取器）。
+    页面提取依次尝试结构化数据（structured为True时）和selectors，选择器在创建时编译。
+    """
+    name = None
+    platform = None
+    hosts = ()
+    needs_page = True
+    structured = True
+    selectors = ()
+
+    def __init__(self):
+        self.matchers = [compile_selector(selector) for selector in self.selectors]
+
+    def matches(self, host):
+        return any(host == domain or host.endswith('.' + domain) for domain in self.hosts)
+
+    def extract(self, html, url):
+        """返回价格（分），无法提取时返回None"""
+        if self.structured:
+            price = extract_structured_price(html)
+            if price is not None:
+                return price
+        if self.matchers:
+            return scan_price(html, self.matchers)
+        return None
+
+
+_registry = []
+_generic = None
+
+
+def register(extractor_class):
+    """注册提取器（类装饰器），先注册的优先匹配；hosts为空的提取器作为通用提取器"""
+    global _generic
+    extractor = extractor_class()
+    if extractor.hosts:
+        _registry.append(extractor)
+    else:
+        _generic = extractor
+    return extractor_class
+
+
+def for_url(url):
+    """返回适用于链接的提取器，没有平台提取器时返回通用提取器"""
+    host = (urlsplit(url).hostname or '').lower()
+    for extractor in _registry:
+        if extractor.matches(host):
+            return extractor
+    return _generic
+
+
+def registered():
+    """所有已注册的提取器（平台提取器在前，通用提取器最后）"""
+    return _registry + ([_generic] if _generic else [])
+
+
+@register
+class JDExtractor(PriceExtractor):
+    """示例：京东（实际需要请求价格接口，这里返回模拟价格，避免实际网络请求）"""
+    name = 'jd'
+    platform = '京东'
+    hosts = ('jd.com',)
+    needs_page = False
+
+    def extract(self, html, url):
+        return 100  # 示例价格
+
+
+@register
+class TaobaoExtractor(PriceExtractor):
+    """示例：淘宝/天猫"""
+    name = 'taobao'
+    platform = '淘宝/天猫'
+    hosts = ('taobao.com', 'tmall.com')
+    needs_page = False
+
+    def extract(self, html, url):
+        return 105  # 示例价格
+
+
+@register
+class PinduoduoExtractor(PriceExtractor):
+    """示例：拼多多"""
+    name = 'pinduoduo'
+    platform = '拼多多'
+    hosts = ('pinduoduo.com', 'yangkeduo.com')
+    needs_page = False
+
+    def extract(self, html, url):
+        return 95  # 示例价格
+
+
+@register
+class GenericExtractor(PriceExtractor):
+    """通用提取器：结构化数据优先，其次按常见的价格元素选择器查找（可能不适用所有网站）"""
+    name = 'generic'
+    platform = '其他平台'
+    selectors = (
+        '.price', '.current-price', '.original-price', '#price',
+        'span[class*="price"]', 'div[class*="price"]'
+    )
@@ -0,0 +1,221 @@
+import asyncio
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import aiohttp
+from flask import current_app
+
+
+# 单个链接的抓取结果；error不为空表示抓取失败
+FetchResult = namedtuple('FetchResult', ['url', 'status', 'text', 'error', 'elapsed'])
+
+# robots.txt读取超时（秒）
+ROBOTS_TIMEOUT_SECONDS = 5
+
+# robots.txt缓存：站点 -> (解析器或None, 过期时间)，进程内所有线程共享
+_robots = {}
+_robots_lock = threading.Lock()
+
+# 每个主机下一次允许发起请求的时间，进程内所有线程共享，保证按主机限速
+_next_slot = {}
+_slot_lock = threading.Lock()
+
+# 每个工作线程持有自己的事件循环和连接池，批次之间复用长连接
+_local = threading.local()
+
+
+def _disallow_all():
+    parser = RobotFileParser()
+    parser.parse(['User-agent: *', 'Disallow: /'])
+    return parser
+
+
+def reserve_slot(host, interval):
+    """为主机预约下一个请求时间，返回需要等待的秒数"""
+    with _slot_lock:
+        now = time.monotonic()
+        start = max(now, _next_slot.get(host, 0))
+        _next_slot[host] = start + interval
+        return start - now
+
+
+class AsyncFetcher:
+    """基于asyncio的批量页面抓取器
+
+    - 共享的aiohttp连接池，保持长连接
+    - 每个主机的并发数上限和请求间隔（取配置与robots.txt Crawl-delay中的较大值）
+    - 按站点缓存robots.txt
+    - 整批请求共享一个总时间预算，超出预算的请求被取消
+    """
+
+    def __init__(self, user_agent, per_host_concurrency=2, per_host_rate=1.0, total_concurrency=20,
+                 timeout_seconds=10, robots_ttl_seconds=3600, respect_robots=True):
+        self.user_agent = user_agent
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self.total_concurrency = total_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.robots_ttl_seconds = robots_ttl_seconds
+        self.respect_robots = respect_robots
+        self._session = None
+        self._host_semaphores = {}
+        self._robots_loading = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            user_agent=config.get('COMPARE_FETCH_USER_AGENT', 'CampusTradeBot/1.0'),
+            per_host_concurrency=config.get('COMPARE_FETCH_PER_HOST_CONCURRENCY', 2),
+            per_host_rate=config.get('COMPARE_FETCH_PER_HOST_RATE', 1.0),
+            total_concurrency=config.get('COMPARE_FETCH_TOTAL_CONCURRENCY', 20),
+            timeout_seconds=config.get('COMPARE_FETCH_TIMEOUT_SECONDS', 10),
+            robots_ttl_seconds=config.get('COMPARE_ROBOTS_TTL_SECONDS', 3600),
+            respect_robots=config.get('COMPARE_RESPECT_ROBOTS', True)
+        )
+
+    async def open(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.total_concurrency,
+                limit_per_host=self.per_host_concurrency,
+                keepalive_timeout=30,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': self.user_agent},
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds)
+            )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    async def fetch_many(self, urls, budget_seconds):
+        """并发抓取一批链接，返回{url: FetchResult}；总耗时不超过budget_seconds"""
+        await self.open()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget_seconds
+        tasks = {url: asyncio.ensure_future(self.fetch(url, deadline)) for url in dict.fromkeys(urls)}
+        if not tasks:
+            return {}
+
+        _, pending = await asyncio.wait(tasks.values(), timeout=budget_seconds)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        return {
+            url: FetchResult(url, None, None, '超出抓取时间预算', budget_seconds) if task.cancelled() else task.result()
+            for url, task in tasks.items()
+        }
+
+    async def fetch(self, url, deadline):
+        """抓取单个链接，所有错误都转换为FetchResult.error"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        def failed(error):
+            return FetchResult(url, None, None, error, round(loop.time() - started, 3))
+
+        host = urlsplit(url).hostname
+        if not host:
+            return failed('链接格式不正确')
+
+        try:
+            interval = 1 / self.per_host_rate if self.per_host_rate else 0
+            if self.respect_robots:
+                parser = await self._robots(url)
+                if parser is not None:
+                    if not parser.can_fetch(self.user_agent, url):
+                        return failed('robots.txt禁止抓取')
+                    interval = max(interval, parser.crawl_delay(self.user_agent) or 0)
+
+            async with self._host_semaphore(host):
+                delay = reserve_slot(host, interval)
+                if loop.time() + delay >= deadline:
+                    return failed('超出抓取时间预算')
+                if delay:
+                    await asyncio.sleep(delay)
+
+                timeout = aiohttp.ClientTimeout(total=min(self.timeout_seconds, deadline - loop.time()))
+                async with self._session.get(url, timeout=timeout) as response:
+                    text = await response.text(errors='replace')
+                    error = f'HTTP {response.status}' if response.status >= 400 else None
+                    return FetchResult(url, response.status, text, error, round(loop.time() - started, 3))
+        except asyncio.TimeoutError:
+            return failed('请求超时')
+        except aiohttp.ClientError as e:
+            return failed(str(e) or e.__class__.__name__)
+
+    def _host_semaphore(self, host):
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._host_semaphores[host]
+
+    async def _robots(self, url):
+        """返回站点robots.txt的解析器，None表示不限制；同一站点并发请求只读取一次"""
+        parts = urlsplit(url)
+        origin = f'{parts.scheme}://{parts.netloc}'
+        with _robots_lock:
+            entry = _robots.get(origin)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        if origin not in self._robots_loading:
+            self._robots_loading[origin] = asyncio.ensure_future(self._load_robots(origin))
+        try:
+            parser = await asyncio.shield(self._robots_loading[origin])
+        finally:
+            if self._robots_loading.get(origin) is not None and self._robots_loading[origin].done():
+                self._robots_loading.pop(origin, None)
+
+        with _robots_lock:
+            _robots[origin] = (parser, time.monotonic() + self.robots_ttl_seconds)
+        return parser
+
+    async def _load_robots(self, origin):
+        """robots.txt不存在或无法访问时不限制；服务器错误时本周期内不抓取该站点"""
+        try:
+            timeout = aiohttp.ClientTimeout(total=ROBOTS_TIMEOUT_SECONDS)
+            async with self._session.get(origin + '/robots.txt', timeout=timeout) as response:
+                if response.status >= 500:
+                    return _disallow_all()
+                if response.status >= 400:
+                    return None
+                parser = RobotFileParser()
+                parser.parse((await response.text(errors='replace')).splitlines())
+                return parser
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+
+def fetch_pages(urls, budget_seconds=None):
+    """同步批量抓取接口，返回{url: FetchResult}
+
+    每个线程使用自己的事件循环和抓取器，多个批次之间复用连接池中的长连接。
+    """
+    if budget_seconds is None:
+        budget_seconds = current_app.config.get('COMPARE_FETCH_BUDGET_SECONDS', 30)
+
+    state = getattr(_local, 'state', None)
+    if state is None:
+        state = _local.state = (asyncio.new_event_loop(), AsyncFetcher.from_config(current_app.config))
+    loop, fetcher = state
+    return loop.run_until_complete(fetcher.fetch_many(urls, budget_seconds))
+
+
+def close_thread_fetcher():
+    """关闭当前线程的连接池和事件循环（工作线程退出时调用）"""
+    state = getattr(_local, 'state', None)
+    if state is None:
+        return
+    loop, fetcher = state
+    try:
+        loop.run_until_complete(fetcher.close())
+    finally:
+        loop.close()
+        _local.state = None
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from flask import current_app
+from app import db
+from app.modules.compare.models import PriceProduct, PricePoint
+
+
+# 精度从细到粗，每一级由上一级汇总而来
+RESOLUTIONS = ('raw', 'hour', 'day')
+
+BUCKET_SIZES = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+
+# 未指定精度时，按查询跨度选择：不超过2天用原始数据，不超过60天用小时数据，否则用天数据
+AUTO_RESOLUTION_SPANS = (('raw', timedelta(days=2)), ('hour', timedelta(days=60)))
+
+
+def record(url_hash, canonical_url, results, now=None):
+    """记录一次抓取到的价格（由调用方提交），results为[{platform, price, url}]"""
+    if not results:
+        return
+    now = now or datetime.utcnow()
+    product_id = _product_id(url_hash, canonical_url, now)
+
+    # 同一次抓取中同一平台有多个价格时合并为一个原始数据点
+    points = {}
+    for result in results:
+        point = points.get(result['platform'])
+        price = result['price']
+        if point is None:
+            points[result['platform']] = {
+                'product_id': product_id, 'platform': result['platform'], 'resolution': 'raw', 'bucket_at': now,
+                'price_min': price, 'price_max': price, 'price_sum': price, 'price_last': price, 'samples': 1
+            }
+        else:
+            point['price_min'] = min(point['price_min'], price)
+            point['price_max'] = max(point['price_max'], price)
+            point['price_sum'] += price
+            point['price_last'] = price
+            point['samples'] += 1
+    db.session.bulk_insert_mappings(PricePoint, list(points.values()))
+
+
+def find_product(url_hash):
+    return PriceProduct.query.filter_by(url_hash=url_hash).first()
+
+
+def series(product_id, start, end, resolution=None, platform=None, now=None):
+    """查询商品在[start, end)内的价格序列，返回(精度, {平台: [数据点]})
+
+    数据点为{'t', 'min', 'max', 'avg', 'last', 'samples'}，按时间排序。
+    所选精度尚未汇总的最近一段时间由更细的数据临时汇总补齐。
+    """
+    now = now or datetime.utcnow()
+    resolution = resolution or choose_resolution(start, end, now)
+    level = RESOLUTIONS.index(resolution)
+
+    buckets = {}
+    cursor = start
+    for finer in reversed(RESOLUTIONS[:level + 1]):
+        rows = _points(product_id, finer, cursor, end, platform)
+        if not rows:
+            continue
+        _merge(buckets, rows, resolution)
+        cursor = max(_bucket_end(row.bucket_at, finer) for row in rows)
+
+    result = {}
+    for (name, bucket_at), bucket in sorted(buckets.items(), key=lambda entry: entry[0][1]):
+        result.setdefault(name, []).append({
+            't': _epoch_ms(bucket_at),
+            'min': bucket['price_min'],
+            'max': bucket['price_max'],
+            'avg': round(bucket['price_sum'] / bucket['samples']),
+            'last': bucket['price_last'],
+            'samples': bucket['samples']
+        })
+    return resolution, result
+
+
+def choose_resolution(start, end, now=None):
+    """按查询跨度和各精度的保留期选择精度：跨度越长越粗，起点早于某精度的保留期时使用更粗的精度"""
+    now = now or datetime.utcnow()
+    retention = _retention()
+    for resolution, max_span in AUTO_RESOLUTION_SPANS:
+        if end - start <= max_span and start >= now - retention[resolution]:
+            return resolution
+    return 'day'
+
+
+def rollup(now=None):
+    """把已结束的时间段逐级汇总（原始→小时→天），再按保留期删除旧数据，返回各级写入和删除的数量
+
+    每级从已有汇总的最后一个时间段开始重新计算到当前时间段之前，重复执行结果相同；
+    多个进程同时汇总时，后提交的一方因唯一约束冲突或死锁回滚，不影响数据。
+    """
+    now = now or datetime.utcnow()
+    stats = {}
+    try:
+        for finer, coarser in zip(RESOLUTIONS, RESOLUTIONS[1:]):
+            stats[coarser] = _rollup_level(finer, coarser, now)
+            db.session.flush()
+
+        retention = _retention()
+        for resolution in RESOLUTIONS:
+            stats[f'{resolution}_deleted'] = PricePoint.query.filter(
+                PricePoint.resolution == resolution,
+                PricePoint.bucket_at < now - retention[resolution]
+            ).delete(synchronize_session=False)
+        db.session.commit()
+    except (IntegrityError, OperationalError):
+        db.session.rollback()
+        current_app.logger.warning('价格历史汇总与其他进程冲突，本次跳过')
+        return {}
+    return stats
+
+
+def _rollup_level(finer, coarser, now):
+    """把finer精度的数据汇总为coarser精度，只处理已结束的时间段"""
+    current = _truncate(now, coarser)
+    last = db.session.query(func.max(PricePoint.bucket_at)).filter(PricePoint.resolution == coarser).scalar()
+    if last is None:
+        last = db.session.query(func.min(PricePoint.bucket_at)).filter(PricePoint.resolution == finer).scalar()
+        if last is None:
+            return 0
+        last = _truncate(last, coarser)
+    if last >= current:
+        return 0
+
+    rows = PricePoint.query.filter(
+        PricePoint.resolution == finer,
+        PricePoint.bucket_at >= last,
+        PricePoint.bucket_at < current
+    ).all()
+    by_product = {}
+    for row in rows:
+        by_product.setdefault(row.product_id, []).append(row)
+
+    mappings = []
+    for product_id, product_rows in by_product.items():
+        buckets = {}
+        _merge(buckets, product_rows, coarser)
+        mappings.extend(
+            dict(bucket, product_id=product_id, platform=name, resolution=coarser, bucket_at=bucket_at)
+            for (name, bucket_at), bucket in buckets.items()
+        )
+
+    # 最后一个汇总时间段可能在上次汇总后又有新数据，连同之后的时间段一起重新写入
+    PricePoint.query.filter(
+        PricePoint.resolution == coarser,
+        PricePoint.bucket_at >= last
+    ).delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(PricePoint, mappings)
+    return len(mappings)
+
+
+def _merge(buckets, rows, resolution):
+    """把数据点按(平台, 时间段)合并进buckets"""
+    for row in sorted(rows, key=lambda row: row.bucket_at):
+        key = (row.platform, _truncate(row.bucket_at, resolution))
+        bucket = buckets.get(key)
+        if bucket is None:
+            buckets[key] = {
+                'price_min': row.price_min, 'price_max': row.price_max, 'price_sum': row.price_sum,
+                'price_last': row.price_last, 'samples': row.samples
+            }
+        else:
+            bucket['price_min'] = min(bucket['price_min'], row.price_min)
+            bucket['price_max'] = max(bucket['price_max'], row.price_max)
+            bucket['price_sum'] += row.price_sum
+            bucket['price_last'] = row.price_last
+            bucket['samples'] += row.samples
+
+
+def _points(product_id, resolution, start, end, platform=None):
+    query = PricePoint.query.filter(
+        PricePoint.product_id == product_id,
+        PricePoint.resolution == resolution,
+        PricePoint.bucket_at >= start,
+        PricePoint.bucket_at < end
+    )
+    if platform:
+        query = query.filter(PricePoint.platform == platform)
+    return query.all()
+
+
+def _product_id(url_hash, canonical_url, now):
+    """返回商品ID，首次出现时在保存点内创建，并发创建冲突时使用已有记录"""
+    if PriceProduct.query.filter_by(url_hash=url_hash).update({'last_seen_at': now}, synchronize_session=False):
+        return db.session.query(PriceProduct.id).filter_by(url_hash=url_hash).scalar()
+    try:
+        with db.session.begin_nested():
+            product = PriceProduct(url_hash=url_hash, canonical_url=canonical_url, first_seen_at=now, last_seen_at=now)
+            db.session.add(product)
+        return product.id
+    except IntegrityError:
+        return db.session.query(PriceProduct.id).filter_by(url_hash=url_hash).scalar()
+
+
+def _truncate(moment, resolution):
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if resolution == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment
+
+
+def _bucket_end(bucket_at, resolution):
+    if resolution == 'raw':
+        return bucket_at + timedelta(microseconds=1)
+    return bucket_at + BUCKET_SIZES[resolution]
+
+
+def _epoch_ms(moment):
+    """UTC时间（不带时区）转换为毫秒时间戳"""
+    return int((moment - datetime(1970, 1, 1)).total_seconds() * 1000)
+
+
+def _retention():
+    config = current_app.config
+    return {
+        'raw': timedelta(days=config.get('COMPARE_HISTORY_RAW_DAYS', 7)),
+        'hour': timedelta(days=config.get('COMPARE_HISTORY_HOURLY_DAYS', 90)),
+        'day': timedelta(days=config.get('COMPARE_HISTORY_DAILY_DAYS', 730))
+    }
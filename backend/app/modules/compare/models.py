@@ -8,7 +8,8 @@ class PriceCompare(db.Model):
     __table_args__ = {'extend_existing': True}
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'))  # 按链接直接比价时为空
+    task_id = db.Column(db.Integer, db.ForeignKey('compare_tasks.id'), index=True)  # 产生该结果的比价任务
     original_link = db.Column(db.String(500), nullable=False)
     
     # 比价结果
@@ -31,6 +32,7 @@ class PriceCompare(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'item_id': self.item_id,
+            'task_id': self.task_id,
             'original_link': self.original_link,
             'online_price': self.online_price,
             'platform_name': self.platform_name,
@@ -45,11 +47,29 @@ class PriceCompare(db.Model):
 class CompareTask(db.Model):
     """比价任务模型"""
     __tablename__ = 'compare_tasks'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_compare_tasks_claim', 'status', 'priority', 'next_attempt_at'),  # 按优先级领取待处理任务
+        db.Index('ix_compare_tasks_lease', 'status', 'lease_expires_at'),  # 回收租约过期的任务
+        db.Index('ix_compare_tasks_url_hash', 'url_hash', 'status'),  # 查找同一商品进行中的任务
+        {'extend_existing': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'))  # 按链接直接比价时为空
     link = db.Column(db.String(500), nullable=False)
-    status = db.Column(db.String(20), nullable=False, default='pending')  # pending(待处理), processing(处理中), completed(已完成), failed(失败)
-    priority = db.Column(db.Integer, default=0)  # 优先级，数字越小优先级越高
+    canonical_url = db.Column(db.String(500))  # 规范化后的链接，实际抓取的地址
+    url_hash = db.Column(db.String(64))  # 规范化链接的摘要
+    leader_id = db.Column(db.Integer, db.ForeignKey('compare_tasks.id'), index=True)  # 合并到的同一商品进行中的任务
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending(待处理), waiting(等待合并的任务完成), processing(处理中), completed(已完成), failed(失败)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # 优先级，数字越小优先级越高
+    like_count = db.Column(db.Integer, nullable=False, default=0)  # 点赞数，随点赞记录原子更新
+    
+    # 调度信息
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # 已尝试次数
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # 最早可领取时间（失败重试时推迟）
+    worker_id = db.Column(db.String(100))  # 当前持有租约的工作线程
+    lease_expires_at = db.Column(db.DateTime)  # 租约到期时间，工作线程通过心跳续期
+    heartbeat_at = db.Column(db.DateTime)  # 最近一次心跳时间
     
     # 任务结果
     result = db.Column(db.JSON)  # 存储比价结果的JSON数据
@@ -63,12 +83,114 @@ class CompareTask(db.Model):
         """将比价任务对象转换为字典"""
         return {
             'id': self.id,
+            'user_id': self.user_id,
+            'item_id': self.item_id,
             'link': self.link,
+            'canonical_url': self.canonical_url,
+            'product': self.url_hash,  # 价格历史中的商品标识，用于/api/compare/<product>/history
+            'leader_id': self.leader_id,
             'status': self.status,
             'priority': self.priority,
+            'attempts': self.attempts,
+            'likes': self.like_count,
             'result': self.result,
             'error_message': self.error_message,
             'created_at': self.created_at.isoformat(),
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None
-        }
\ No newline at end of file
+        }
+
+
+class CrawlCache(db.Model):
+    """比价抓取结果缓存，按规范化链接保存最近一次抓取到的价格"""
+    __tablename__ = 'compare_crawl_cache'
+    __table_args__ = {'extend_existing': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    url_hash = db.Column(db.String(64), nullable=False, unique=True)
+    canonical_url = db.Column(db.String(500), nullable=False)
+    results = db.Column(db.JSON, nullable=False)  # 抓取结果列表：[{platform, price, url}]
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    hits = db.Column(db.Integer, nullable=False, default=0)  # 命中次数
+
+
+class PriceProduct(db.Model):
+    """价格历史中的商品，按规范化链接区分"""
+    __tablename__ = 'compare_price_products'
+    __table_args__ = {'extend_existing': True}
+    
+    id = db.Column(db.Integer, primary_key=True)
+    url_hash = db.Column(db.String(64), nullable=False, unique=True)
+    canonical_url = db.Column(db.String(500), nullable=False)
+    first_seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_seen_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class PricePoint(db.Model):
+    """商品价格时间序列
+
+    同一张表保存三种精度：raw为每次抓取的原始价格，hour、day为按小时、按天汇总的价格，
+    旧数据逐级汇总后按保留期删除。价格单位为分。
+    """
+    __tablename__ = 'compare_price_points'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'resolution', 'bucket_at', 'platform', name='uq_price_points_bucket'),
+        db.Index('ix_price_points_resolution_bucket', 'resolution', 'bucket_at'),  # 逐级汇总和按保留期清理
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('compare_price_products.id'), nullable=False)
+    platform = db.Column(db.String(100), nullable=False)
+    resolution = db.Column(db.String(10), nullable=False)  # raw, hour, day
+    bucket_at = db.Column(db.DateTime, nullable=False)  # raw为抓取时间，hour、day为时间段起点
+    price_min = db.Column(db.Integer, nullable=False)
+    price_max = db.Column(db.Integer, nullable=False)
+    price_sum = db.Column(db.BigInteger, nullable=False)  # 价格之和，与samples一起计算均价，逐级汇总时保持准确
+    price_last = db.Column(db.Integer, nullable=False)  # 时间段内最后一次的价格
+    samples = db.Column(db.Integer, nullable=False, default=1)  # 价格样本数
+
+
+
+class CompareTaskLike(db.Model):
+    """比价任务点赞记录"""
+    __tablename__ = 'compare_task_likes'
+    __table_args__ = (
+        db.UniqueConstraint('task_id', 'user_id', name='uq_compare_task_likes_task_user'),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('compare_tasks.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CompareBoardEntry(db.Model):
+    """热门比价榜条目：任务完成时预先生成展示所需的摘要，读取榜单时无需再查询比价记录和用户"""
+    __tablename__ = 'compare_board_entries'
+    __table_args__ = {'extend_existing': True}
+    
+    task_id = db.Column(db.Integer, db.ForeignKey('compare_tasks.id'), primary_key=True, autoincrement=False)
+    url_hash = db.Column(db.String(64))  # 同一商品在榜单中只展示一次
+    title = db.Column(db.String(200), nullable=False)
+    creator_name = db.Column(db.String(100), nullable=False)
+    products = db.Column(db.JSON, nullable=False)  # [{name, platform, price, image}]
+    best_price = db.Column(db.Integer)
+    best_platform = db.Column(db.String(100))
+    like_count = db.Column(db.Integer, nullable=False, default=0)  # 与比价任务的点赞数同步更新
+    completed_at = db.Column(db.DateTime, nullable=False, index=True)
+    
+    def to_dict(self):
+        """热门比价榜的展示格式"""
+        return {
+            'id': self.task_id,
+            'title': self.title,
+            'products': self.products,
+            'creator': self.creator_name,
+            'likes': self.like_count,
+            'best_price': self.best_price,
+            'best_platform': self.best_platform,
+            'completed_at': self.completed_at.isoformat()
+        }
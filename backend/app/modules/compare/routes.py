@@ -1,19 +1,17 @@
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
 from app import db
 from app.modules.compare.models import PriceCompare, CompareTask
 from app.modules.item.models import Item
-from app.modules.user.models import User
-import threading
-import time
-import requests
-from bs4 import BeautifulSoup
-import re
+from app.modules.compare import worker, history, board
 
 # 创建蓝图
 compare_bp = Blueprint('compare', __name__)
 
+# 价格历史接口使用的毫秒时间戳起点（UTC）
+EPOCH = datetime(1970, 1, 1)
+
 
 @compare_bp.route('/tasks', methods=['POST'])
 @jwt_required()
@@ -34,27 +32,22 @@ def create_compare_task():
         item = Item.query.get(item_id)
         if not item:
             return jsonify({'message': '商品不存在'}), 404
-        if not item.original_url:
+        if not item.original_link:
             return jsonify({'message': '该商品没有提供原始链接，无法比价'}), 400
-        product_url = item.original_url
-    
-    # 创建比价任务
-    compare_task = CompareTask(
-        user_id=user_id,
-        product_url=product_url,
-        status='pending',
-        created_at=datetime.utcnow()
-    )
+        product_url = item.original_link
     
-    db.session.add(compare_task)
+    # 创建比价任务，由比价工作线程池按优先级领取处理（命中缓存时直接完成）
+    compare_task = worker.enqueue(user_id, product_url, item_id=item_id)
     db.session.commit()
+    if compare_task.status == 'completed':
+        board.invalidate()
     
-    # 启动异步比价任务
-    threading.Thread(target=perform_price_comparison, args=(compare_task.id,)).start()
+    message = '比价已完成（使用近期抓取结果）' if compare_task.status == 'completed' else '比价任务已创建，正在进行比价'
     
     return jsonify({
-        'message': '比价任务已创建，正在进行比价',
-        'task_id': compare_task.id
+        'message': message,
+        'task_id': compare_task.id,
+        'status': compare_task.status
     }), 201
 
 
@@ -109,11 +102,11 @@ def get_my_compare_tasks():
     result = []
     for task in tasks:
         task_dict = task.to_dict()
-        # 获取最近的比价结果
-        latest_comparison = PriceCompare.query.filter_by(task_id=task.id).order_by(PriceCompare.created_at.desc()).first()
-        if latest_comparison:
-            task_dict['latest_price'] = latest_comparison.price
-            task_dict['latest_platform'] = latest_comparison.platform
+        # 最低价格随任务结果保存，无需逐个查询比价记录
+        lowest = (task.result or {}).get('lowest')
+        if lowest:
+            task_dict['latest_price'] = lowest['price']
+            task_dict['latest_platform'] = lowest['platform']
         result.append(task_dict)
     
     return jsonify({
@@ -124,197 +117,107 @@ def get_my_compare_tasks():
     }), 200
 
 
-def perform_price_comparison(task_id):
-    """执行比价任务（异步函数）"""
-    # 获取比价任务
-    compare_task = CompareTask.query.get(task_id)
-    if not compare_task:
-        return
-    
-    # 更新任务状态为进行中
-    compare_task.status = 'processing'
-    db.session.commit()
-    
-    try:
-        # 执行比价
-        results = crawl_product_prices(compare_task.product_url)
-        
-        # 保存比价结果
-        for result in results:
-            price_compare = PriceCompare(
-                task_id=task_id,
-                platform=result['platform'],
-                price=result['price'],
-                url=result['url'],
-                created_at=datetime.utcnow()
-            )
-            db.session.add(price_compare)
-        
-        # 更新任务状态为完成
-        compare_task.status = 'completed'
-        compare_task.completed_at = datetime.utcnow()
-        
-    except Exception as e:
-        # 更新任务状态为失败
-        compare_task.status = 'failed'
-        compare_task.error_message = str(e)
-        
-    finally:
-        db.session.commit()
-
-
 @compare_bp.route('/hot', methods=['GET'])
 def get_hot_compare_tasks():
-    """获取热门比价任务"""
+    """获取热门比价任务（预先生成的榜单，按点赞数排序）"""
     limit = request.args.get('limit', 4, type=int)
     
-    # 获取已完成的比价任务，按创建时间排序
-    tasks = CompareTask.query.filter_by(status='completed').order_by(CompareTask.created_at.desc()).limit(limit).all()
-    
-    result = []
-    for task in tasks:
-        # 获取任务相关的比价结果
-        comparisons = PriceCompare.query.filter_by(task_id=task.id).all()
-        
-        # 构建商品列表
-        products = []
-        for comparison in comparisons:
-            products.append({
-                'name': comparison.platform + '商品',
-                'price': comparison.price,
-                'image': '/assets/images/product_placeholder.jpg'  # 使用占位图片
-            })
-        
-        # 获取创建者信息
-        creator = User.query.get(task.user_id)
-        creator_name = creator.username if creator else '匿名用户'
-        
-        task_dict = {
-            'id': task.id,
-            'title': f'商品比价任务 #{task.id}',
-            'products': products,
-            'creator': creator_name,
-            'likes': task.likes if hasattr(task, 'likes') else 0  # 假设任务有likes字段
-        }
-        result.append(task_dict)
-    
-    return jsonify({'data': result}), 200
+    return jsonify({'data': board.hot(limit)}), 200
 
 
-def crawl_product_prices(url):
-    """爬取商品价格（示例函数，实际需要根据不同电商平台进行定制）"""
-    results = []
+@compare_bp.route('/tasks/<int:task_id>/like', methods=['POST', 'DELETE'])
+@jwt_required()
+def like_compare_task(task_id):
+    """点赞或取消点赞比价任务"""
+    user_id = get_jwt_identity()
     
-    try:
-        # 模拟不同平台的比价结果
-        # 这里只是示例，实际需要实现针对不同电商平台的爬虫逻辑
-        # 并且要遵守robots协议，避免过度爬取
-        
-        # 京东示例
-        if 'jd.com' in url:
-            price = extract_jd_price(url)
-            if price:
-                results.append({
-                    'platform': '京东',
-                    'price': price,
-                    'url': url
-                })
-        # 淘宝示例
-        elif 'taobao.com' in url or 'tmall.com' in url:
-            price = extract_taobao_price(url)
-            if price:
-                results.append({
-                    'platform': '淘宝/天猫',
-                    'price': price,
-                    'url': url
-                })
-        # 拼多多示例
-        elif 'pinduoduo.com' in url:
-            price = extract_pdd_price(url)
-            if price:
-                results.append({
-                    'platform': '拼多多',
-                    'price': price,
-                    'url': url
-                })
-        
-        # 其他平台或通用方法
-        else:
-            price = extract_generic_price(url)
-            if price:
-                results.append({
-                    'platform': '其他平台',
-                    'price': price,
-                    'url': url
-                })
-        
-    except Exception as e:
-        print(f"比价失败: {str(e)}")
-        
-    return results
-
-
-def extract_jd_price(url):
-    """示例：提取京东商品价格"""
-    # 这里是示例实现，实际需要发送请求并解析页面
-    # 注意：实际爬虫需要遵守网站robots协议
-    # 为了避免实际网络请求，这里返回一个模拟价格
-    return 100  # 示例价格
-
-
-def extract_taobao_price(url):
-    """示例：提取淘宝/天猫商品价格"""
-    # 这里是示例实现，实际需要发送请求并解析页面
-    return 105  # 示例价格
+    compare_task = CompareTask.query.get(task_id)
+    if not compare_task:
+        return jsonify({'message': '比价任务不存在'}), 404
+    if compare_task.status != 'completed':
+        return jsonify({'message': '只能为已完成的比价任务点赞'}), 400
+    
+    liked = request.method == 'POST'
+    if liked:
+        changed = board.like(task_id, user_id)
+        message = '点赞成功' if changed else '已经点过赞了'
+    else:
+        changed = board.unlike(task_id, user_id)
+        message = '已取消点赞' if changed else '尚未点赞'
+    db.session.commit()
+    
+    if changed:
+        board.apply_like(task_id, 1 if liked else -1)
+    likes = db.session.query(CompareTask.like_count).filter_by(id=task_id).scalar()
+    
+    return jsonify({
+        'message': message,
+        'liked': liked,
+        'likes': likes
+    }), 200
 
 
-def extract_pdd_price(url):
-    """示例：提取拼多多商品价格"""
-    # 这里是示例实现，实际需要发送请求并解析页面
-    return 95  # 示例价格
+@compare_bp.route('/<string:product>/history', methods=['GET'])
+def get_price_history(product):
+    """获取商品价格历史（图表数据）
+    
+    product为比价任务返回的商品标识。可按days指定最近天数（默认30，最多730），
+    或用start、end指定毫秒时间戳范围；resolution可选raw、hour、day，默认按时间跨度选择。
+    """
+    days = request.args.get('days', 30, type=int)
+    start_ms = request.args.get('start', type=int)
+    end_ms = request.args.get('end', type=int)
+    resolution = request.args.get('resolution')
+    platform = request.args.get('platform')
+    
+    if resolution and resolution not in history.RESOLUTIONS:
+        return jsonify({'message': 'resolution只能是raw、hour或day'}), 400
+    
+    price_product = history.find_product(product)
+    if not price_product:
+        return jsonify({'message': '没有该商品的价格记录'}), 404
+    
+    now = datetime.utcnow()
+    end = _from_timestamp_ms(end_ms) if end_ms is not None else now
+    start = _from_timestamp_ms(start_ms) if start_ms is not None else None
+    if end is None or (start_ms is not None and start is None):
+        return jsonify({'message': 'start、end须为1970年之后的毫秒时间戳'}), 400
+    if start is None:
+        start = end - timedelta(days=min(max(days, 1), 730))
+    if start >= end:
+        return jsonify({'message': '开始时间必须早于结束时间'}), 400
+    if end - start > timedelta(days=730):
+        return jsonify({'message': '查询范围最多730天'}), 400
+    
+    resolution, series = history.series(price_product.id, start, end, resolution=resolution, platform=platform, now=now)
+    
+    # 区间内最低价和最新价，用于展示“30天最低价”
+    lowest = None
+    latest = None
+    for name, points in series.items():
+        for point in points:
+            if lowest is None or point['min'] < lowest['price']:
+                lowest = {'platform': name, 'price': point['min'], 't': point['t']}
+        if latest is None or points[-1]['t'] > latest['t']:
+            latest = {'platform': name, 'price': points[-1]['last'], 't': points[-1]['t']}
+    
+    return jsonify({
+        'product': price_product.url_hash,
+        'canonical_url': price_product.canonical_url,
+        'resolution': resolution,
+        'start': int((start - EPOCH).total_seconds() * 1000),
+        'end': int((end - EPOCH).total_seconds() * 1000),
+        'series': [{'platform': name, 'points': points} for name, points in series.items()],
+        'lowest': lowest,
+        'latest': latest
+    }), 200
 
 
-def extract_generic_price(url):
-    """示例：通用价格提取方法"""
-    # 这里是示例实现，实际需要发送请求并解析页面
-    # 以下是一个简化版的实现
+def _from_timestamp_ms(value):
+    """毫秒时间戳转换为UTC时间，超出范围时返回None"""
+    if value < 0:
+        return None
     try:
-        # 设置请求头，模拟浏览器
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # 发送请求
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        # 解析页面
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # 尝试从页面中提取价格信息（这是一个通用的方法，可能不适用所有网站）
-        # 查找包含价格的元素
-        price_text = None
-        
-        # 尝试常见的价格元素选择器
-        price_selectors = [
-            '.price', '.current-price', '.original-price', '#price',
-            'span[class*="price"]', 'div[class*="price"]'
-        ]
-        
-        for selector in price_selectors:
-            price_element = soup.select_one(selector)
-            if price_element:
-                price_text = price_element.get_text().strip()
-                break
-        
-        # 如果找到了价格文本，尝试提取数字
-        if price_text:
-            # 使用正则表达式提取数字
-            price_match = re.search(r'\d+\.?\d*', price_text)
-            if price_match:
-                return int(float(price_match.group()) * 100)  # 转换为分
-        
-    except Exception:
-        pass
-    
-    return None
\ No newline at end of file
+        return EPOCH + timedelta(milliseconds=value)
+    except OverflowError:
+        return None
@@ -0,0 +1,427 @@
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from flask import current_app
+from app import db
+from app.modules.compare.models import CompareTask, PriceCompare
+from app.modules.compare.crawler import crawl_many
+from app.modules.compare.canonical import canonicalize, url_hash
+from app.modules.compare import cache, history, board
+from app.modules.compare.fetcher import close_thread_fetcher
+
+
+# 每次领取时在批量大小之外多锁定的候选任务数；SQLite不支持SKIP LOCKED，候选被其他线程抢先时依次尝试下一个
+CLAIM_CANDIDATES = 5
+
+# 失败重试的最长推迟时间（秒）
+MAX_RETRY_DELAY_SECONDS = 3600
+
+
+def enqueue(user_id, link, item_id=None, priority=0, now=None):
+    """创建比价任务（由调用方提交），priority越小越先处理
+
+    链接先按平台规范化：缓存中有未过期的抓取结果时任务直接完成；
+    同一商品已有待处理或处理中的任务时，新任务进入等待状态，随该任务一起完成，不再重复抓取。
+    """
+    now = now or datetime.utcnow()
+    canonical_url = canonicalize(link)
+    digest = url_hash(canonical_url)
+    task = CompareTask(
+        user_id=user_id, item_id=item_id, link=link, canonical_url=canonical_url, url_hash=digest,
+        status='pending', priority=priority
+    )
+
+    # 先查缓存和进行中的任务，再加入会话，避免自动flush后查到新任务自身
+    cached = cache.get(digest, now)
+    leader = None
+    if cached is None:
+        leader = CompareTask.query.filter(
+            CompareTask.url_hash == digest,
+            CompareTask.status.in_(('pending', 'processing'))
+        ).order_by(CompareTask.id).first()
+    db.session.add(task)
+
+    if cached is not None:
+        task.status = 'completed'
+        task.result = _result_summary(cached)
+        task.completed_at = now
+        db.session.flush()
+        _record_prices([task.id], cached, now)
+        board.record([task.id], cached, now)
+    elif leader:
+        task.status = 'waiting'
+        task.leader_id = leader.id
+        # 合并进来的任务优先级更高时，提升被合并任务的优先级
+        if priority < leader.priority:
+            CompareTask.query.filter_by(id=leader.id).update({'priority': priority}, synchronize_session=False)
+    return task
+
+
+def claim_tasks(worker_id, limit=1, now=None):
+    """按优先级领取最多limit个待处理任务，返回任务ID列表，队列为空时返回空列表
+
+    MySQL上用FOR UPDATE SKIP LOCKED锁定候选行，多个工作线程互不阻塞；
+    领取本身是带status条件的UPDATE（租约的比较并交换），在SQLite上同样保证只被领取一次。
+    """
+    now = now or datetime.utcnow()
+    lease_seconds = current_app.config.get('COMPARE_LEASE_SECONDS', 60)
+
+    candidates = db.session.query(CompareTask.id).filter(
+        CompareTask.status == 'pending',
+        CompareTask.next_attempt_at <= now
+    ).order_by(CompareTask.priority, CompareTask.id).limit(limit + CLAIM_CANDIDATES).with_for_update(
+        skip_locked=True
+    ).all()
+
+    claimed_ids = []
+    for (task_id,) in candidates:
+        claimed = CompareTask.query.filter_by(id=task_id, status='pending').update({
+            'status': 'processing',
+            'worker_id': worker_id,
+            'attempts': CompareTask.attempts + 1,
+            'started_at': now,
+            'heartbeat_at': now,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds)
+        }, synchronize_session=False)
+        if claimed:
+            claimed_ids.append(task_id)
+            if len(claimed_ids) >= limit:
+                break
+
+    if claimed_ids:
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return claimed_ids
+
+
+def run_tasks(task_ids, worker_id):
+    """执行已领取的一批任务，返回{task_id: 结果}
+
+    结果为completed、cached（命中缓存）、retry、failed或lease_lost（租约已被回收）。
+    未命中缓存的任务一起交给爬虫并发抓取，同一商品只抓取一次。
+    """
+    tasks = db.session.query(CompareTask.id, CompareTask.link, CompareTask.canonical_url, CompareTask.url_hash).filter(
+        CompareTask.id.in_(task_ids)
+    ).all()
+    outcomes = {}
+    to_crawl = {}
+
+    for task in tasks:
+        canonical_url = task.canonical_url or canonicalize(task.link)
+        digest = task.url_hash or url_hash(canonical_url)
+        # 排队期间其他任务可能已抓取过同一商品
+        cached = cache.get(digest)
+        if cached is not None:
+            outcome = _complete(task.id, worker_id, cached)
+            outcomes[task.id] = 'cached' if outcome == 'completed' else outcome
+        else:
+            to_crawl[task.id] = (digest, canonical_url)
+    # 抓取期间不持有数据库事务
+    db.session.rollback()
+    if not to_crawl:
+        return outcomes
+
+    try:
+        crawled, errors = crawl_many(list(dict.fromkeys(canonical_url for _, canonical_url in to_crawl.values())))
+    except Exception as e:
+        current_app.logger.exception('比价爬虫执行失败')
+        crawled, errors = {}, {}
+        error = str(e)
+    else:
+        error = '未获取到商品价格'
+
+    for task_id, cache_key in to_crawl.items():
+        results = crawled.get(cache_key[1])
+        if results:
+            outcomes[task_id] = _complete(task_id, worker_id, results, cache_key=cache_key)
+        else:
+            outcomes[task_id] = _fail(task_id, worker_id, errors.get(cache_key[1], error))
+    return outcomes
+
+
+def heartbeat(task_workers, now=None):
+    """为进行中的任务续租，task_workers为{task_id: worker_id}"""
+    if not task_workers:
+        return
+    now = now or datetime.utcnow()
+    lease_seconds = current_app.config.get('COMPARE_LEASE_SECONDS', 60)
+    for task_id, worker_id in task_workers.items():
+        CompareTask.query.filter_by(id=task_id, worker_id=worker_id, status='processing').update({
+            'heartbeat_at': now,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds)
+        }, synchronize_session=False)
+    db.session.commit()
+
+
+def reclaim_expired_leases(now=None):
+    """回收租约过期（工作线程崩溃或卡住）的任务：未超过最大尝试次数的重新排队，否则标记失败"""
+    now = now or datetime.utcnow()
+    max_attempts = current_app.config.get('COMPARE_MAX_ATTEMPTS', 3)
+    expired = (CompareTask.status == 'processing', CompareTask.lease_expires_at < now)
+    released = {'worker_id': None, 'lease_expires_at': None, 'error_message': '处理超时，租约已过期'}
+
+    failed_ids = [task_id for (task_id,) in db.session.query(CompareTask.id).filter(
+        *expired, CompareTask.attempts >= max_attempts
+    )]
+    if failed_ids:
+        CompareTask.query.filter(CompareTask.id.in_(failed_ids)).update(
+            dict(released, status='failed', completed_at=now), synchronize_session=False
+        )
+        _fail_followers(failed_ids, released['error_message'], now)
+    failed = len(failed_ids)
+    retried = CompareTask.query.filter(*expired).update(
+        dict(released, status='pending', next_attempt_at=now + timedelta(seconds=_retry_delay(1))),
+        synchronize_session=False
+    )
+    db.session.commit()
+    return failed + retried
+
+
+def queue_stats(now=None):
+    """队列深度：各状态任务数、可立即领取的任务数和最早待处理任务的等待秒数"""
+    now = now or datetime.utcnow()
+    counts = dict(db.session.query(CompareTask.status, func.count(CompareTask.id)).group_by(CompareTask.status).all())
+    ready = CompareTask.query.filter(CompareTask.status == 'pending', CompareTask.next_attempt_at <= now).count()
+    oldest = db.session.query(func.min(CompareTask.created_at)).filter(CompareTask.status == 'pending').scalar()
+    db.session.rollback()
+    return {
+        'pending': counts.get('pending', 0),
+        'waiting': counts.get('waiting', 0),
+        'ready': ready,
+        'processing': counts.get('processing', 0),
+        'completed': counts.get('completed', 0),
+        'failed': counts.get('failed', 0),
+        'oldest_pending_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0
+    }
+
+
+def _complete(task_id, worker_id, results, cache_key=None):
+    """保存比价结果并一起完成合并到该任务的等待任务；只有仍持有租约时才提交，防止回收后重复写入
+
+    cache_key为(url_hash, canonical_url)时把新抓取的结果写入缓存和价格历史。
+    """
+    now = datetime.utcnow()
+    completed = {
+        'status': 'completed',
+        'result': _result_summary(results),
+        'error_message': None,
+        'completed_at': now,
+        'worker_id': None,
+        'lease_expires_at': None
+    }
+    updated = CompareTask.query.filter_by(id=task_id, worker_id=worker_id, status='processing').update(
+        completed, synchronize_session=False
+    )
+    if not updated:
+        db.session.rollback()
+        return 'lease_lost'
+
+    followers = [follower_id for (follower_id,) in db.session.query(CompareTask.id).filter_by(
+        leader_id=task_id, status='waiting'
+    )]
+    if followers:
+        CompareTask.query.filter(CompareTask.id.in_(followers)).update(completed, synchronize_session=False)
+    _record_prices([task_id] + followers, results, now)
+    board.record([task_id] + followers, results, now)
+
+    if cache_key:
+        cache.store(*cache_key, results, now)
+        history.record(*cache_key, results, now)
+    db.session.commit()
+    board.invalidate()
+    return 'completed'
+
+
+def _result_summary(results):
+    return {'prices': results, 'lowest': min(results, key=lambda result: result['price'])}
+
+
+def _record_prices(task_ids, results, now):
+    """为每个任务写入比价记录"""
+    tasks = db.session.query(CompareTask.id, CompareTask.user_id, CompareTask.item_id).filter(
+        CompareTask.id.in_(task_ids)
+    ).all()
+    db.session.bulk_insert_mappings(PriceCompare, [{
+        'user_id': task.user_id,
+        'item_id': task.item_id,
+        'task_id': task.id,
+        'original_link': result['url'],
+        'online_price': result['price'],
+        'platform_name': result['platform'],
+        'compare_status': 'completed',
+        'created_at': now,
+        'compared_at': now
+    } for task in tasks for result in results])
+
+
+def _fail_followers(task_ids, error, now):
+    """合并到的任务最终失败时，等待它的任务一起标记为失败"""
+    CompareTask.query.filter(CompareTask.leader_id.in_(task_ids), CompareTask.status == 'waiting').update({
+        'status': 'failed',
+        'error_message': error,
+        'completed_at': now
+    }, synchronize_session=False)
+
+
+def _fail(task_id, worker_id, error):
+    """记录失败：未超过最大尝试次数时按指数退避重新排队，否则标记为失败"""
+    now = datetime.utcnow()
+    max_attempts = current_app.config.get('COMPARE_MAX_ATTEMPTS', 3)
+    task = db.session.get(CompareTask, task_id)
+    if task.worker_id != worker_id or task.status != 'processing':
+        db.session.rollback()
+        return 'lease_lost'
+
+    values = {'error_message': error[:500], 'worker_id': None, 'lease_expires_at': None}
+    if task.attempts >= max_attempts:
+        values.update(status='failed', completed_at=now)
+        outcome = 'failed'
+    else:
+        values.update(status='pending', next_attempt_at=now + timedelta(seconds=_retry_delay(task.attempts)))
+        outcome = 'retry'
+
+    updated = CompareTask.query.filter_by(id=task_id, worker_id=worker_id, status='processing').update(
+        values, synchronize_session=False
+    )
+    if updated and outcome == 'failed':
+        _fail_followers([task_id], values['error_message'], now)
+    db.session.commit()
+    current_app.logger.warning(f'比价任务 {task_id} 第{task.attempts}次处理失败: {error}')
+    return outcome if updated else 'lease_lost'
+
+
+def _retry_delay(attempts):
+    base = current_app.config.get('COMPARE_RETRY_BASE_SECONDS', 30)
+    return min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+
+
+class CompareWorkerPool:
+    """比价工作线程池
+
+    workers个线程各自从compare_tasks表按优先级成批领取任务，每批链接由异步抓取器并发抓取；
+    维护线程定期为进行中的任务发送心跳续租、回收租约过期的任务，
+    并输出吞吐量和队列深度。多个进程可同时运行，由领取时的行锁和租约保证不重复处理。
+    """
+
+    def __init__(self, app, workers=None):
+        self.app = app
+        self.workers = workers or app.config.get('COMPARE_WORKERS', 4)
+        self.batch_size = app.config.get('COMPARE_CLAIM_BATCH', 10)
+        self.poll_seconds = app.config.get('COMPARE_POLL_SECONDS', 2)
+        self.lease_seconds = app.config.get('COMPARE_LEASE_SECONDS', 60)
+        self.metrics_interval = app.config.get('COMPARE_METRICS_INTERVAL_SECONDS', 60)
+        self.name = f'{socket.gethostname()}-{os.getpid()}'
+        self.metrics = {
+            'claimed': 0, 'completed': 0, 'cached': 0, 'retry': 0, 'failed': 0, 'lease_lost': 0, 'reclaimed': 0
+        }
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self, drain=False):
+        """启动工作线程和维护线程；drain为True时工作线程在队列为空后退出"""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._work, args=(f'{self.name}-{n}', drain), name=f'compare-worker-{n}', daemon=True)
+            for n in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._maintain, name='compare-maintenance', daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """停止线程池并等待线程退出"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run(self):
+        """在前台运行线程池，直到被中断"""
+        self.start()
+        try:
+            while not self._stop.wait(1):
+                pass
+        finally:
+            self.stop()
+
+    def drain(self):
+        """处理完当前可领取的任务后返回（适合cron），返回统计信息"""
+        self.start(drain=True)
+        for thread in self._threads[:-1]:
+            thread.join()
+        self.stop()
+        return self.snapshot()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.metrics, inflight=len(self._inflight))
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.metrics[key] += amount
+
+    def _work(self, worker_id, drain):
+        with self.app.app_context():
+            try:
+                while not self._stop.is_set():
+                    try:
+                        task_ids = claim_tasks(worker_id, self.batch_size)
+                        if not task_ids:
+                            if drain:
+                                break
+                            self._stop.wait(self.poll_seconds)
+                            continue
+
+                        self._count('claimed', len(task_ids))
+                        with self._lock:
+                            self._inflight.update(dict.fromkeys(task_ids, worker_id))
+                        try:
+                            for outcome in run_tasks(task_ids, worker_id).values():
+                                self._count(outcome)
+                        finally:
+                            with self._lock:
+                                for task_id in task_ids:
+                                    self._inflight.pop(task_id, None)
+                    except Exception as e:
+                        db.session.rollback()
+                        current_app.logger.error(f'比价工作线程异常: {str(e)}')
+                        self._stop.wait(self.poll_seconds)
+                    finally:
+                        db.session.remove()
+            finally:
+                close_thread_fetcher()
+
+    def _maintain(self):
+        with self.app.app_context():
+            last_report = time.monotonic()
+            last_completed = 0
+            while not self._stop.wait(self.lease_seconds / 3):
+                try:
+                    with self._lock:
+                        inflight = dict(self._inflight)
+                    heartbeat(inflight)
+                    self._count('reclaimed', reclaim_expired_leases())
+
+                    elapsed = time.monotonic() - last_report
+                    if elapsed >= self.metrics_interval:
+                        metrics = self.snapshot()
+                        throughput = (metrics['completed'] - last_completed) / elapsed
+                        last_report, last_completed = time.monotonic(), metrics['completed']
+                        cache.purge_expired()
+                        history.rollup()
+                        board.purge()
+                        current_app.logger.info(
+                            f'比价队列: 吞吐 {throughput:.2f} 个/秒, 统计 {metrics}, 队列 {queue_stats()}'
+                        )
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error(f'比价维护线程异常: {str(e)}')
+                finally:
+                    db.session.remove()
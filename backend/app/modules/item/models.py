@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from app.utils import reference_data
 
 
 class ItemCategory(db.Model):
@@ -36,6 +37,8 @@ class Item(db.Model):
     condition = db.Column(db.String(20))  # 成色：全新、九成新、八成新等
     usage_years = db.Column(db.Float)  # 使用年限
     is_bargainable = db.Column(db.Boolean, default=False)  # 是否支持砍价
+    auto_accept_price = db.Column(db.Integer)  # 还价不低于该金额时自动接受
+    auto_reject_price = db.Column(db.Integer)  # 还价低于该金额时自动拒绝
     original_link = db.Column(db.String(500))  # 原商品链接
     
     # 交易类型
@@ -56,13 +59,14 @@ class Item(db.Model):
     reviewed_by = db.Column(db.Integer, db.ForeignKey('users.id'))  # 审核人
     
     # 关系
+    user = db.relationship('User', foreign_keys=[user_id])  # 卖家（reviewed_by同样指向users，需指定外键）
     item_images = db.relationship('ItemImage', backref='item', lazy=True, cascade='all, delete-orphan')
     transactions = db.relationship('Transaction', backref='item', lazy=True)
     offers = db.relationship('Offer', backref='item', lazy=True)
     
-    def to_dict(self):
-        """将商品对象转换为字典"""
-        return {
+    def to_dict(self, include_private=False):
+        """将商品对象转换为字典，include_private为True时包含仅卖家可见的字段"""
+        data = {
             'id': self.id,
             'name': self.name,
             'description': self.description,
@@ -70,7 +74,7 @@ class Item(db.Model):
             'status': self.status,
             'user_id': self.user_id,
             'category_id': self.category_id,
-            'category_name': self.category.name if self.category else None,
+            'category_name': reference_data.category_name(self.category_id),
             'condition': self.condition,
             'usage_years': self.usage_years,
             'is_bargainable': self.is_bargainable,
@@ -87,6 +91,10 @@ class Item(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'images': [img.url for img in self.item_images]
         }
+        if include_private:
+            data['auto_accept_price'] = self.auto_accept_price
+            data['auto_reject_price'] = self.auto_reject_price
+        return data
 
 
 class ItemImage(db.Model):
@@ -3,10 +3,16 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
 from app import db
-from app.modules.item.models import Item, ItemCategory, ItemImage
+from app.modules.item.models import Item, ItemImage
 from app.modules.user.models import User, Collection
 from app.modules.transaction.models import Transaction
+from app.modules.user.reputation import get_reputations
+from app.utils.idempotency import idempotent
+from app.utils import reference_data
+from app.modules.transaction.offers import parse_thresholds
+from app.modules.admin import moderation
 
 # 创建蓝图
 item_bp = Blueprint('item', __name__)
@@ -48,10 +54,16 @@ def get_items():
     if keyword:
         query = query.filter(Item.name.like(f'%{keyword}%') | Item.description.like(f'%{keyword}%'))
     
-    # 分页
-    pagination = query.order_by(Item.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    # 分页，卖家和图片随商品一起加载，分类、校区和专业从基础数据缓存读取，避免逐行查询
+    pagination = query.options(
+        joinedload(Item.user),
+        selectinload(Item.item_images)
+    ).order_by(Item.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
     items = pagination.items
     
+    # 一次查询取出本页所有卖家的信誉
+    reputations = get_reputations(item.user_id for item in items)
+    
     # 格式化结果
     result = []
     for item in items:
@@ -60,8 +72,9 @@ def get_items():
         item_dict['seller'] = {
             'id': item.user.id,
             'username': item.user.username,
-            'campus': item.user.campus.name if item.user.campus else None,
-            'major': item.user.major.name if item.user.major else None
+            'campus': reference_data.campus_name(item.user.campus_id),
+            'major': reference_data.major_name(item.user.major_id),
+            'reputation': reputations[item.user_id]
         }
         result.append(item_dict)
     
@@ -144,8 +157,9 @@ def get_item(item_id):
     item_dict['seller'] = {
         'id': item.user.id,
         'username': item.user.username,
-        'campus': item.user.campus.name if item.user.campus else None,
-        'major': item.user.major.name if item.user.major else None
+        'campus': reference_data.campus_name(item.user.campus_id),
+        'major': reference_data.major_name(item.user.major_id),
+        'reputation': get_reputations([item.user_id])[item.user_id]
     }
     
     return jsonify(item_dict), 200
@@ -153,6 +167,7 @@ def get_item(item_id):
 
 @item_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_item():
     """发布商品"""
     user_id = get_jwt_identity()
@@ -180,6 +195,16 @@ def create_item():
         status='pending'  # 待审核
     )
     
+    # 还价自动回应阈值（可选）
+    if data.get('auto_accept_price') or data.get('auto_reject_price'):
+        auto_accept_price, auto_reject_price, error = parse_thresholds(
+            data.get('auto_accept_price'), data.get('auto_reject_price')
+        )
+        if error:
+            return jsonify({'message': error}), 400
+        item.auto_accept_price = auto_accept_price
+        item.auto_reject_price = auto_reject_price
+    
     # 租赁相关字段
     if data['transaction_type'] == 'rent':
         item.rental_price_day = int(data.get('rental_price_day', 0))
@@ -218,9 +243,13 @@ def create_item():
             )
             db.session.add(item_image)
     
+    # 自动预审：未命中敏感词直接上架，否则进入人工审核队列
+    moderation.prefilter(item)
+    
     db.session.commit()
     
-    return jsonify({'message': '商品发布成功，等待审核'}), 201
+    message = '商品发布成功' if item.status == 'active' else '商品发布成功，等待审核'
+    return jsonify({'message': message}), 201
 
 
 @item_bp.route('/<int:item_id>', methods=['PUT'])
@@ -260,6 +289,17 @@ def update_item(item_id):
     if 'original_link' in data:
         item.original_link = data['original_link']
     
+    # 还价自动回应阈值，传null表示取消
+    if 'auto_accept_price' in data or 'auto_reject_price' in data:
+        auto_accept_price, auto_reject_price, error = parse_thresholds(
+            data.get('auto_accept_price', item.auto_accept_price),
+            data.get('auto_reject_price', item.auto_reject_price)
+        )
+        if error:
+            return jsonify({'message': error}), 400
+        item.auto_accept_price = auto_accept_price
+        item.auto_reject_price = auto_reject_price
+    
     # 租赁相关字段
     if item.transaction_type == 'rent':
         if 'rental_price_day' in data:
@@ -279,12 +319,13 @@ def update_item(item_id):
         if item.location_enabled and 'location_description' in data:
             item.location_description = data['location_description']
     
-    # 修改后重新提交审核
-    item.status = 'pending'
+    # 修改后重新提交审核，先经过自动预审
+    moderation.prefilter(item)
     
     db.session.commit()
     
-    return jsonify({'message': '商品信息已更新，等待审核'}), 200
+    message = '商品信息已更新，等待审核' if item.status == 'pending' else '商品信息已更新'
+    return jsonify({'message': message}), 200
 
 
 @item_bp.route('/<int:item_id>/status', methods=['PUT'])
@@ -292,7 +333,8 @@ def update_item(item_id):
 def change_item_status(item_id):
     """修改商品状态（下架/重新上架）"""
     user_id = get_jwt_identity()
-    item = Item.query.get(item_id)
+    # 锁定商品行，避免与并发购买交错
+    item = Item.query.filter_by(id=item_id).with_for_update().first()
     data = request.get_json()
     
     if not item:
@@ -306,10 +348,22 @@ def change_item_status(item_id):
     if data['status'] not in ['removed', 'pending']:
         return jsonify({'message': '无效的状态'}), 400
     
-    item.status = data['status']
-    db.session.commit()
+    # 购买时商品即被预留为已售出，交易中的商品不允许下架或重新上架
+    if item.status in ['sold', 'rented']:
+        return jsonify({'message': '商品已交易，不允许修改状态'}), 400
     
-    message = '商品已下架' if data['status'] == 'removed' else '商品已重新提交审核'
+    # 重新上架同样先经过自动预审
+    if data['status'] == 'removed':
+        item.status = 'removed'
+        message = '商品已下架'
+    else:
+        if item.status not in ['removed', 'pending', 'rejected']:
+            return jsonify({'message': '只有已下架、待审核或被驳回的商品可以重新上架'}), 400
+        if item.status == 'removed':
+            item.status = 'pending'
+        moderation.prefilter(item)
+        message = '商品已重新上架' if item.status == 'active' else '商品已重新提交审核'
+    db.session.commit()
     
     return jsonify({'message': message}), 200
 
@@ -335,7 +389,7 @@ def get_my_items():
     # 格式化结果
     result = []
     for item in items:
-        result.append(item.to_dict())
+        result.append(item.to_dict(include_private=True))
     
     return jsonify({
         'items': result,
@@ -348,16 +402,11 @@ def get_my_items():
 @item_bp.route('/categories', methods=['GET'])
 def get_categories():
     """获取商品分类列表"""
+    # 未指定parent_id时获取一级分类
     parent_id = request.args.get('parent_id', type=int)
     
-    if parent_id is not None:
-        categories = ItemCategory.query.filter_by(parent_id=parent_id).all()
-    else:
-        # 获取一级分类
-        categories = ItemCategory.query.filter_by(parent_id=None).all()
-    
     result = []
-    for category in categories:
+    for category in reference_data.categories(parent_id):
         result.append({
             'id': category.id,
             'name': category.name,
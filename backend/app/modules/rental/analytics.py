@@ -0,0 +1,218 @@
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from app import db
+from app.modules.item.models import Item
+from app.modules.transaction.models import Transaction
+from app.modules.rental.models import RentalContract, RentalItemUtilization, RentalCategorySeasonality
+
+
+# 计入出租率的交易状态
+OCCUPYING_STATUSES = ('paid', 'completed')
+
+
+def month_windows(months, now=None):
+    """返回最近months个月的(月份, 开始日期, 结束日期)列表，最后一个月截止到今天（含）"""
+    now = now or datetime.utcnow()
+    year, month = now.year, now.month
+    starts = []
+    for _ in range(months):
+        starts.append(datetime(year, month, 1))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    starts.reverse()
+
+    today_end = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    ends = starts[1:] + [today_end]
+    return [(start.strftime('%Y-%m'), start, end) for start, end in zip(starts, ends)]
+
+
+def compute_rental_analytics(months=12, item_chunk_size=None, now=None):
+    """计算租赁商品的月度出租率、每可出租天收入和分类季节性，写入汇总表
+
+    按商品分块批量读取租赁区间，用差分数组 + 累加（np.add.at / np.cumsum）
+    一次得到每个商品每天是否被占用的位图和按天分摊的收入，
+    再用np.add.reduceat按月汇总，全程无逐天循环。返回本次运行的统计信息。
+    """
+    started = time.perf_counter()
+    if item_chunk_size is None:
+        item_chunk_size = current_app.config.get('RENTAL_ANALYTICS_ITEM_CHUNK', 2000)
+
+    windows = month_windows(months, now)
+    window_start, window_end = windows[0][1], windows[-1][2]
+    total_days = (window_end - window_start).days
+    month_labels = [label for label, _, _ in windows]
+    month_offsets = np.array([(start - window_start).days for _, start, _ in windows])
+
+    category_totals = {}
+    metrics = {'months': len(windows), 'items': 0, 'rentals': 0, 'item_rows': 0}
+
+    # 整体替换窗口内各月的汇总，保证重复运行结果一致；删除和逐块写入在同一事务中，最后一次提交
+    computed_at = datetime.utcnow()
+    RentalItemUtilization.query.filter(RentalItemUtilization.month.in_(month_labels)).delete(
+        synchronize_session=False
+    )
+    RentalCategorySeasonality.query.filter(RentalCategorySeasonality.month.in_(month_labels)).delete(
+        synchronize_session=False
+    )
+
+    last_item_id = 0
+    while True:
+        items = db.session.query(Item.id, Item.user_id, Item.category_id, Item.created_at).filter(
+            Item.transaction_type == 'rent',
+            Item.id > last_item_id
+        ).order_by(Item.id).limit(item_chunk_size).all()
+        if not items:
+            break
+        last_item_id = items[-1].id
+        metrics['items'] += len(items)
+
+        chunk = _compute_chunk(items, window_start, window_end, total_days, month_offsets)
+        metrics['rentals'] += chunk['rentals']
+
+        # 商品汇总逐块写入，内存占用只与块大小有关
+        item_rows = []
+        for i, item in enumerate(items):
+            for m, label in enumerate(month_labels):
+                available = int(chunk['available'][i, m])
+                if not available:
+                    continue
+                occupied = int(chunk['occupied'][i, m])
+                revenue = float(chunk['revenue'][i, m])
+                item_rows.append({
+                    'item_id': item.id,
+                    'owner_id': item.user_id,
+                    'category_id': item.category_id,
+                    'month': label,
+                    'available_days': available,
+                    'occupied_days': occupied,
+                    'occupancy_rate': round(occupied / available, 4),
+                    'revenue': round(revenue, 2),
+                    'revenue_per_item_day': round(revenue / available, 4),
+                    'rental_count': int(chunk['starts'][i, m]),
+                    'computed_at': computed_at
+                })
+
+                totals = category_totals.setdefault((item.category_id, label), [0, 0, 0, 0.0, 0])
+                totals[0] += 1
+                totals[1] += available
+                totals[2] += occupied
+                totals[3] += revenue
+                totals[4] += int(chunk['starts'][i, m])
+
+        db.session.bulk_insert_mappings(RentalItemUtilization, item_rows)
+        metrics['item_rows'] += len(item_rows)
+
+    category_rows = [{
+        'category_id': category_id,
+        'month': label,
+        'item_count': item_count,
+        'available_days': available,
+        'occupied_days': occupied,
+        'occupancy_rate': round(occupied / available, 4),
+        'revenue': round(revenue, 2),
+        'revenue_per_item_day': round(revenue / available, 4),
+        'rental_count': rental_count,
+        'computed_at': computed_at
+    } for (category_id, label), (item_count, available, occupied, revenue, rental_count) in category_totals.items()
+        if category_id is not None]
+
+    db.session.bulk_insert_mappings(RentalCategorySeasonality, category_rows)
+    db.session.commit()
+
+    metrics['category_rows'] = len(category_rows)
+    metrics['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    current_app.logger.info(
+        f"租赁分析: 商品 {metrics['items']} 个, 租赁 {metrics['rentals']} 笔, "
+        f"{metrics['months']} 个月, 耗时 {metrics['elapsed_seconds']}s"
+    )
+    return metrics
+
+
+def _compute_chunk(items, window_start, window_end, total_days, month_offsets):
+    """计算一块商品的按月可出租天数、占用天数、收入和租赁笔数，返回(商品数, 月数)的矩阵"""
+    item_ids = np.array([item.id for item in items])
+    origin = np.datetime64(window_start.date(), 'D')
+
+    rentals = db.session.query(
+        Transaction.item_id, Transaction.start_date, Transaction.end_date,
+        Transaction.amount, Transaction.deposit_paid, RentalContract.id.label('contract_id')
+    ).outerjoin(RentalContract, RentalContract.transaction_id == Transaction.id).filter(
+        Transaction.item_id.in_(item_ids.tolist()),
+        Transaction.transaction_type == 'rent',
+        Transaction.status.in_(OCCUPYING_STATUSES),
+        Transaction.start_date < window_end,
+        Transaction.end_date > window_start
+    ).all()
+
+    shape = (len(items), total_days + 1)
+    occupancy_diff = np.zeros(shape, dtype=np.int32)
+    revenue_diff = np.zeros(shape, dtype=np.float64)
+    starts = np.zeros(shape, dtype=np.int32)
+
+    if rentals:
+        rental_items = np.array([row.item_id for row in rentals])
+        start_times = np.array([row.start_date for row in rentals], dtype='datetime64[us]')
+        end_times = np.array([row.end_date for row in rentals], dtype='datetime64[us]')
+        # 租赁请求的金额包含押金（有租赁合同），直接下单的金额只有租金
+        revenue = np.array([
+            row.amount - (row.deposit_paid or 0) if row.contract_id else row.amount for row in rentals
+        ], dtype=np.float64)
+
+        index = np.searchsorted(item_ids, rental_items)
+        start_day = (start_times.astype('datetime64[D]') - origin).astype(np.int64)
+        end_date = end_times.astype('datetime64[D]')
+        # 结束时间不在零点时，结束当天也算被占用
+        end_day = (end_date - origin).astype(np.int64) + (end_times > end_date)
+        duration = np.maximum(end_day - start_day, 1)
+
+        # 收入按整个租期平均分摊到每天，再截取窗口内的部分
+        daily_revenue = revenue / duration
+        first = np.clip(start_day, 0, total_days)
+        last = np.clip(end_day, 0, total_days)
+
+        np.add.at(occupancy_diff, (index, first), 1)
+        np.add.at(occupancy_diff, (index, last), -1)
+        np.add.at(revenue_diff, (index, first), daily_revenue)
+        np.add.at(revenue_diff, (index, last), -daily_revenue)
+
+        in_window = (start_day >= 0) & (start_day < total_days)
+        np.add.at(starts, (index[in_window], start_day[in_window]), 1)
+
+    occupied = np.cumsum(occupancy_diff, axis=1)[:, :total_days] > 0
+    daily_revenue_matrix = np.cumsum(revenue_diff, axis=1)[:, :total_days]
+
+    # 上架之后才算可出租天数；被占用的天数一定可出租
+    created_day = np.array([
+        (np.datetime64(item.created_at, 'D') - origin).astype(np.int64) if item.created_at else 0
+        for item in items
+    ])
+    available = (np.arange(total_days)[None, :] >= created_day[:, None]) | occupied
+
+    return {
+        'rentals': len(rentals),
+        'available': np.add.reduceat(available.astype(np.int32), month_offsets, axis=1),
+        'occupied': np.add.reduceat(occupied.astype(np.int32), month_offsets, axis=1),
+        'revenue': np.add.reduceat(daily_revenue_matrix, month_offsets, axis=1),
+        'starts': np.add.reduceat(starts[:, :total_days], month_offsets, axis=1)
+    }
+
+
+def get_item_utilization(months=6, owner_id=None, item_id=None, now=None):
+    """从汇总表读取商品月度出租率"""
+    labels = [label for label, _, _ in month_windows(months, now)]
+    query = RentalItemUtilization.query.filter(RentalItemUtilization.month.in_(labels))
+    if owner_id is not None:
+        query = query.filter(RentalItemUtilization.owner_id == owner_id)
+    if item_id is not None:
+        query = query.filter(RentalItemUtilization.item_id == item_id)
+    return [row.to_dict() for row in query.order_by(RentalItemUtilization.item_id, RentalItemUtilization.month)]
+
+
+def get_category_seasonality(months=12, now=None):
+    """从汇总表读取分类月度出租率"""
+    labels = [label for label, _, _ in month_windows(months, now)]
+    query = RentalCategorySeasonality.query.filter(RentalCategorySeasonality.month.in_(labels))
+    return [row.to_dict() for row in query.order_by(
+        RentalCategorySeasonality.category_id, RentalCategorySeasonality.month
+    )]
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from app import db
+from app.modules.item.models import Item
+from app.modules.rental.models import RentalBooking
+
+
+class BookingConflictError(Exception):
+    """租赁时间段与已有档期重叠"""
+    def __init__(self, item_id, conflicts):
+        self.item_id = item_id
+        self.conflicts = conflicts
+        super().__init__(f'商品 {item_id} 在所选时间段内已被预订')
+
+
+def find_conflicts(item_id, start_date, end_date):
+    """查询与[start_date, end_date)重叠的有效档期（走(item_id, status, start_date, end_date)索引）"""
+    return RentalBooking.query.filter(
+        RentalBooking.item_id == item_id,
+        RentalBooking.status == 'active',
+        RentalBooking.start_date < end_date,
+        RentalBooking.end_date > start_date
+    ).order_by(RentalBooking.start_date).all()
+
+
+def book(item_id, transaction_id, start_date, end_date):
+    """为交易占用商品档期，时间段冲突时抛出BookingConflictError
+
+    先锁定商品行，同一商品的预订串行执行，检查与插入之间不会插入其他档期。
+    与交易数据处于同一事务，由调用方提交。
+    """
+    if end_date <= start_date:
+        raise ValueError('租赁结束时间必须晚于开始时间')
+
+    Item.query.filter_by(id=item_id).with_for_update().first()
+
+    conflicts = find_conflicts(item_id, start_date, end_date)
+    if conflicts:
+        raise BookingConflictError(item_id, conflicts)
+
+    booking = RentalBooking(
+        item_id=item_id,
+        transaction_id=transaction_id,
+        start_date=start_date,
+        end_date=end_date,
+        status='active'
+    )
+    db.session.add(booking)
+    return booking
+
+
+def release(transaction_ids):
+    """释放交易占用的档期（取消、超时或归还时调用），由调用方提交"""
+    if not isinstance(transaction_ids, (list, tuple, set)):
+        transaction_ids = [transaction_ids]
+    RentalBooking.query.filter(
+        RentalBooking.transaction_id.in_(transaction_ids),
+        RentalBooking.status == 'active'
+    ).update({'status': 'released'}, synchronize_session=False)
+
+
+def free_windows(item_id, days, now=None):
+    """计算今天起days天内的空闲时间段，返回(空闲时间段列表, 已占用时间段列表)"""
+    now = now or datetime.utcnow()
+    range_start = datetime(now.year, now.month, now.day)
+    range_end = range_start + timedelta(days=days)
+
+    bookings = find_conflicts(item_id, range_start, range_end)
+
+    # 合并重叠或相邻的档期，再取其间的空隙
+    busy = []
+    for booking in bookings:
+        start, end = max(booking.start_date, range_start), min(booking.end_date, range_end)
+        if busy and start <= busy[-1][1]:
+            busy[-1][1] = max(busy[-1][1], end)
+        else:
+            busy.append([start, end])
+
+    free = []
+    cursor = range_start
+    for start, end in busy:
+        if start > cursor:
+            free.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < range_end:
+        free.append((cursor, range_end))
+
+    return free, [(start, end) for start, end in busy]
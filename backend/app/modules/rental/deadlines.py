@@ -0,0 +1,45 @@
+from app import db
+from app.modules.transaction.models import Transaction
+from app.modules.rental.models import RentalContract
+from app.utils.deadlines import handler
+from app.modules.rental import calendar
+
+# 截止时间类型
+PAYMENT_TIMEOUT = 'rental_payment_timeout'  # 卖家超时未确认租赁请求
+RENTAL_OVERDUE = 'rental_overdue'  # 租期结束仍未归还
+
+
+@handler(PAYMENT_TIMEOUT)
+def cancel_unconfirmed_rentals(transaction_ids, now):
+    """取消超时未确认的租赁请求并释放占用的档期
+
+    待确认的请求尚未扣款，取消时无需退款；商品在租赁期间保持上架，状态无需恢复。
+    """
+    rows = db.session.query(Transaction.id).filter(
+        Transaction.id.in_(transaction_ids),
+        Transaction.status == 'pending'
+    ).with_for_update().all()
+    if not rows:
+        return
+
+    Transaction.query.filter(
+        Transaction.id.in_([row.id for row in rows]),
+        Transaction.status == 'pending'
+    ).update({'status': 'canceled', 'canceled_at': now}, synchronize_session=False)
+
+    # 释放被占用的档期
+    calendar.release([row.id for row in rows])
+
+
+@handler(RENTAL_OVERDUE)
+def mark_overdue_rentals(transaction_ids, now):
+    """租期结束仍未归还的合同标记为逾期（违约金由逾期结算任务处理）"""
+    active_ids = db.session.query(Transaction.id).filter(
+        Transaction.id.in_(transaction_ids),
+        Transaction.status == 'paid'
+    )
+
+    RentalContract.query.filter(
+        RentalContract.transaction_id.in_(active_ids),
+        db.or_(RentalContract.return_status.is_(None), RentalContract.return_status == 'pending')
+    ).update({'return_status': 'overdue', 'updated_at': now}, synchronize_session=False)
@@ -4,7 +4,7 @@ from app import db
 class RentalContract(db.Model):
     """租赁合同模型"""
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False, unique=True)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False, unique=True)
     
     # 合同状态
     contract_status = db.Column(db.String(20), default='active')  # active(进行中), completed(已完成), broken(已违约)
@@ -27,4 +27,92 @@ class RentalContract(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # 关系
-    transaction = db.relationship('Transaction', backref='rental_contract', uselist=False)
\ No newline at end of file
+    transaction = db.relationship('Transaction', backref=db.backref('rental_contract', uselist=False))
+
+
+class RentalBooking(db.Model):
+    """租赁档期：商品在[start_date, end_date)区间内被占用"""
+    __tablename__ = 'rental_bookings'
+    __table_args__ = (
+        db.Index('ix_rental_bookings_item_range', 'item_id', 'status', 'start_date', 'end_date'),  # 按商品查询重叠档期
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transactions.id'), nullable=False, unique=True)
+    start_date = db.Column(db.DateTime, nullable=False)
+    end_date = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='active')  # active(占用中), released(已释放)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class RentalItemUtilization(db.Model):
+    """商品月度出租率汇总（由租赁分析任务生成）"""
+    __tablename__ = 'rental_item_utilization'
+    __table_args__ = (
+        db.UniqueConstraint('item_id', 'month', name='_item_month_uc'),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('item_categories.id'))
+    month = db.Column(db.String(7), nullable=False)  # 格式：YYYY-MM
+    available_days = db.Column(db.Integer, nullable=False, default=0)  # 当月可出租天数（上架后的天数）
+    occupied_days = db.Column(db.Integer, nullable=False, default=0)  # 当月被租用天数
+    occupancy_rate = db.Column(db.Float, nullable=False, default=0)  # 出租率
+    revenue = db.Column(db.Float, nullable=False, default=0)  # 当月租金收入（按天分摊）
+    revenue_per_item_day = db.Column(db.Float, nullable=False, default=0)  # 每可出租天的收入
+    rental_count = db.Column(db.Integer, nullable=False, default=0)  # 当月开始的租赁笔数
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """将出租率汇总转换为字典"""
+        return {
+            'item_id': self.item_id,
+            'category_id': self.category_id,
+            'month': self.month,
+            'available_days': self.available_days,
+            'occupied_days': self.occupied_days,
+            'occupancy_rate': self.occupancy_rate,
+            'revenue': self.revenue,
+            'revenue_per_item_day': self.revenue_per_item_day,
+            'rental_count': self.rental_count
+        }
+
+
+class RentalCategorySeasonality(db.Model):
+    """分类月度出租率汇总，用于观察季节性（由租赁分析任务生成）"""
+    __tablename__ = 'rental_category_seasonality'
+    __table_args__ = (
+        db.UniqueConstraint('category_id', 'month', name='_category_month_uc'),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('item_categories.id'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # 格式：YYYY-MM
+    item_count = db.Column(db.Integer, nullable=False, default=0)  # 当月可出租的商品数
+    available_days = db.Column(db.Integer, nullable=False, default=0)
+    occupied_days = db.Column(db.Integer, nullable=False, default=0)
+    occupancy_rate = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    revenue_per_item_day = db.Column(db.Float, nullable=False, default=0)
+    rental_count = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        """将分类汇总转换为字典"""
+        return {
+            'category_id': self.category_id,
+            'month': self.month,
+            'item_count': self.item_count,
+            'available_days': self.available_days,
+            'occupied_days': self.occupied_days,
+            'occupancy_rate': self.occupancy_rate,
+            'revenue': self.revenue,
+            'revenue_per_item_day': self.revenue_per_item_day,
+            'rental_count': self.rental_count
+        }
@@ -0,0 +1,153 @@
+import json
+import math
+import time
+from datetime import datetime
+from sqlalchemy import or_, and_
+from flask import current_app
+from app import db
+from app.modules.transaction.models import Transaction
+from app.modules.rental.models import RentalContract
+from app.modules.user import ledger
+from app.modules.user.models_message import Message
+from app.modules.admin.models import SystemLog
+
+
+def compute_penalty(deposit, end_date, now, percent_per_day):
+    """按逾期天数（不足一天按一天）计算违约金，最多扣完押金"""
+    overdue_days = math.ceil((now - end_date).total_seconds() / 86400)
+    return min(deposit, deposit * percent_per_day * overdue_days // 100), overdue_days
+
+
+def settle_overdue_rentals(batch_size=None, percent_per_day=None, now=None):
+    """逾期租赁结算
+
+    查找租期已结束仍未归还的进行中合同（走(status, end_date)索引），按批次：
+    标记为逾期、按押金比例累计违约金、把新增违约金从托管押金转给出租方、
+    批量写入站内消息，每批提交一次。违约金扣满押金时合同标记为违约。
+    每次运行的统计信息写入系统日志并返回。
+    """
+    if batch_size is None:
+        batch_size = current_app.config.get('RENTAL_OVERDUE_BATCH_SIZE', 200)
+    if percent_per_day is None:
+        percent_per_day = current_app.config.get('RENTAL_OVERDUE_PENALTY_PERCENT', 10)
+    now = now or datetime.utcnow()
+
+    metrics = {
+        'scanned': 0,
+        'newly_overdue': 0,
+        'penalized': 0,
+        'penalty_total': 0,
+        'broken': 0,
+        'chunks': 0
+    }
+    started = time.perf_counter()
+
+    # 处理后的记录仍可能满足条件（违约金未扣满），按(end_date, id)键集分页推进
+    last_end_date, last_id = None, 0
+    while True:
+        query = db.session.query(
+            Transaction.id, Transaction.buyer_id, Transaction.seller_id,
+            Transaction.deposit_paid, Transaction.end_date,
+            RentalContract.id.label('contract_id'), RentalContract.return_status, RentalContract.penalty_amount
+        ).join(RentalContract, RentalContract.transaction_id == Transaction.id).filter(
+            Transaction.status == 'paid',
+            Transaction.end_date < now,
+            Transaction.transaction_type == 'rent',
+            RentalContract.contract_status == 'active',
+            or_(RentalContract.return_status.is_(None), RentalContract.return_status != 'returned')
+        )
+        if last_end_date is not None:
+            query = query.filter(or_(
+                Transaction.end_date > last_end_date,
+                and_(Transaction.end_date == last_end_date, Transaction.id > last_id)
+            ))
+        rows = query.order_by(Transaction.end_date, Transaction.id).limit(batch_size).with_for_update(
+            skip_locked=True
+        ).all()
+        if not rows:
+            db.session.rollback()
+            break
+
+        _settle_chunk(rows, now, percent_per_day, metrics)
+        db.session.commit()
+
+        metrics['scanned'] += len(rows)
+        metrics['chunks'] += 1
+        last_end_date, last_id = rows[-1].end_date, rows[-1].id
+
+    metrics['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+
+    db.session.add(SystemLog(
+        log_type='system_event',
+        action='settle_overdue_rentals',
+        details=json.dumps(metrics, ensure_ascii=False)
+    ))
+    db.session.commit()
+
+    current_app.logger.info(
+        f"逾期租赁结算: 扫描 {metrics['scanned']} 笔, 新增逾期 {metrics['newly_overdue']} 笔, "
+        f"扣除违约金 {metrics['penalty_total']}, 违约 {metrics['broken']} 笔, 耗时 {metrics['elapsed_seconds']}s"
+    )
+    return metrics
+
+
+def _settle_chunk(rows, now, percent_per_day, metrics):
+    """结算一批逾期合同：合同更新、出租方入账和站内消息各批量写入一次"""
+    contract_updates = []
+    credits = []
+    messages = []
+
+    for row in rows:
+        deposit = row.deposit_paid or 0
+        penalty, overdue_days = compute_penalty(deposit, row.end_date, now, percent_per_day)
+        delta = penalty - (row.penalty_amount or 0)
+        newly_overdue = row.return_status != 'overdue'
+
+        if not newly_overdue and delta <= 0:
+            continue
+
+        update = {'id': row.contract_id, 'return_status': 'overdue', 'penalty_amount': penalty, 'updated_at': now}
+        if deposit and penalty >= deposit:
+            update.update({'contract_status': 'broken', 'is_breach': True, 'breach_reason': '逾期未归还，押金已扣完'})
+            metrics['broken'] += 1
+        contract_updates.append(update)
+
+        if newly_overdue:
+            metrics['newly_overdue'] += 1
+
+        if delta > 0:
+            metrics['penalized'] += 1
+            metrics['penalty_total'] += delta
+            credits.append({
+                'user_id': row.seller_id,
+                'amount': delta,
+                'type': 'overdue_penalty',
+                'related_id': row.id,
+                'description': f'租赁逾期{overdue_days}天违约金'
+            })
+            messages.append({
+                'user_id': row.seller_id,
+                'title': '租赁逾期违约金到账',
+                'content': f'订单 {row.id} 已逾期{overdue_days}天，本次从押金中扣除违约金 {delta} 校园币转入您的账户。',
+                'message_type': 'rental_overdue',
+                'related_id': row.id,
+                'is_read': False,
+                'created_at': now
+            })
+
+        messages.append({
+            'user_id': row.buyer_id,
+            'title': '租赁已逾期',
+            'content': f'订单 {row.id} 已逾期{overdue_days}天，累计违约金 {penalty} 校园币将从押金 {deposit} 中扣除，请尽快归还。',
+            'message_type': 'rental_overdue',
+            'related_id': row.id,
+            'is_read': False,
+            'created_at': now
+        })
+
+    if contract_updates:
+        db.session.bulk_update_mappings(RentalContract, contract_updates)
+    if credits:
+        ledger.credit_many(credits)
+    if messages:
+        db.session.bulk_insert_mappings(Message, messages)
@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+# 商品未设置最长租赁天数时使用的默认值
+DEFAULT_MAX_RENTAL_DAYS = 30
+
+# 计价单位：(名称, 天数)
+UNITS = (('month', 30), ('week', 7), ('day', 1))
+
+
+def max_rental_days(item):
+    """商品允许的最长租赁天数"""
+    return item.max_rental_days or DEFAULT_MAX_RENTAL_DAYS
+
+
+def price_table(item):
+    """返回商品1到最长租赁天数的报价表，table[d]为租d天的报价，无法报价时为None
+
+    报价表只依赖日租、周租、月租和最长天数，按这些参数缓存，
+    卖家修改价格后参数变化，自然使用新的报价表。
+    """
+    return _build_table(
+        _rate(item.rental_price_day),
+        _rate(item.rental_price_week),
+        _rate(item.rental_price_month),
+        max_rental_days(item)
+    )
+
+
+def parse_days(value):
+    """把请求中的租赁天数（整数或数字字符串）转换为int，格式不正确时返回None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        return int(value.strip())
+    return None
+
+
+def quote(item, days):
+    """计算租赁days天的最低租金，返回报价字典；天数格式不正确、超出范围或无法报价时返回None
+
+    days可以是整数或数字字符串（来自查询参数或JSON）。
+    """
+    days = parse_days(days)
+    if days is None or days < 1 or days > max_rental_days(item):
+        return None
+    return price_table(item)[days]
+
+
+def _rate(value):
+    """未设置或为0的价格视为不提供该计价单位"""
+    return value if value and value > 0 else None
+
+
+@lru_cache(maxsize=1024)
+def _build_table(day_rate, week_rate, month_rate, max_days):
+    """动态规划计算每个天数的最低租金组合
+
+    cost[d]为覆盖至少d天的最低价格，允许用整周或整月覆盖零头天数
+    （例如5天按日租比一周贵时直接按一周计价）。
+    """
+    rates = {'day': day_rate, 'week': week_rate, 'month': month_rate}
+    units = [(name, length, rates[name]) for name, length in UNITS if rates[name] is not None]
+
+    cost = [0] + [None] * max_days
+    choice = [None] * (max_days + 1)
+    for d in range(1, max_days + 1):
+        for name, length, rate in units:
+            previous = cost[max(d - length, 0)]
+            if previous is None:
+                continue
+            if cost[d] is None or previous + rate < cost[d]:
+                cost[d] = previous + rate
+                choice[d] = (name, length)
+
+    table = [None] * (max_days + 1)
+    for d in range(1, max_days + 1):
+        if cost[d] is None:
+            continue
+        counts = {'months': 0, 'weeks': 0, 'days': 0}
+        remaining = d
+        while remaining > 0:
+            name, length = choice[remaining]
+            counts[name + 's'] += 1
+            remaining = max(remaining - length, 0)
+        table[d] = {'days': d, 'price': cost[d], 'combination': counts}
+    return tuple(table)
@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from app import db
@@ -6,6 +6,13 @@ from app.modules.item.models import Item
 from app.modules.transaction.models import Transaction
 from app.modules.user.models import User
 from app.modules.rental.models import RentalContract
+from app.modules.user import ledger, reputation
+from app.modules.user.ledger import InsufficientCoinsError
+from app.utils.idempotency import idempotent
+from app.utils import deadlines, reference_data
+from app.modules.rental.deadlines import PAYMENT_TIMEOUT, RENTAL_OVERDUE
+from app.modules.rental import calendar, pricing, analytics
+from app.modules.rental.calendar import BookingConflictError
 
 rental_bp = Blueprint('rental', __name__)
 
@@ -42,7 +49,7 @@ def get_rental_items():
         item_dict['seller'] = {
             'id': item.user.id,
             'username': item.user.username,
-            'campus': item.user.campus.name if item.user.campus else None
+            'campus': reference_data.campus_name(item.user.campus_id)
         }
         result.append(item_dict)
     
@@ -55,16 +62,29 @@ def get_rental_items():
 
 @rental_bp.route('/request', methods=['POST'])
 @jwt_required()
+@idempotent
 def request_rental():
     """请求租赁商品"""
     user_id = get_jwt_identity()
     data = request.get_json()
     
     item_id = data.get('item_id')
-    rental_days = data.get('rental_days', 1)
-    start_date = datetime.strptime(data.get('start_date'), '%Y-%m-%d')
+    rental_days = pricing.parse_days(data.get('rental_days', 1))
     meeting_location = data.get('meeting_location')
     
+    try:
+        start_date = datetime.strptime(data.get('start_date'), '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return jsonify({'error': '开始日期格式不正确，应为YYYY-MM-DD'}), 400
+    
+    # 只能预订今天起一定天数内的档期
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    horizon_days = current_app.config.get('RENTAL_BOOKING_HORIZON_DAYS', 180)
+    if start_date < today or start_date > today + timedelta(days=horizon_days):
+        return jsonify({'error': f'开始日期须在今天起{horizon_days}天内'}), 400
+    if rental_days is None or rental_days < 1:
+        return jsonify({'error': '租赁天数不正确'}), 400
+    
     # 检查商品
     item = Item.query.get_or_404(item_id)
     if item.status != 'active' or item.transaction_type != 'rent':
@@ -73,15 +93,15 @@ def request_rental():
     if item.user_id == user_id:
         return jsonify({'error': '不能租赁自己的商品'}), 400
     
-    # 计算租赁费用和押金
-    if rental_days <= 7:
-        rental_price = item.rental_price_day * rental_days
-    elif rental_days <= 30:
-        rental_price = item.rental_price_week * (rental_days // 7) + item.rental_price_day * (rental_days % 7)
-    else:
-        rental_price = item.rental_price_month * (rental_days // 30) + item.rental_price_day * (rental_days % 30)
+    # 计算租赁费用和押金（与下单接口使用同一报价表）
+    quote = pricing.quote(item, rental_days)
+    if quote is None:
+        if rental_days > pricing.max_rental_days(item):
+            return jsonify({'error': f'租赁天数不能超过{pricing.max_rental_days(item)}天'}), 400
+        return jsonify({'error': '商品未设置租金'}), 400
     
-    deposit = item.deposit
+    rental_price = quote['price']
+    deposit = item.deposit or 0
     total_amount = rental_price + deposit
     
     # 检查余额
@@ -110,7 +130,15 @@ def request_rental():
     try:
         db.session.add(transaction)
         db.session.add(contract)
-        item.status = 'rented'  # 更新商品状态为已出租
+        db.session.flush()  # 获取交易ID
+        
+        # 占用档期，商品保持上架状态，其他时间段仍可预订
+        calendar.book(item.id, transaction.id, transaction.start_date, transaction.end_date)
+        
+        # 登记卖家确认超时和租期结束两个截止时间
+        confirm_hours = current_app.config.get('RENTAL_CONFIRM_TIMEOUT_HOURS', 24)
+        deadlines.schedule(PAYMENT_TIMEOUT, transaction.id, datetime.utcnow() + timedelta(hours=confirm_hours))
+        deadlines.schedule(RENTAL_OVERDUE, transaction.id, transaction.end_date)
         db.session.commit()
         
         return jsonify({
@@ -120,6 +148,9 @@ def request_rental():
             'rental_price': rental_price,
             'deposit': deposit
         }), 201
+    except BookingConflictError:
+        db.session.rollback()
+        return jsonify({'error': '所选时间段已被预订'}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -140,23 +171,43 @@ def confirm_rental(transaction_id):
     if transaction.status != 'pending':
         return jsonify({'error': '交易状态不正确'}), 400
     
-    # 更新交易状态
-    transaction.status = 'paid'
-    transaction.paid_at = datetime.utcnow()
-    
-    # 转移虚拟币
-    buyer = User.query.get(transaction.buyer_id)
-    seller = User.query.get(transaction.seller_id)
-    
-    # 租金转给卖家，押金暂时不转
-    seller.coins += transaction.amount - transaction.deposit_paid
-    buyer.coins -= transaction.amount
+    def collect_payment():
+        # 以状态为条件更新，避免重复确认导致重复扣款
+        confirmed = Transaction.query.filter_by(id=transaction_id, status='pending').update({
+            'status': 'paid',
+            'paid_at': datetime.utcnow()
+        }, synchronize_session=False)
+        if confirmed != 1:
+            return False
+        
+        deadlines.cancel(PAYMENT_TIMEOUT, transaction_id)
+        
+        # 买家支付租金和押金（余额检查与扣减在同一条UPDATE中完成）
+        ledger.debit(
+            transaction.buyer_id,
+            transaction.amount,
+            'rental_payment',
+            related_id=transaction_id,
+            description='租赁商品支付'
+        )
+        
+        # 租金转给卖家，押金暂时不转
+        ledger.credit(
+            transaction.seller_id,
+            transaction.amount - transaction.deposit_paid,
+            'rental_income',
+            related_id=transaction_id,
+            description='出租商品收款'
+        )
+        return True
     
     try:
-        db.session.commit()
+        if not ledger.run_atomic(collect_payment):
+            return jsonify({'error': '交易状态不正确'}), 400
         return jsonify({'message': '交易已确认'}), 200
+    except InsufficientCoinsError:
+        return jsonify({'error': '买家虚拟币余额不足'}), 400
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @rental_bp.route('/<int:transaction_id>/return', methods=['POST'])
@@ -176,42 +227,143 @@ def return_item(transaction_id):
     if not contract:
         return jsonify({'error': '找不到租赁合同'}), 404
     
-    # 更新合同状态
-    contract.return_status = 'returned'
-    contract.actual_return_date = datetime.utcnow()
-    contract.item_condition_after = data.get('item_condition_after')
-    
-    # 如果有损坏描述，设置相应状态
-    if data.get('damage_description'):
-        contract.damage_description = data.get('damage_description')
-        contract.is_breach = True
-        contract.breach_reason = '商品损坏'
-    
-    # 更新交易状态为已完成
-    transaction.status = 'completed'
-    transaction.completed_at = datetime.utcnow()
-    
-    # 更新商品状态为可租赁
-    item = Item.query.get(transaction.item_id)
-    item.status = 'active'
-    
-    # 退还押金（如果没有损坏）
-    buyer = User.query.get(transaction.buyer_id)
-    if not contract.is_breach:
-        buyer.coins += transaction.deposit_paid
-    else:
-        # 有损坏，押金转给卖家作为赔偿
-        seller = User.query.get(transaction.seller_id)
-        seller.coins += transaction.deposit_paid
+    def settle_return():
+        # 以状态为条件更新，避免重复归还导致押金被重复退还
+        returned = Transaction.query.filter_by(id=transaction_id, status='paid').update({
+            'status': 'completed',
+            'completed_at': datetime.utcnow()
+        }, synchronize_session=False)
+        if returned != 1:
+            return None
+        
+        # 重新加锁读取合同，拿到逾期结算任务最新写入的违约金
+        db.session.refresh(contract, with_for_update=True)
+        
+        # 双方的已完成交易数加一
+        reputation.bump(transaction.buyer_id, completed=1)
+        reputation.bump(transaction.seller_id, completed=1)
+        
+        deadlines.cancel(RENTAL_OVERDUE, transaction_id)
+        
+        # 提前归还时释放剩余档期
+        calendar.release(transaction_id)
+        
+        # 更新合同状态
+        contract.return_status = 'returned'
+        contract.actual_return_date = datetime.utcnow()
+        contract.item_condition_after = data.get('item_condition_after')
+        
+        # 如果有损坏描述，设置相应状态
+        if data.get('damage_description'):
+            contract.damage_description = data.get('damage_description')
+            contract.is_breach = True
+            contract.breach_reason = '商品损坏'
+        
+        # 更新商品状态为可租赁
+        item = Item.query.get(transaction.item_id)
+        item.status = 'active'
+        
+        # 逾期违约金已由逾期结算任务从押金转给出租方，这里只处理剩余押金
+        remaining_deposit = (transaction.deposit_paid or 0) - (contract.penalty_amount or 0)
+        
+        if remaining_deposit > 0 and not contract.is_breach:
+            # 退还押金（如果没有损坏）
+            ledger.credit(
+                transaction.buyer_id,
+                remaining_deposit,
+                'deposit_refund',
+                related_id=transaction_id,
+                description='租赁押金退还'
+            )
+        elif remaining_deposit > 0:
+            # 有损坏，押金转给卖家作为赔偿
+            ledger.credit(
+                transaction.seller_id,
+                remaining_deposit,
+                'deposit_compensation',
+                related_id=transaction_id,
+                description='租赁押金赔偿'
+            )
+        return not contract.is_breach
     
     try:
-        db.session.commit()
+        deposit_refunded = ledger.run_atomic(settle_return)
+        if deposit_refunded is None:
+            return jsonify({'error': '交易状态不正确'}), 400
         return jsonify({
             'message': '商品已归还',
-            'deposit_refunded': not contract.is_breach
+            'deposit_refunded': deposit_refunded
         }), 200
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@rental_bp.route('/<int:item_id>/quote', methods=['GET'])
+def get_quote(item_id):
+    """批量报价：days=N返回1到N天的报价，days=M..N返回M到N天的报价"""
+    item = Item.query.get_or_404(item_id)
+    if item.transaction_type != 'rent':
+        return jsonify({'error': '该商品不可租赁'}), 400
+    
+    max_days = pricing.max_rental_days(item)
+    days = request.args.get('days', str(max_days))
+    try:
+        if '..' in days:
+            first, last = (int(value) for value in days.split('..', 1))
+        else:
+            first, last = 1, int(days)
+    except ValueError:
+        return jsonify({'error': '天数格式不正确'}), 400
+    
+    if first < 1 or last < first or last > max_days:
+        return jsonify({'error': f'天数须在1-{max_days}之间'}), 400
+    
+    table = pricing.price_table(item)
+    
+    return jsonify({
+        'item_id': item.id,
+        'deposit': item.deposit or 0,
+        'max_rental_days': max_days,
+        'quotes': [table[d] for d in range(first, last + 1) if table[d] is not None]
+    }), 200
+
+
+@rental_bp.route('/items/<int:item_id>/availability', methods=['GET'])
+def get_availability(item_id):
+    """获取商品未来若干天的空闲时间段"""
+    days = request.args.get('days', 30, type=int)
+    horizon_days = current_app.config.get('RENTAL_BOOKING_HORIZON_DAYS', 180)
+    
+    if days < 1 or days > horizon_days:
+        return jsonify({'error': f'天数须在1-{horizon_days}之间'}), 400
+    
+    item = Item.query.get_or_404(item_id)
+    if item.transaction_type != 'rent':
+        return jsonify({'error': '该商品不可租赁'}), 400
+    
+    free, booked = calendar.free_windows(item.id, days)
+    
+    return jsonify({
+        'item_id': item.id,
+        'days': days,
+        'free_windows': [{'start_date': start.isoformat(), 'end_date': end.isoformat()} for start, end in free],
+        'booked_windows': [{'start_date': start.isoformat(), 'end_date': end.isoformat()} for start, end in booked]
+    }), 200
+
+@rental_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def get_rental_analytics():
+    """获取当前用户出租商品的月度出租率和分类季节性（读取租赁分析任务生成的汇总表）"""
+    user_id = get_jwt_identity()
+    months = request.args.get('months', 6, type=int)
+    item_id = request.args.get('item_id', type=int)
+    
+    if months < 1 or months > 24:
+        return jsonify({'error': '月数须在1-24之间'}), 400
+    
+    return jsonify({
+        'months': months,
+        'items': analytics.get_item_utilization(months, owner_id=user_id, item_id=item_id),
+        'categories': analytics.get_category_seasonality(months)
+    }), 200
+
 # 其他API如获取租赁记录、延长租期等
\ No newline at end of file
@@ -0,0 +1,133 @@
+import threading
+import time
+from flask import current_app
+from app.modules.request.models import ItemRequest
+from app.utils import reference_data
+
+
+# 每条求购信息摘要的最大长度
+CONTENT_PREVIEW_LENGTH = 100
+
+# 标签数量和单个标签长度限制
+MAX_TAGS = 5
+MAX_TAG_LENGTH = 20
+
+# 全部校区的动态使用的键
+ALL_CAMPUSES = None
+
+
+class _Ring:
+    """按(created_at, id)倒序保存的定长最新求购列表
+
+    complete为True表示该范围内所有有效求购都在环中（数量不足容量），
+    此时删除条目不会丢数据；否则删除后需要重新从数据库加载补齐。
+    """
+
+    def __init__(self, capacity, entries, loaded_at):
+        self.capacity = capacity
+        self.entries = entries
+        self.complete = len(entries) < capacity
+        self.loaded_at = loaded_at
+
+    def add(self, entry):
+        key = (entry['createdAt'], entry['id'])
+        index = 0
+        while index < len(self.entries) and (self.entries[index]['createdAt'], self.entries[index]['id']) > key:
+            index += 1
+        self.entries.insert(index, entry)
+        if len(self.entries) > self.capacity:
+            self.entries.pop()
+            self.complete = False
+
+    def remove(self, request_id):
+        """删除条目，返回环是否仍然可用"""
+        remaining = [entry for entry in self.entries if entry['id'] != request_id]
+        if len(remaining) == len(self.entries):
+            return True
+        self.entries = remaining
+        return self.complete
+
+
+_rings = {}
+_lock = threading.Lock()
+
+
+def normalize_tags(tags):
+    """把标签列表或逗号分隔的字符串整理为存储格式，去重并限制数量和长度"""
+    if not tags:
+        return None
+    if isinstance(tags, str):
+        tags = tags.replace('，', ',').split(',')
+
+    result = []
+    for tag in tags:
+        tag = str(tag).strip()[:MAX_TAG_LENGTH]
+        if tag and tag not in result:
+            result.append(tag)
+    return ','.join(result[:MAX_TAGS]) or None
+
+
+def to_feed_entry(item_request):
+    """求购信息在最新动态中的展示格式"""
+    min_price, max_price = item_request.price_range
+    description = item_request.description or ''
+    if len(description) > CONTENT_PREVIEW_LENGTH:
+        description = description[:CONTENT_PREVIEW_LENGTH] + '...'
+    return {
+        'id': item_request.id,
+        'title': item_request.title,
+        'content': description,
+        'tags': item_request.tag_list,
+        'minPrice': min_price,
+        'maxPrice': max_price,
+        'campusId': item_request.campus_id,
+        'createdAt': int(item_request.created_at.timestamp() * 1000)
+    }
+
+
+def latest(campus_id=ALL_CAMPUSES, limit=10):
+    """获取最新的有效求购信息
+
+    优先从内存环读取；环未加载或超过LATEST_REQUESTS_TTL_SECONDS时，
+    按(status, created_at)索引查询一次并填充环。TTL用于让各进程
+    最终看到其他进程写入的变更。
+    只为存在的校区建立环，避免随意传入的campus_id让环的数量无限增长。
+    """
+    capacity = current_app.config.get('LATEST_REQUESTS_RING_SIZE', 50)
+    ttl = current_app.config.get('LATEST_REQUESTS_TTL_SECONDS', 60)
+    limit = min(limit, capacity)
+
+    if campus_id is not ALL_CAMPUSES and reference_data.campus(campus_id) is None:
+        return []
+
+    with _lock:
+        ring = _rings.get(campus_id)
+        if ring is not None and time.monotonic() - ring.loaded_at < ttl:
+            return ring.entries[:limit]
+
+    entries = _load(campus_id, capacity)
+    with _lock:
+        _rings[campus_id] = _Ring(capacity, entries, time.monotonic())
+    return entries[:limit]
+
+
+def publish(item_request):
+    """求购信息创建或修改后更新内存环（在事务提交之后调用）"""
+    entry = to_feed_entry(item_request) if item_request.status == 'active' else None
+    with _lock:
+        for campus_id in list(_rings):
+            ring = _rings[campus_id]
+            if not ring.remove(item_request.id):
+                # 环中的数据已不完整，下次读取时重新加载
+                del _rings[campus_id]
+                continue
+            if entry and campus_id in (ALL_CAMPUSES, item_request.campus_id):
+                ring.add(entry)
+
+
+def _load(campus_id, capacity):
+    query = ItemRequest.query.filter_by(status='active')
+    if campus_id is not ALL_CAMPUSES:
+        query = query.filter_by(campus_id=campus_id)
+    rows = query.order_by(ItemRequest.created_at.desc(), ItemRequest.id.desc()).limit(capacity).all()
+    return [to_feed_entry(row) for row in rows]
@@ -1,17 +1,29 @@
 from datetime import datetime
 from app import db
+from app.utils import reference_data
 
 
 class ItemRequest(db.Model):
     """求购信息模型"""
     __tablename__ = 'item_requests'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_item_requests_status_created_at', 'status', 'created_at'),  # 最新求购信息
+        {'extend_existing': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     expected_price = db.Column(db.Integer, nullable=False)  # 期望价格（虚拟币）
+    min_price = db.Column(db.Integer)  # 可接受的最低价格，未设置时同期望价格
+    max_price = db.Column(db.Integer)  # 可接受的最高价格，未设置时同期望价格
+    tags = db.Column(db.String(200))  # 标签，逗号分隔
+    
+    # 报价汇总（随报价同一事务维护）
+    response_count = db.Column(db.Integer, nullable=False, default=0)  # 收到的报价数
+    best_offer_amount = db.Column(db.Integer)  # 未被拒绝的报价中的最低价
+    last_response_at = db.Column(db.DateTime)  # 最近一次报价时间
     category_id = db.Column(db.Integer, db.ForeignKey('item_categories.id'), nullable=False)
     
     # 专业和校区范围
@@ -27,6 +39,18 @@ class ItemRequest(db.Model):
     # 关系
     request_responses = db.relationship('RequestResponse', backref='item_request', lazy=True, cascade='all, delete-orphan')
     
+    @property
+    def tag_list(self):
+        return self.tags.split(',') if self.tags else []
+    
+    @property
+    def price_range(self):
+        """可接受的价格区间(最低价, 最高价)"""
+        return (
+            self.min_price if self.min_price is not None else self.expected_price,
+            self.max_price if self.max_price is not None else self.expected_price
+        )
+    
     def to_dict(self):
         """将求购信息对象转换为字典"""
         return {
@@ -35,14 +59,20 @@ class ItemRequest(db.Model):
             'title': self.title,
             'description': self.description,
             'expected_price': self.expected_price,
+            'min_price': self.price_range[0],
+            'max_price': self.price_range[1],
+            'tags': self.tag_list,
+            'response_count': self.response_count or 0,
+            'best_offer_amount': self.best_offer_amount,
+            'last_response_at': self.last_response_at.isoformat() if self.last_response_at else None,
             'category_id': self.category_id,
             'major_id': self.major_id,
             'campus_id': self.campus_id,
             'status': self.status,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'major_name': self.major.name if self.major else None,
-            'campus_name': self.campus.name if self.campus else None
+            'major_name': reference_data.major_name(self.major_id),
+            'campus_name': reference_data.campus_name(self.campus_id)
         }
 
 
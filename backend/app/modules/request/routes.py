@@ -3,7 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
 from app import db
 from app.modules.request.models import ItemRequest, RequestResponse
-from app.modules.item.models import ItemCategory
+from app.utils import reference_data
+from app.modules.request import feed, stats
 
 # 创建蓝图
 request_bp = Blueprint('request', __name__)
@@ -31,12 +32,35 @@ def create_item_request():
     if 'campus_id' in data:
         item_request.campus_id = data['campus_id']
     
+    # 设置标签和价格区间
+    item_request.tags = feed.normalize_tags(data.get('tags'))
+    error = _set_price_range(item_request, data)
+    if error:
+        return jsonify({'message': error}), 400
+    
     db.session.add(item_request)
     db.session.commit()
+    feed.publish(item_request)
     
     return jsonify({'message': '求购信息发布成功', 'request_id': item_request.id}), 201
 
 
+def _set_price_range(item_request, data):
+    """设置可接受的价格区间，返回错误信息，区间合法时返回None"""
+    try:
+        if 'min_price' in data:
+            item_request.min_price = int(data['min_price']) if data['min_price'] is not None else None
+        if 'max_price' in data:
+            item_request.max_price = int(data['max_price']) if data['max_price'] is not None else None
+    except (TypeError, ValueError):
+        return '价格格式不正确'
+    
+    min_price, max_price = item_request.price_range
+    if min_price < 0 or min_price > max_price:
+        return '最低价格不能大于最高价格'
+    return None
+
+
 @request_bp.route('/', methods=['GET'])
 def get_item_requests():
     """获取求购信息列表，支持筛选和搜索"""
@@ -77,9 +101,7 @@ def get_item_requests():
     for item_request in requests:
         request_dict = item_request.to_dict()
         # 添加分类信息
-        category = ItemCategory.query.get(item_request.category_id)
-        if category:
-            request_dict['category_name'] = category.name
+        request_dict['category_name'] = reference_data.category_name(item_request.category_id)
         result.append(request_dict)
     
     return jsonify({
@@ -92,19 +114,14 @@ def get_item_requests():
 
 @request_bp.route('/latest', methods=['GET'])
 def get_latest_requests():
-    """获取最新求购信息"""
-    from datetime import datetime
-
-    # 暂时返回模拟数据
-    mock_requests = [
-        {'id': 1, 'title': '求购二手考研政治资料', 'content': '求购最新版考研政治全套资料...', 'tags': ['考研', '政治'], 'minPrice': 50, 'maxPrice': 150, 'createdAt': int(datetime.utcnow().timestamp() * 1000) - 3600000},
-        {'id': 2, 'title': '寻找二手专业相机', 'content': '求购一台入门级单反或微单相机...', 'tags': ['相机', '数码'], 'minPrice': 1500, 'maxPrice': 2500, 'createdAt': int(datetime.utcnow().timestamp() * 1000) - 7200000},
-        {'id': 3, 'title': '求购二手电动车', 'content': '求购一辆二手电动车，电池续航至少30公里...', 'tags': ['电动车', '出行'], 'minPrice': 800, 'maxPrice': 1500, 'createdAt': int(datetime.utcnow().timestamp() * 1000) - 10800000},
-        {'id': 4, 'title': '收购计算机专业教材', 'content': '收购计算机科学与技术专业大二教材...', 'tags': ['教材', '计算机'], 'minPrice': 100, 'maxPrice': 300, 'createdAt': int(datetime.utcnow().timestamp() * 1000) - 14400000},
-        {'id': 5, 'title': '求购二手空调', 'content': '求购一台1.5匹二手空调...', 'tags': ['电器', '空调'], 'minPrice': 800, 'maxPrice': 1200, 'createdAt': int(datetime.utcnow().timestamp() * 1000) - 18000000},
-    ]
-
-    return jsonify({'data': mock_requests}), 200
+    """获取最新的有效求购信息，可按校区筛选"""
+    campus_id = request.args.get('campus_id', type=int)
+    limit = request.args.get('limit', 10, type=int)
+    
+    if limit < 1:
+        return jsonify({'message': '数量必须大于0'}), 400
+    
+    return jsonify({'data': feed.latest(campus_id, limit)}), 200
 
 
 # get_my_requests函数将在后面定义
@@ -121,9 +138,7 @@ def get_item_request(request_id):
     request_dict = item_request.to_dict()
     
     # 添加分类信息
-    category = ItemCategory.query.get(item_request.category_id)
-    if category:
-        request_dict['category_name'] = category.name
+    request_dict['category_name'] = reference_data.category_name(item_request.category_id)
     
     return jsonify(request_dict), 200
 
@@ -160,8 +175,15 @@ def update_item_request(request_id):
         item_request.major_id = data['major_id']
     if 'campus_id' in data:
         item_request.campus_id = data['campus_id']
+    if 'tags' in data:
+        item_request.tags = feed.normalize_tags(data['tags'])
+    error = _set_price_range(item_request, data)
+    if error:
+        db.session.rollback()
+        return jsonify({'message': error}), 400
     
     db.session.commit()
+    feed.publish(item_request)
     
     return jsonify({'message': '求购信息已更新'}), 200
 
@@ -187,6 +209,7 @@ def change_request_status(request_id):
     
     item_request.status = data['status']
     db.session.commit()
+    feed.publish(item_request)
     
     message = '求购信息已取消' if data['status'] == 'canceled' else '求购信息已标记为已匹配'
     
@@ -253,6 +276,7 @@ def respond_to_request(request_id):
     )
     
     db.session.add(request_response)
+    stats.record_response(request_id, request_response.offer_amount, datetime.utcnow())
     db.session.commit()
     
     return jsonify({'message': '报价已提交'}), 201
@@ -296,8 +320,8 @@ def get_my_responses():
         response_dict['responder'] = {
             'id': response.responder.id,
             'username': response.responder.username,
-            'campus': response.responder.campus.name if response.responder.campus else None,
-            'major': response.responder.major.name if response.responder.major else None
+            'campus': reference_data.campus_name(response.responder.campus_id),
+            'major': reference_data.major_name(response.responder.major_id)
         }
         result.append(response_dict)
     
@@ -378,9 +402,15 @@ def respond_to_response(response_id):
     # 如果接受报价，更新求购信息状态为已匹配
     if data['action'] == 'accept':
         request_response.item_request.status = 'matched'
+    else:
+        db.session.flush()
+        stats.refresh_best_offer(request_response.request_id)
     
     db.session.commit()
     
+    if data['action'] == 'accept':
+        feed.publish(request_response.item_request)
+    
     message = '报价已接受' if data['action'] == 'accept' else '报价已拒绝'
     
     return jsonify({'message': message}), 200
\ No newline at end of file
@@ -0,0 +1,48 @@
+from sqlalchemy import update, case, func, select
+from app import db
+from app.modules.request.models import ItemRequest, RequestResponse
+
+
+def record_response(request_id, offer_amount, responded_at):
+    """新增报价后更新求购信息的汇总，与报价处于同一事务，由调用方提交
+
+    单条UPDATE累加响应数并取较低报价，并发报价不会丢失更新。
+    """
+    db.session.execute(update(ItemRequest).where(ItemRequest.id == request_id).values(
+        response_count=ItemRequest.response_count + 1,
+        best_offer_amount=case(
+            (ItemRequest.best_offer_amount.is_(None), offer_amount),
+            (ItemRequest.best_offer_amount > offer_amount, offer_amount),
+            else_=ItemRequest.best_offer_amount
+        ),
+        last_response_at=responded_at
+    ).execution_options(synchronize_session=False))
+
+
+def refresh_best_offer(request_id):
+    """报价被拒绝后，从未被拒绝的报价中重新计算最低报价（由调用方提交）"""
+    db.session.execute(update(ItemRequest).where(ItemRequest.id == request_id).values(
+        best_offer_amount=_best_offer_subquery(ItemRequest.id)
+    ).execution_options(synchronize_session=False))
+
+
+def rebuild_request_stats():
+    """根据报价记录全量重建求购信息的响应汇总（用于上线时回填或数据校正），返回更新的求购数"""
+    count = db.session.execute(update(ItemRequest).values(
+        response_count=select(func.count(RequestResponse.id)).where(
+            RequestResponse.request_id == ItemRequest.id
+        ).scalar_subquery(),
+        best_offer_amount=_best_offer_subquery(ItemRequest.id),
+        last_response_at=select(func.max(RequestResponse.created_at)).where(
+            RequestResponse.request_id == ItemRequest.id
+        ).scalar_subquery()
+    ).execution_options(synchronize_session=False)).rowcount
+    db.session.commit()
+    return count
+
+
+def _best_offer_subquery(request_id):
+    return select(func.min(RequestResponse.offer_amount)).where(
+        RequestResponse.request_id == request_id,
+        RequestResponse.status != 'rejected'
+    ).scalar_subquery()
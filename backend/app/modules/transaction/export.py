@@ -0,0 +1,108 @@
+import io
+import csv
+import json
+from datetime import datetime
+from flask import Response, stream_with_context
+from app import db
+from app.modules.transaction.models import Transaction
+from app.modules.item.models import Item
+
+
+# 导出的列：(列名, 查询字段)
+EXPORT_COLUMNS = [
+    ('id', Transaction.id),
+    ('item_id', Transaction.item_id),
+    ('item_name', Item.name),
+    ('buyer_id', Transaction.buyer_id),
+    ('seller_id', Transaction.seller_id),
+    ('amount', Transaction.amount),
+    ('status', Transaction.status),
+    ('transaction_type', Transaction.transaction_type),
+    ('rental_days', Transaction.rental_days),
+    ('start_date', Transaction.start_date),
+    ('end_date', Transaction.end_date),
+    ('deposit_paid', Transaction.deposit_paid),
+    ('created_at', Transaction.created_at),
+    ('paid_at', Transaction.paid_at),
+    ('completed_at', Transaction.completed_at),
+    ('canceled_at', Transaction.canceled_at),
+    ('meeting_location', Transaction.meeting_location),
+    ('buyer_rating', Transaction.buyer_rating),
+    ('buyer_comment', Transaction.buyer_comment),
+    ('seller_rating', Transaction.seller_rating),
+    ('seller_comment', Transaction.seller_comment)
+]
+
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# 每次向客户端输出的行数
+EXPORT_FLUSH_ROWS = 500
+
+
+def build_export_query(*filters):
+    """构建导出查询，只选择需要的列并按ID顺序读取"""
+    return db.session.query(*[column for _, column in EXPORT_COLUMNS]).join(
+        Item, Item.id == Transaction.item_id
+    ).filter(*filters).order_by(Transaction.id)
+
+
+def export_response(query, export_format, filename):
+    """以流式响应导出交易记录
+
+    使用服务端游标（yield_per）逐批读取，边读边输出，内存占用与记录总数无关。
+    """
+    rows = query.execution_options(yield_per=EXPORT_FLUSH_ROWS)
+
+    if export_format == 'jsonl':
+        generator = _jsonl_lines(rows)
+        mimetype = 'application/x-ndjson'
+    else:
+        generator = _csv_lines(rows)
+        mimetype = 'text/csv'
+
+    response = Response(stream_with_context(generator), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{export_format}'
+    return response
+
+
+def _serialize(value):
+    """日期时间转换为ISO格式字符串"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(rows):
+    """逐批生成CSV内容，首行带BOM便于Excel识别UTF-8"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow([name for name, _ in EXPORT_COLUMNS])
+
+    count = 0
+    for row in rows:
+        writer.writerow([_serialize(value) for value in row])
+        count += 1
+        if count % EXPORT_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue()
+
+
+def _jsonl_lines(rows):
+    """逐批生成JSON Lines内容，每行一条交易记录"""
+    names = [name for name, _ in EXPORT_COLUMNS]
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(
+            dict(zip(names, (_serialize(value) for value in row))),
+            ensure_ascii=False
+        ))
+        if len(chunk) >= EXPORT_FLUSH_ROWS:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
@@ -5,7 +5,11 @@ from app import db
 class Transaction(db.Model):
     """交易模型"""
     __tablename__ = 'transactions'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_transactions_status_paid_at', 'status', 'paid_at'),  # 托管超时自动结算
+        db.Index('ix_transactions_status_end_date', 'status', 'end_date'),  # 逾期租赁结算
+        {'extend_existing': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -71,14 +75,18 @@ class Transaction(db.Model):
 class Offer(db.Model):
     """还价模型"""
     __tablename__ = 'offers'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_offers_status_created_at', 'status', 'created_at'),  # 过期还价扫描
+        {'extend_existing': True}
+    )
     id = db.Column(db.Integer, primary_key=True)
     buyer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     item_id = db.Column(db.Integer, db.ForeignKey('items.id'), nullable=False)
     offer_amount = db.Column(db.Integer, nullable=False)  # 还价金额
-    status = db.Column(db.String(20), nullable=False, default='pending')  # pending(待回应), accepted(已接受), rejected(已拒绝)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending(待回应), accepted(已接受), rejected(已拒绝), expired(已过期)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     responded_at = db.Column(db.DateTime)  # 回应时间
+    auto_responded = db.Column(db.Boolean, default=False)  # 是否由卖家设置的阈值自动回应
     
     # 关系
     buyer = db.relationship('User', backref='offers_made')
@@ -92,7 +100,8 @@ class Offer(db.Model):
             'offer_amount': self.offer_amount,
             'status': self.status,
             'created_at': self.created_at.isoformat(),
-            'responded_at': self.responded_at.isoformat() if self.responded_at else None
+            'responded_at': self.responded_at.isoformat() if self.responded_at else None,
+            'auto_responded': self.auto_responded
         }
 
 
@@ -0,0 +1,112 @@
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.modules.transaction.models import Offer
+
+
+def parse_thresholds(auto_accept_price, auto_reject_price):
+    """解析并检查卖家设置的自动回应阈值，返回(自动接受阈值, 自动拒绝阈值, 错误信息)
+
+    表单提交的数字字符串和JSON整数都可接受；None或空字符串表示不设置。合法时错误信息为None。
+    """
+    values = []
+    for value in (auto_accept_price, auto_reject_price):
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                value = None
+            elif value.isascii() and value.isdigit():
+                value = int(value)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+            return None, None, '自动回应阈值必须为正整数'
+        values.append(value)
+    auto_accept_price, auto_reject_price = values
+    if auto_accept_price is not None and auto_reject_price is not None and auto_reject_price > auto_accept_price:
+        return None, None, '自动拒绝阈值不能高于自动接受阈值'
+    return auto_accept_price, auto_reject_price, None
+
+
+def evaluate_offer(item, offer_amount):
+    """根据卖家设置的阈值判断还价结果：accepted、rejected或pending（等待卖家回应）"""
+    if item.auto_accept_price is not None and offer_amount >= item.auto_accept_price:
+        return 'accepted'
+    if item.auto_reject_price is not None and offer_amount < item.auto_reject_price:
+        return 'rejected'
+    return 'pending'
+
+
+def accept_offer(offer_id, item_id, now=None, auto=False):
+    """接受还价，并用一条UPDATE拒绝该商品其余待回应的还价
+
+    以状态为条件更新，并发回应时只有一次能成功；返回是否接受成功。
+    与其他修改处于同一事务，由调用方提交。
+    """
+    now = now or datetime.utcnow()
+    accepted = Offer.query.filter_by(id=offer_id, status='pending').update({
+        'status': 'accepted',
+        'responded_at': now,
+        'auto_responded': auto
+    }, synchronize_session=False)
+    if accepted != 1:
+        return False
+
+    Offer.query.filter(
+        Offer.item_id == item_id,
+        Offer.status == 'pending',
+        Offer.id != offer_id
+    ).update({
+        'status': 'rejected',
+        'responded_at': now,
+        'auto_responded': True
+    }, synchronize_session=False)
+    return True
+
+
+def reject_offer(offer_id, now=None):
+    """拒绝还价，返回是否拒绝成功，由调用方提交"""
+    rejected = Offer.query.filter_by(id=offer_id, status='pending').update({
+        'status': 'rejected',
+        'responded_at': now or datetime.utcnow()
+    }, synchronize_session=False)
+    return rejected == 1
+
+
+def expire_stale_offers(expire_hours=None, batch_size=None, now=None):
+    """将超过expire_hours小时未回应的还价标记为已过期
+
+    按(status, created_at)索引分批读取ID，每批一条UPDATE并提交，
+    单个事务的锁范围与批次大小有关而与积压总量无关。返回本次运行的统计信息。
+    """
+    if expire_hours is None:
+        expire_hours = current_app.config.get('OFFER_EXPIRE_HOURS', 72)
+    if batch_size is None:
+        batch_size = current_app.config.get('OFFER_EXPIRE_BATCH_SIZE', 500)
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(hours=expire_hours)
+
+    metrics = {'cutoff': cutoff.isoformat(), 'expired': 0, 'chunks': 0}
+    started = time.perf_counter()
+
+    while True:
+        offer_ids = [row.id for row in db.session.query(Offer.id).filter(
+            Offer.status == 'pending',
+            Offer.created_at <= cutoff
+        ).order_by(Offer.created_at, Offer.id).limit(batch_size)]
+        if not offer_ids:
+            db.session.rollback()
+            break
+
+        # 卖家在读取之后回应的还价不再满足条件，不会被覆盖
+        metrics['expired'] += Offer.query.filter(
+            Offer.id.in_(offer_ids),
+            Offer.status == 'pending'
+        ).update({'status': 'expired', 'responded_at': now}, synchronize_session=False)
+        metrics['chunks'] += 1
+        db.session.commit()
+
+    metrics['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+    current_app.logger.info(
+        f"还价过期处理: 过期 {metrics['expired']} 条, 批次 {metrics['chunks']}, 耗时 {metrics['elapsed_seconds']}s"
+    )
+    return metrics
@@ -1,10 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timedelta
 from app import db
 from app.modules.transaction.models import Transaction, Offer, Complaint
 from app.modules.item.models import Item
-from app.modules.user.models import User, CoinLog
+from app.modules.user import ledger, reputation
+from app.modules.user.ledger import InsufficientCoinsError
+from app.utils.idempotency import idempotent
+from app.modules.transaction.export import EXPORT_FORMATS, build_export_query, export_response
+from app.modules.transaction import offers as offer_engine
+from app.utils import deadlines
+from app.modules.rental.deadlines import RENTAL_OVERDUE
+from app.modules.rental import calendar, pricing
+from app.modules.rental.calendar import BookingConflictError
 
 # 创建蓝图
 transaction_bp = Blueprint('transaction', __name__)
@@ -12,6 +20,7 @@ transaction_bp = Blueprint('transaction', __name__)
 
 @transaction_bp.route('/', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_transaction():
     """创建交易订单"""
     user_id = get_jwt_identity()
@@ -30,61 +39,58 @@ def create_transaction():
     if item.user_id == user_id:
         return jsonify({'message': '不能购买自己的商品'}), 400
     
-    # 获取买家和卖家信息
-    buyer = User.query.get(user_id)
-    seller = User.query.get(item.user_id)
-    
     # 计算交易金额
     if item.transaction_type == 'rent':
         # 租赁交易
-        rental_days = data.get('rental_days', 1)
-        if rental_days > item.max_rental_days:
-            return jsonify({'message': '租赁天数超过最大允许天数'}), 400
+        rental_days = pricing.parse_days(data.get('rental_days', 1))
+        if rental_days is None or rental_days < 1:
+            return jsonify({'message': '租赁天数不正确'}), 400
         
-        # 根据租赁天数计算租金
-        if rental_days == 1:
-            amount = item.rental_price_day
-        elif rental_days <= 7:
-            amount = item.rental_price_week
-        else:
-            # 按月计算
-            months = rental_days // 30
-            remaining_days = rental_days % 30
-            amount = months * item.rental_price_month + remaining_days * (item.rental_price_day)
+        # 根据租赁天数取最低租金组合（与租赁请求接口使用同一报价表）
+        quote = pricing.quote(item, rental_days)
+        if quote is None:
+            if rental_days > pricing.max_rental_days(item):
+                return jsonify({'message': '租赁天数超过最大允许天数'}), 400
+            return jsonify({'message': '商品未设置租金'}), 400
+        amount = quote['price']
         
         # 加上押金
-        total_amount = amount + item.deposit
-        
-        # 检查买家余额
-        if buyer.coins < total_amount:
-            return jsonify({'message': '校园币余额不足'}), 400
+        total_amount = amount + (item.deposit or 0)
         
-        # 创建交易记录
-        transaction = Transaction(
-            buyer_id=user_id,
-            seller_id=item.user_id,
-            item_id=item.id,
-            amount=amount,
-            deposit_paid=item.deposit,
-            transaction_type='rent',
-            rental_days=rental_days,
-            start_date=datetime.utcnow(),
-            end_date=datetime.utcnow() + timedelta(days=rental_days),
-            status='paid',
-            is_escrowed=True
-        )
-        
-        # 冻结买家资金
-        buyer.coins -= total_amount
-        
-        # 记录资金变动
-        coin_log = CoinLog(
-            user_id=user_id,
-            amount=-total_amount,
-            type='rental_payment',
-            related_id=transaction.id,
-            description=f'租赁商品 {item.name} 支付'
-        )
+        def place_order():
+            # 创建交易记录
+            transaction = Transaction(
+                buyer_id=user_id,
+                seller_id=item.user_id,
+                item_id=item.id,
+                amount=amount,
+                deposit_paid=item.deposit or 0,
+                transaction_type='rent',
+                rental_days=rental_days,
+                start_date=datetime.utcnow(),
+                end_date=datetime.utcnow() + timedelta(days=rental_days),
+                status='paid',
+                paid_at=datetime.utcnow(),
+                is_escrowed=True
+            )
+            db.session.add(transaction)
+            db.session.flush()  # 获取交易ID
+            
+            # 占用从现在开始的档期，与已有预订重叠时抛出BookingConflictError
+            calendar.book(item.id, transaction.id, transaction.start_date, transaction.end_date)
+            
+            # 租期结束时检查是否逾期
+            deadlines.schedule(RENTAL_OVERDUE, transaction.id, transaction.end_date)
+            
+            # 冻结买家资金（余额检查与扣减在同一条UPDATE中完成）
+            ledger.debit(
+                user_id,
+                total_amount,
+                'rental_payment',
+                related_id=transaction.id,
+                description=f'租赁商品 {item.name} 支付'
+            )
+            return transaction
         
     else:
         # 出售交易
@@ -96,36 +102,47 @@ def create_transaction():
                 return jsonify({'message': '无效的还价'}), 400
             final_price = offer.offer_amount
         
-        # 检查买家余额
-        if buyer.coins < final_price:
-            return jsonify({'message': '校园币余额不足'}), 400
-        
-        # 创建交易记录
-        transaction = Transaction(
-            buyer_id=user_id,
-            seller_id=item.user_id,
-            item_id=item.id,
-            amount=final_price,
-            transaction_type='sale',
-            status='paid',
-            is_escrowed=True
-        )
-        
-        # 冻结买家资金
-        buyer.coins -= final_price
-        
-        # 记录资金变动
-        coin_log = CoinLog(
-            user_id=user_id,
-            amount=-final_price,
-            type='purchase_payment',
-            related_id=transaction.id,
-            description=f'购买商品 {item.name} 支付'
-        )
-    
-    db.session.add(transaction)
-    db.session.add(coin_log)
-    db.session.commit()
+        def place_order():
+            # 以商品状态为条件占用商品，并发下单时只有一个买家能成功
+            reserved = Item.query.filter_by(id=item.id, status='active').update(
+                {'status': 'sold'}, synchronize_session=False
+            )
+            if reserved != 1:
+                return None
+            
+            # 创建交易记录
+            transaction = Transaction(
+                buyer_id=user_id,
+                seller_id=item.user_id,
+                item_id=item.id,
+                amount=final_price,
+                transaction_type='sale',
+                status='paid',
+                paid_at=datetime.utcnow(),
+                is_escrowed=True
+            )
+            db.session.add(transaction)
+            db.session.flush()  # 获取交易ID
+            
+            # 冻结买家资金（余额检查与扣减在同一条UPDATE中完成）
+            ledger.debit(
+                user_id,
+                final_price,
+                'purchase_payment',
+                related_id=transaction.id,
+                description=f'购买商品 {item.name} 支付'
+            )
+            return transaction
+    
+    try:
+        transaction = ledger.run_atomic(place_order)
+    except InsufficientCoinsError:
+        return jsonify({'message': '校园币余额不足'}), 400
+    except BookingConflictError:
+        return jsonify({'message': '该商品在所选时间段内已被预订'}), 409
+    
+    if transaction is None:
+        return jsonify({'message': '商品已被其他买家抢先下单'}), 409
     
     return jsonify({'message': '交易创建成功', 'transaction_id': transaction.id}), 201
 
@@ -148,35 +165,43 @@ def confirm_transaction(transaction_id):
     if transaction.status != 'paid':
         return jsonify({'message': '交易状态不正确'}), 400
     
-    # 更新交易状态
-    transaction.status = 'completed'
-    transaction.completed_at = datetime.utcnow()
-    transaction.escrow_released_at = datetime.utcnow()
-    
-    # 获取卖家信息
-    seller = User.query.get(transaction.seller_id)
-    
-    # 将资金转给卖家
-    seller.coins += transaction.amount
-    
-    # 记录资金变动
-    seller_coin_log = CoinLog(
-        user_id=seller.id,
-        amount=transaction.amount,
-        type='transaction_receipt',
-        related_id=transaction.id,
-        description=f'销售商品收款'
-    )
-    
-    # 更新商品状态
-    item = Item.query.get(transaction.item_id)
-    if transaction.transaction_type == 'sale':
-        item.status = 'sold'
-    else:
-        item.status = 'active'  # 租赁结束后商品可再次出租
+    def release_escrow():
+        # 以状态为条件更新，并发确认时只有一次能释放托管资金
+        now = datetime.utcnow()
+        released = Transaction.query.filter_by(id=transaction_id, status='paid').update({
+            'status': 'completed',
+            'completed_at': now,
+            'escrow_released_at': now
+        }, synchronize_session=False)
+        if released != 1:
+            return False
+        
+        # 双方的已完成交易数加一
+        reputation.bump(transaction.buyer_id, completed=1)
+        reputation.bump(transaction.seller_id, completed=1)
+        
+        # 租赁结束，释放剩余档期
+        calendar.release(transaction_id)
+        
+        # 将资金转给卖家
+        ledger.credit(
+            transaction.seller_id,
+            transaction.amount,
+            'transaction_receipt',
+            related_id=transaction_id,
+            description='销售商品收款'
+        )
+        
+        # 更新商品状态
+        item = Item.query.get(transaction.item_id)
+        if transaction.transaction_type == 'sale':
+            item.status = 'sold'
+        else:
+            item.status = 'active'  # 租赁结束后商品可再次出租
+        return True
     
-    db.session.add(seller_coin_log)
-    db.session.commit()
+    if not ledger.run_atomic(release_escrow):
+        return jsonify({'message': '交易状态不正确'}), 400
     
     return jsonify({'message': '交易已完成'}), 200
 
@@ -199,35 +224,38 @@ def cancel_transaction(transaction_id):
     if transaction.status != 'paid':
         return jsonify({'message': '交易状态不正确'}), 400
     
-    # 更新交易状态
-    transaction.status = 'canceled'
-    transaction.canceled_at = datetime.utcnow()
-    
-    # 获取买家信息
-    buyer = User.query.get(user_id)
-    
     # 退还买家资金
     refund_amount = transaction.amount
     if transaction.transaction_type == 'rent':
-        refund_amount += transaction.deposit
-    
-    buyer.coins += refund_amount
-    
-    # 记录资金变动
-    coin_log = CoinLog(
-        user_id=user_id,
-        amount=refund_amount,
-        type='transaction_refund',
-        related_id=transaction.id,
-        description=f'交易取消退款'
-    )
-    
-    # 更新商品状态
-    item = Item.query.get(transaction.item_id)
-    item.status = 'active'
+        refund_amount += transaction.deposit_paid or 0
+    
+    def refund():
+        # 以状态为条件更新，避免重复取消导致重复退款
+        canceled = Transaction.query.filter_by(id=transaction_id, status='paid').update({
+            'status': 'canceled',
+            'canceled_at': datetime.utcnow()
+        }, synchronize_session=False)
+        if canceled != 1:
+            return False
+        
+        deadlines.cancel(RENTAL_OVERDUE, transaction_id)
+        calendar.release(transaction_id)
+        
+        ledger.credit(
+            user_id,
+            refund_amount,
+            'transaction_refund',
+            related_id=transaction_id,
+            description='交易取消退款'
+        )
+        
+        # 更新商品状态
+        item = Item.query.get(transaction.item_id)
+        item.status = 'active'
+        return True
     
-    db.session.add(coin_log)
-    db.session.commit()
+    if not ledger.run_atomic(refund):
+        return jsonify({'message': '交易状态不正确'}), 400
     
     return jsonify({'message': '交易已取消，资金已退还'}), 200
 
@@ -313,6 +341,42 @@ def get_my_sales():
     }), 200
 
 
+@transaction_bp.route('/my/purchases/export', methods=['GET'])
+@jwt_required()
+def export_my_purchases():
+    """导出我的全部购买记录（format=csv或jsonl）"""
+    user_id = get_jwt_identity()
+    status = request.args.get('status')
+    export_format = request.args.get('format', 'csv')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': '不支持的导出格式'}), 400
+    
+    filters = [Transaction.buyer_id == user_id]
+    if status:
+        filters.append(Transaction.status == status)
+    
+    return export_response(build_export_query(*filters), export_format, 'purchases')
+
+
+@transaction_bp.route('/my/sales/export', methods=['GET'])
+@jwt_required()
+def export_my_sales():
+    """导出我的全部销售记录（format=csv或jsonl）"""
+    user_id = get_jwt_identity()
+    status = request.args.get('status')
+    export_format = request.args.get('format', 'csv')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': '不支持的导出格式'}), 400
+    
+    filters = [Transaction.seller_id == user_id]
+    if status:
+        filters.append(Transaction.status == status)
+    
+    return export_response(build_export_query(*filters), export_format, 'sales')
+
+
 @transaction_bp.route('/<int:transaction_id>/review', methods=['POST'])
 @jwt_required()
 def review_transaction(transaction_id):
@@ -328,58 +392,62 @@ def review_transaction(transaction_id):
     if transaction.status != 'completed':
         return jsonify({'message': '交易未完成，无法评价'}), 400
     
+    # 评分计入信誉汇总，必须为1-5的整数
+    rating = data.get('rating')
+    if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        return jsonify({'message': '评分必须为1-5的整数'}), 400
+    
     # 获取评价奖励
-    from config.development import DevelopmentConfig
-    reward_coins = DevelopmentConfig.REVIEW_REWARD_COINS
+    reward_coins = current_app.config.get('REVIEW_REWARD_COINS', 0)
     
     if transaction.buyer_id == user_id:
         # 买家评价卖家
-        transaction.buyer_rating = data.get('rating')
-        transaction.buyer_comment = data.get('comment')
-        
-        # 奖励买家校园币
-        buyer = User.query.get(user_id)
-        buyer.coins += reward_coins
-        
-        # 记录资金变动
-        coin_log = CoinLog(
-            user_id=user_id,
-            amount=reward_coins,
-            type='review_reward',
-            related_id=transaction.id,
-            description='评价奖励'
-        )
-        
-        db.session.add(coin_log)
+        rated_user_id = transaction.seller_id
+        rating_column, values = Transaction.buyer_rating, {
+            'buyer_rating': rating,
+            'buyer_comment': data.get('comment')
+        }
     elif transaction.seller_id == user_id:
         # 卖家评价买家
-        transaction.seller_rating = data.get('rating')
-        transaction.seller_comment = data.get('comment')
+        rated_user_id = transaction.buyer_id
+        rating_column, values = Transaction.seller_rating, {
+            'seller_rating': rating,
+            'seller_comment': data.get('comment')
+        }
+    else:
+        return jsonify({'message': '没有权限评价此交易'}), 403
+    
+    def submit_review():
+        # 每笔交易每方只能评价一次，避免重复领取奖励
+        reviewed = Transaction.query.filter(
+            Transaction.id == transaction_id,
+            rating_column.is_(None)
+        ).update(values, synchronize_session=False)
+        if reviewed != 1:
+            return False
         
-        # 奖励卖家校园币
-        seller = User.query.get(user_id)
-        seller.coins += reward_coins
+        # 评分计入被评价方的信誉
+        reputation.bump(rated_user_id, rating=rating)
         
-        # 记录资金变动
-        coin_log = CoinLog(
-            user_id=user_id,
-            amount=reward_coins,
-            type='review_reward',
-            related_id=transaction.id,
+        # 奖励评价者校园币
+        ledger.credit(
+            user_id,
+            reward_coins,
+            'review_reward',
+            related_id=transaction_id,
             description='评价奖励'
         )
-        
-        db.session.add(coin_log)
-    else:
-        return jsonify({'message': '没有权限评价此交易'}), 403
+        return True
     
-    db.session.commit()
+    if not ledger.run_atomic(submit_review):
+        return jsonify({'message': '您已评价过此交易'}), 400
     
     return jsonify({'message': '评价成功，已获得奖励'}), 200
 
 
 @transaction_bp.route('/offers', methods=['POST'])
 @jwt_required()
+@idempotent
 def create_offer():
     """发起还价"""
     user_id = get_jwt_identity()
@@ -402,17 +470,39 @@ def create_offer():
     if item.user_id == user_id:
         return jsonify({'message': '不能对自己的商品还价'}), 400
     
+    offer_amount = data.get('offer_amount')
+    if not isinstance(offer_amount, int) or isinstance(offer_amount, bool) or offer_amount <= 0:
+        return jsonify({'message': '还价金额必须为正整数'}), 400
+    
     # 创建还价记录
     offer = Offer(
         buyer_id=user_id,
         item_id=item.id,
-        offer_amount=data['offer_amount']
+        offer_amount=offer_amount
     )
     
+    # 按卖家设置的阈值自动回应
+    result = offer_engine.evaluate_offer(item, offer_amount)
+    if result == 'rejected':
+        offer.status = 'rejected'
+        offer.responded_at = datetime.utcnow()
+        offer.auto_responded = True
+    
     db.session.add(offer)
+    db.session.flush()
+    
+    if result == 'accepted':
+        offer_engine.accept_offer(offer.id, item.id, auto=True)
+    
     db.session.commit()
     
-    return jsonify({'message': '还价请求已发送'}), 201
+    messages = {
+        'accepted': '还价已被自动接受',
+        'rejected': '还价低于卖家设置的最低价，已被自动拒绝',
+        'pending': '还价请求已发送'
+    }
+    
+    return jsonify({'message': messages[result], 'offer_id': offer.id, 'status': result}), 201
 
 
 @transaction_bp.route('/offers/my', methods=['GET'])
@@ -519,9 +609,15 @@ def respond_to_offer(offer_id):
     if data['action'] not in ['accept', 'reject']:
         return jsonify({'message': '无效的回应类型'}), 400
     
-    # 更新还价状态
-    offer.status = 'accepted' if data['action'] == 'accept' else 'rejected'
-    offer.responded_at = datetime.utcnow()
+    # 接受时同时拒绝该商品其余待回应的还价；以状态为条件更新，避免与过期处理并发冲突
+    if data['action'] == 'accept':
+        responded = offer_engine.accept_offer(offer.id, offer.item_id)
+    else:
+        responded = offer_engine.reject_offer(offer.id)
+    
+    if not responded:
+        db.session.rollback()
+        return jsonify({'message': '还价请求状态不正确'}), 400
     
     db.session.commit()
     
@@ -537,8 +633,8 @@ def create_complaint():
     user_id = get_jwt_identity()
     data = request.get_json()
     
-    # 检查交易是否存在
-    transaction = Transaction.query.get(data['transaction_id'])
+    # 检查交易是否存在（锁定交易行，同一交易的投诉串行处理）
+    transaction = Transaction.query.filter_by(id=data['transaction_id']).with_for_update().first()
     if not transaction:
         return jsonify({'message': '交易不存在'}), 404
     
@@ -546,6 +642,10 @@ def create_complaint():
     if transaction.buyer_id != user_id and transaction.seller_id != user_id:
         return jsonify({'message': '没有权限投诉'}), 403
     
+    # 同一交易每方只能投诉一次，避免重复投诉刷高对方的纠纷数
+    if Complaint.query.filter_by(transaction_id=transaction.id, complainant_id=user_id).first():
+        return jsonify({'message': '已投诉过该交易，请等待管理员处理'}), 400
+    
     # 确定被投诉方
     defendant_id = transaction.seller_id if transaction.buyer_id == user_id else transaction.buyer_id
     
@@ -560,6 +660,9 @@ def create_complaint():
     # 更新交易状态为纠纷中
     transaction.status = 'disputed'
     
+    # 被投诉方的纠纷数加一
+    reputation.bump(defendant_id, disputes=1)
+    
     db.session.add(complaint)
     db.session.commit()
     
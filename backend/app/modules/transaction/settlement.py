@@ -0,0 +1,150 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from flask import current_app
+from app import db
+from app.modules.transaction.models import Transaction
+from app.modules.item.models import Item
+from app.modules.user import ledger, reputation
+
+
+def settle_stale_escrows(window_days=None, batch_size=None, dry_run=False, now=None):
+    """自动确认长期处于已付款状态的托管交易
+
+    查找付款超过window_days天仍未确认的出售交易（走(status, paid_at)索引），
+    按批次释放托管资金：卖家入账、写入CoinLog、商品标记为已售出，每批提交一次。
+    租赁交易涉及归还流程，不在此处自动结算。
+
+    dry_run为True时只统计将被结算的交易，不做任何修改。
+    返回本次运行的统计信息。
+
+    早期的购买流程不记录付款时间，结算前先用创建时间回填这些已付款托管交易的paid_at，
+    否则它们永远不会被扫描到。
+    """
+    if window_days is None:
+        window_days = current_app.config.get('ESCROW_AUTO_SETTLE_DAYS', 7)
+    if batch_size is None:
+        batch_size = current_app.config.get('ESCROW_SETTLE_BATCH_SIZE', 200)
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=window_days)
+
+    metrics = {
+        'dry_run': dry_run,
+        'cutoff': cutoff.isoformat(),
+        'scanned': 0,
+        'settled': 0,
+        'settled_amount': 0,
+        'chunks': 0,
+        'retried_chunks': 0,
+        'backfilled': 0,
+        'transaction_ids': []
+    }
+    started = time.perf_counter()
+
+    metrics['backfilled'] = _backfill_paid_at(dry_run)
+
+    # 按(paid_at, id)做键集分页，dry_run时记录不会变化也能正常推进
+    last_paid_at, last_id = None, 0
+    while True:
+        query = db.session.query(
+            Transaction.id, Transaction.buyer_id, Transaction.seller_id, Transaction.item_id,
+            Transaction.amount, Transaction.paid_at
+        ).filter(
+            Transaction.status == 'paid',
+            Transaction.paid_at <= cutoff,
+            Transaction.is_escrowed.is_(True),
+            Transaction.transaction_type == 'sale'
+        )
+        if last_paid_at is not None:
+            query = query.filter(or_(
+                Transaction.paid_at > last_paid_at,
+                and_(Transaction.paid_at == last_paid_at, Transaction.id > last_id)
+            ))
+        query = query.order_by(Transaction.paid_at, Transaction.id).limit(batch_size)
+        if not dry_run:
+            # 锁定本批交易，买家同时确认的交易会被跳过，留给下一次运行
+            query = query.with_for_update(skip_locked=True)
+
+        rows = query.all()
+        if not rows:
+            db.session.rollback()
+            break
+
+        metrics['scanned'] += len(rows)
+
+        if not dry_run and not _settle_chunk(rows, now):
+            # 批次内有交易在查询之后被买家确认或取消，回滚后重新读取这一批
+            metrics['scanned'] -= len(rows)
+            metrics['retried_chunks'] += 1
+            continue
+
+        metrics['chunks'] += 1
+        metrics['settled'] += len(rows)
+        metrics['settled_amount'] += sum(row.amount for row in rows)
+        if len(metrics['transaction_ids']) < 100:
+            metrics['transaction_ids'].extend(row.id for row in rows[:100 - len(metrics['transaction_ids'])])
+
+        last_paid_at, last_id = rows[-1].paid_at, rows[-1].id
+
+    elapsed = time.perf_counter() - started
+    metrics['elapsed_seconds'] = round(elapsed, 3)
+    metrics['per_second'] = round(metrics['settled'] / elapsed, 1) if elapsed > 0 else 0
+
+    current_app.logger.info(
+        f"托管自动结算{'(演练)' if dry_run else ''}: 结算 {metrics['settled']} 笔, "
+        f"金额 {metrics['settled_amount']}, 批次 {metrics['chunks']}, "
+        f"耗时 {metrics['elapsed_seconds']}s, {metrics['per_second']} 笔/秒"
+    )
+    return metrics
+
+
+def _backfill_paid_at(dry_run):
+    """用创建时间回填缺少付款时间的已付款托管交易，返回回填（演练时为将回填）的数量"""
+    query = Transaction.query.filter(
+        Transaction.status == 'paid',
+        Transaction.paid_at.is_(None),
+        Transaction.is_escrowed.is_(True),
+        Transaction.transaction_type == 'sale'
+    )
+    if dry_run:
+        return query.count()
+    count = query.update({'paid_at': Transaction.created_at}, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def _settle_chunk(rows, now):
+    """结算一批交易并提交；状态已被其他请求改变时回滚并返回False"""
+    transaction_ids = [row.id for row in rows]
+
+    settled = Transaction.query.filter(
+        Transaction.id.in_(transaction_ids),
+        Transaction.status == 'paid'
+    ).update({
+        'status': 'completed',
+        'completed_at': now,
+        'escrow_released_at': now
+    }, synchronize_session=False)
+    if settled != len(transaction_ids):
+        db.session.rollback()
+        return False
+
+    ledger.credit_many([{
+        'user_id': row.seller_id,
+        'amount': row.amount,
+        'type': 'escrow_auto_release',
+        'related_id': row.id,
+        'description': '托管超时自动确认收款'
+    } for row in rows])
+
+    # 自动确认同样计入双方的已完成交易数
+    for row in rows:
+        reputation.bump(row.buyer_id, completed=1)
+        reputation.bump(row.seller_id, completed=1)
+    
+    Item.query.filter(Item.id.in_([row.item_id for row in rows])).update(
+        {'status': 'sold'}, synchronize_session=False
+    )
+
+    db.session.commit()
+    return True
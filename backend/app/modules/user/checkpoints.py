@@ -0,0 +1,173 @@
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from flask import current_app
+from app import db
+from app.modules.user.models import CoinLog, CoinBalanceCheckpoint, CoinMonthlySummary
+
+
+def get_watermark():
+    """已被检查点计入的最大变动记录ID"""
+    return db.session.query(func.max(CoinBalanceCheckpoint.last_log_id)).scalar() or 0
+
+
+def create_balance_checkpoints(batch_size=1000, now=None):
+    """为上次运行后有变动的用户生成余额检查点，并增量更新月度汇总
+
+    只处理创建时间早于COIN_CHECKPOINT_LAG_SECONDS的变动记录，
+    避免漏掉ID已分配但事务尚未提交的记录。返回本次运行的统计信息。
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    lag = current_app.config.get('COIN_CHECKPOINT_LAG_SECONDS', 60)
+
+    watermark = get_watermark()
+    upper = db.session.query(func.max(CoinLog.id)).filter(
+        CoinLog.id > watermark,
+        CoinLog.created_at <= now - timedelta(seconds=lag)
+    ).scalar()
+
+    metrics = {'from_log_id': watermark, 'to_log_id': watermark, 'logs': 0, 'users': 0, 'months': 0}
+    if not upper:
+        metrics['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        return metrics
+
+    as_of = db.session.query(CoinLog.created_at).filter(CoinLog.id == upper).scalar()
+
+    # 流式读取区间内的变动，按用户和月份汇总，内存只与活跃用户数有关
+    user_deltas = {}
+    month_deltas = {}
+    rows = db.session.query(CoinLog.user_id, CoinLog.amount, CoinLog.created_at).filter(
+        CoinLog.id > watermark,
+        CoinLog.id <= upper
+    ).order_by(CoinLog.id).execution_options(yield_per=batch_size)
+    for user_id, amount, created_at in rows:
+        metrics['logs'] += 1
+        user_deltas[user_id] = user_deltas.get(user_id, 0) + amount
+        summary = month_deltas.setdefault((user_id, created_at.strftime('%Y-%m')), [0, 0, 0])
+        if amount >= 0:
+            summary[0] += amount
+        else:
+            summary[1] -= amount
+        summary[2] += 1
+
+    user_ids = list(user_deltas)
+    previous = {}
+    for start in range(0, len(user_ids), batch_size):
+        previous.update(_latest_balances(user_ids[start:start + batch_size]))
+
+    db.session.bulk_insert_mappings(CoinBalanceCheckpoint, [{
+        'user_id': user_id,
+        'balance': previous.get(user_id, 0) + delta,
+        'last_log_id': upper,
+        'as_of': as_of,
+        'created_at': now
+    } for user_id, delta in user_deltas.items()])
+
+    _merge_monthly_summaries(month_deltas, batch_size)
+
+    db.session.commit()
+
+    metrics.update({
+        'to_log_id': upper,
+        'users': len(user_deltas),
+        'months': len(month_deltas),
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    })
+    current_app.logger.info(
+        f"校园币检查点: 变动记录 {watermark + 1}-{upper}, {metrics['logs']} 条, "
+        f"用户 {metrics['users']} 个, 耗时 {metrics['elapsed_seconds']}s"
+    )
+    return metrics
+
+
+def balance_at(user_id, at):
+    """计算用户在指定时间点的余额：最近的检查点 + 之后截至该时间的变动"""
+    checkpoint = CoinBalanceCheckpoint.query.filter(
+        CoinBalanceCheckpoint.user_id == user_id,
+        CoinBalanceCheckpoint.as_of <= at
+    ).order_by(CoinBalanceCheckpoint.as_of.desc(), CoinBalanceCheckpoint.id.desc()).first()
+
+    base = checkpoint.balance if checkpoint else 0
+    since_log_id = checkpoint.last_log_id if checkpoint else 0
+
+    delta = db.session.query(func.coalesce(func.sum(CoinLog.amount), 0)).filter(
+        CoinLog.user_id == user_id,
+        CoinLog.id > since_log_id,
+        CoinLog.created_at <= at
+    ).scalar()
+
+    return base + delta
+
+
+def monthly_summary(user_id, months=12):
+    """获取用户最近若干个月的收支汇总
+
+    已计入检查点的部分直接读取汇总表，只对检查点之后的少量新变动做实时汇总。
+    """
+    summaries = {
+        summary.month: summary.to_dict()
+        for summary in CoinMonthlySummary.query.filter_by(user_id=user_id)
+        .order_by(CoinMonthlySummary.month.desc()).limit(months)
+    }
+
+    tail = db.session.query(CoinLog.amount, CoinLog.created_at).filter(
+        CoinLog.user_id == user_id,
+        CoinLog.id > get_watermark()
+    )
+    for amount, created_at in tail:
+        month = created_at.strftime('%Y-%m')
+        summary = summaries.setdefault(month, {'month': month, 'income': 0, 'expense': 0, 'net': 0, 'log_count': 0})
+        if amount >= 0:
+            summary['income'] += amount
+        else:
+            summary['expense'] -= amount
+        summary['net'] += amount
+        summary['log_count'] += 1
+
+    return sorted(summaries.values(), key=lambda s: s['month'], reverse=True)[:months]
+
+
+def _latest_balances(user_ids):
+    """批量获取用户最近一个检查点的余额"""
+    latest_ids = db.session.query(func.max(CoinBalanceCheckpoint.id)).filter(
+        CoinBalanceCheckpoint.user_id.in_(user_ids)
+    ).group_by(CoinBalanceCheckpoint.user_id)
+
+    return dict(db.session.query(CoinBalanceCheckpoint.user_id, CoinBalanceCheckpoint.balance).filter(
+        CoinBalanceCheckpoint.id.in_(latest_ids)
+    ).all())
+
+
+def _merge_monthly_summaries(month_deltas, batch_size):
+    """把本次汇总的增量合并进月度汇总表"""
+    keys = list(month_deltas)
+    for start in range(0, len(keys), batch_size):
+        chunk = keys[start:start + batch_size]
+        user_ids = {user_id for user_id, _ in chunk}
+        months = {month for _, month in chunk}
+        existing = {
+            (summary.user_id, summary.month): summary
+            for summary in CoinMonthlySummary.query.filter(
+                CoinMonthlySummary.user_id.in_(user_ids),
+                CoinMonthlySummary.month.in_(months)
+            )
+        }
+
+        new_rows = []
+        for key in chunk:
+            income, expense, count = month_deltas[key]
+            summary = existing.get(key)
+            if summary:
+                summary.income += income
+                summary.expense += expense
+                summary.log_count += count
+            else:
+                new_rows.append({
+                    'user_id': key[0],
+                    'month': key[1],
+                    'income': income,
+                    'expense': expense,
+                    'log_count': count
+                })
+        db.session.bulk_insert_mappings(CoinMonthlySummary, new_rows)
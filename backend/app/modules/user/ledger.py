@@ -0,0 +1,140 @@
+import time
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.util import identity_key
+from flask import current_app
+from app import db
+from app.modules.user.models import User, CoinLog
+
+
+# MySQL死锁(1213)与锁等待超时(1205)错误码，遇到时回滚并重试整个事务
+RETRYABLE_MYSQL_ERRORS = (1213, 1205)
+
+
+class InsufficientCoinsError(Exception):
+    """校园币余额不足"""
+    def __init__(self, user_id, amount):
+        self.user_id = user_id
+        self.amount = amount
+        super().__init__(f'用户 {user_id} 校园币余额不足，需要 {amount}')
+
+
+def debit(user_id, amount, log_type, related_id=None, description=None):
+    """扣减校园币
+
+    使用单条条件UPDATE（coins >= amount）完成余额检查与扣减，
+    并发扣款不会把余额扣成负数；余额不足时抛出InsufficientCoinsError。
+    与CoinLog写入处于同一事务，由调用方提交。
+    """
+    if amount < 0:
+        raise ValueError('扣减金额不能为负数')
+
+    result = db.session.execute(
+        update(User)
+        .where(User.id == user_id, User.coins >= amount)
+        .values(coins=User.coins - amount)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise InsufficientCoinsError(user_id, amount)
+
+    return _write_log(user_id, -amount, log_type, related_id, description)
+
+
+def credit(user_id, amount, log_type, related_id=None, description=None):
+    """增加校园币，与CoinLog写入处于同一事务，由调用方提交"""
+    if amount < 0:
+        raise ValueError('增加金额不能为负数')
+
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(coins=User.coins + amount)
+        .execution_options(synchronize_session=False)
+    )
+
+    return _write_log(user_id, amount, log_type, related_id, description)
+
+
+def credit_many(entries):
+    """批量增加校园币
+
+    entries为字典列表，每项包含user_id、amount、type，可选related_id、description。
+    同一用户的多笔入账合并为一条UPDATE，变动记录通过一次批量插入写入。
+    """
+    totals = {}
+    for entry in entries:
+        totals[entry['user_id']] = totals.get(entry['user_id'], 0) + entry['amount']
+
+    for user_id, amount in totals.items():
+        db.session.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(coins=User.coins + amount)
+            .execution_options(synchronize_session=False)
+        )
+        _expire_cached_balance(user_id)
+
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(CoinLog, [{
+        'user_id': entry['user_id'],
+        'amount': entry['amount'],
+        'type': entry['type'],
+        'related_id': entry.get('related_id'),
+        'description': entry.get('description'),
+        'created_at': now
+    } for entry in entries])
+
+
+def run_atomic(func, max_retries=3):
+    """在事务中执行func并提交
+
+    遇到死锁或锁等待超时时回滚并重试，其余异常回滚后原样抛出。
+    重试会重新调用func，因此func内应重新查询所需的数据。
+    """
+    for attempt in range(max_retries):
+        try:
+            result = func()
+            db.session.commit()
+            return result
+        except OperationalError as e:
+            db.session.rollback()
+            if not _is_retryable(e) or attempt == max_retries - 1:
+                raise
+            current_app.logger.warning(f"校园币事务冲突，第{attempt + 1}次重试: {str(e.orig)}")
+            time.sleep(0.05 * (2 ** attempt))
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def _write_log(user_id, amount, log_type, related_id, description):
+    """记录校园币变动，并让会话中缓存的用户余额失效"""
+    _expire_cached_balance(user_id)
+
+    coin_log = CoinLog(
+        user_id=user_id,
+        amount=amount,
+        type=log_type,
+        related_id=related_id,
+        description=description
+    )
+    db.session.add(coin_log)
+    return coin_log
+
+
+def _expire_cached_balance(user_id):
+    """UPDATE绕过了ORM，已加载的User对象需要在下次访问时重新读取余额"""
+    user = db.session.identity_map.get(identity_key(User, user_id))
+    if user is not None:
+        db.session.expire(user, ['coins'])
+
+
+def _is_retryable(error):
+    """判断数据库错误是否可通过重试解决"""
+    args = getattr(error.orig, 'args', ())
+    if args and args[0] in RETRYABLE_MYSQL_ERRORS:
+        return True
+    # SQLite在写锁竞争时报告database is locked
+    return 'database is locked' in str(error.orig)
@@ -1,6 +1,7 @@
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.utils import reference_data
 
 
 class School(db.Model):
@@ -97,8 +98,8 @@ class User(db.Model):
             'is_admin': self.is_admin,
             'is_verified': self.is_verified,
             'coins': self.coins,
-            'campus': self.campus.name if self.campus else None,
-            'major': self.major.name if self.major else None,
+            'campus': reference_data.campus_name(self.campus_id),
+            'major': reference_data.major_name(self.major_id),
             'created_at': self.created_at.isoformat()
         }
 
@@ -106,7 +107,10 @@ class User(db.Model):
 class CoinLog(db.Model):
     """校园币变动记录"""
     __tablename__ = 'coin_logs'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_coin_logs_user_id_id', 'user_id', 'id'),  # 按用户游标分页
+        {'extend_existing': True}
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -120,6 +124,75 @@ class CoinLog(db.Model):
     user = db.relationship('User', backref='coin_logs')
 
 
+class CoinBalanceCheckpoint(db.Model):
+    """校园币余额检查点
+
+    记录用户截至某条变动记录（last_log_id）时的余额，
+    任意时间点的余额 = 最近的检查点余额 + 之后的变动之和。
+    """
+    __tablename__ = 'coin_balance_checkpoints'
+    __table_args__ = (
+        db.Index('ix_coin_checkpoints_user_as_of', 'user_id', 'as_of'),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    balance = db.Column(db.Integer, nullable=False)  # 截至last_log_id的余额
+    last_log_id = db.Column(db.Integer, nullable=False, index=True)  # 已计入的最后一条变动记录ID
+    as_of = db.Column(db.DateTime, nullable=False)  # 最后一条已计入变动的时间
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class CoinMonthlySummary(db.Model):
+    """校园币月度汇总（由检查点任务增量维护）"""
+    __tablename__ = 'coin_monthly_summaries'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', name='_user_month_uc'),
+        {'extend_existing': True}
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # 格式：YYYY-MM
+    income = db.Column(db.Integer, nullable=False, default=0)  # 收入合计
+    expense = db.Column(db.Integer, nullable=False, default=0)  # 支出合计（正数）
+    log_count = db.Column(db.Integer, nullable=False, default=0)  # 变动笔数
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """将月度汇总转换为字典"""
+        return {
+            'month': self.month,
+            'income': self.income,
+            'expense': self.expense,
+            'net': self.income - self.expense,
+            'log_count': self.log_count
+        }
+
+
+class UserReputation(db.Model):
+    """用户信誉汇总（在评价、确认和投诉时增量维护）"""
+    __tablename__ = 'user_reputations'
+    __table_args__ = {'extend_existing': True}
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)  # 收到的评分合计
+    rating_count = db.Column(db.Integer, nullable=False, default=0)  # 收到的评分次数
+    completed_count = db.Column(db.Integer, nullable=False, default=0)  # 已完成交易数
+    dispute_count = db.Column(db.Integer, nullable=False, default=0)  # 被投诉的纠纷数
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """将信誉汇总转换为字典"""
+        return {
+            'rating': round(self.rating_sum / self.rating_count, 2) if self.rating_count else None,
+            'rating_count': self.rating_count,
+            'completed_count': self.completed_count,
+            'dispute_count': self.dispute_count
+        }
+
+
 class Collection(db.Model):
     """用户收藏模型"""
     __tablename__ = 'collections'
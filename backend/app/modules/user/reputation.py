@@ -0,0 +1,92 @@
+from sqlalchemy import update, func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.modules.user.models import UserReputation
+from app.modules.transaction.models import Transaction, Complaint
+
+
+# 没有信誉记录的用户（如新用户）展示的默认值
+EMPTY_REPUTATION = {'rating': None, 'rating_count': 0, 'completed_count': 0, 'dispute_count': 0}
+
+
+def bump(user_id, rating=None, completed=0, disputes=0):
+    """增量更新用户信誉汇总，与业务数据处于同一事务，由调用方提交
+
+    使用col = col + delta的UPDATE累加，并发更新不会丢失计数；
+    用户还没有汇总记录时先插入一条空记录。
+    """
+    values = {}
+    if rating is not None:
+        values['rating_sum'] = UserReputation.rating_sum + rating
+        values['rating_count'] = UserReputation.rating_count + 1
+    if completed:
+        values['completed_count'] = UserReputation.completed_count + completed
+    if disputes:
+        values['dispute_count'] = UserReputation.dispute_count + disputes
+    if not values:
+        return
+
+    statement = update(UserReputation).where(
+        UserReputation.user_id == user_id
+    ).values(**values).execution_options(synchronize_session=False)
+
+    if db.session.execute(statement).rowcount == 1:
+        return
+
+    # 首次产生信誉数据，在保存点内插入，并发插入冲突时只回滚保存点
+    try:
+        with db.session.begin_nested():
+            db.session.add(UserReputation(
+                user_id=user_id, rating_sum=0, rating_count=0, completed_count=0, dispute_count=0
+            ))
+    except IntegrityError:
+        pass
+    db.session.execute(statement)
+
+
+def get_reputations(user_ids):
+    """批量获取用户信誉，返回{user_id: dict}，一次查询"""
+    user_ids = set(user_ids)
+    reputations = {user_id: dict(EMPTY_REPUTATION) for user_id in user_ids}
+    if user_ids:
+        for reputation in UserReputation.query.filter(UserReputation.user_id.in_(user_ids)):
+            reputations[reputation.user_id] = reputation.to_dict()
+    return reputations
+
+
+def rebuild_reputations():
+    """根据交易记录全量重建信誉汇总（用于上线时回填或数据校正），返回用户数"""
+    totals = {}
+
+    def entry(user_id):
+        return totals.setdefault(user_id, {
+            'user_id': user_id, 'rating_sum': 0, 'rating_count': 0, 'completed_count': 0, 'dispute_count': 0
+        })
+
+    # 买家给出的评分计入卖家，卖家给出的评分计入买家
+    for user_column, rating_column in ((Transaction.seller_id, Transaction.buyer_rating),
+                                       (Transaction.buyer_id, Transaction.seller_rating)):
+        rows = db.session.query(user_column, func.sum(rating_column), func.count(rating_column)).filter(
+            rating_column.isnot(None)
+        ).group_by(user_column)
+        for user_id, rating_sum, rating_count in rows:
+            entry(user_id)['rating_sum'] += int(rating_sum)
+            entry(user_id)['rating_count'] += rating_count
+
+    for user_column in (Transaction.buyer_id, Transaction.seller_id):
+        rows = db.session.query(user_column, func.count(Transaction.id)).filter(
+            Transaction.status == 'completed'
+        ).group_by(user_column)
+        for user_id, count in rows:
+            entry(user_id)['completed_count'] += count
+
+    # 每笔交易对被投诉方最多计一次纠纷（与投诉接口的去重规则一致）
+    for user_id, count in db.session.query(
+        Complaint.defendant_id, func.count(func.distinct(Complaint.transaction_id))
+    ).group_by(Complaint.defendant_id):
+        entry(user_id)['dispute_count'] += count
+
+    UserReputation.query.delete(synchronize_session=False)
+    db.session.bulk_insert_mappings(UserReputation, list(totals.values()))
+    db.session.commit()
+    return len(totals)
@@ -1,11 +1,13 @@
-from flask import Blueprint, request, jsonify, Flask
+from flask import Blueprint, request, jsonify, Flask, current_app
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from werkzeug.utils import secure_filename
 import os
 from datetime import datetime
 from app import db
 from app.modules.user.models import User, School, Campus, Major, CoinLog, Collection
+from app.modules.user.models_message import Message  # noqa: F401  注册messages表（逾期结算、通知直接写入）
 from app.modules.user.views import user_bp
+from app.modules.user import ledger, checkpoints
 
 # 创建蓝图
 user_bp = Blueprint('user', __name__)
@@ -28,26 +30,21 @@ def register():
         student_id=data['student_id'],
         email=data['email'],
         username=data['username'],
-        password=data['password']
+        password=data['password'],
+        coins=0
     )
     
-    # 设置校园币初始值
-    from config.development import DevelopmentConfig
-    user.coins = DevelopmentConfig.INITIAL_COINS
-    
     # 先添加用户到数据库，获取用户ID
     db.session.add(user)
     db.session.flush()  # 刷新数据库会话以获取用户ID
     
-    # 然后记录校园币变动日志
-    coin_log = CoinLog(
-        user_id=user.id,
-        amount=user.coins,
-        type='register_reward',
+    # 发放注册奖励并记录校园币变动日志
+    ledger.credit(
+        user.id,
+        current_app.config.get('INITIAL_COINS', 0),
+        'register_reward',
         description='注册奖励'
     )
-    
-    db.session.add(coin_log)
     db.session.commit()
     
     return jsonify({'message': '注册成功'}), 201
@@ -196,20 +193,65 @@ def get_coins():
 @user_bp.route('/coins/logs', methods=['GET'])
 @jwt_required()
 def get_coin_logs():
-    """获取用户校园币变动记录"""
+    """获取用户校园币变动记录（游标分页）
+
+    cursor为上一页返回的next_cursor，不传则从最新记录开始。
+    """
     user_id = get_jwt_identity()
-    logs = CoinLog.query.filter_by(user_id=user_id).order_by(CoinLog.created_at.desc()).all()
+    cursor = request.args.get('cursor', type=int)
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    
+    # 按(user_id, id)索引倒序读取，多取一条用于判断是否还有下一页
+    query = CoinLog.query.filter_by(user_id=user_id)
+    if cursor:
+        query = query.filter(CoinLog.id < cursor)
+    logs = query.order_by(CoinLog.id.desc()).limit(limit + 1).all()
+    
+    has_more = len(logs) > limit
+    logs = logs[:limit]
     
     result = []
     for log in logs:
         result.append({
+            'id': log.id,
             'amount': log.amount,
             'type': log.type,
             'description': log.description,
             'created_at': log.created_at.isoformat()
         })
     
-    return jsonify(result), 200
+    return jsonify({
+        'logs': result,
+        'next_cursor': logs[-1].id if has_more else None
+    }), 200
+
+
+@user_bp.route('/coins/balance', methods=['GET'])
+@jwt_required()
+def get_coin_balance_at():
+    """获取指定时间点的校园币余额，at为ISO格式时间，不传则为当前时间"""
+    user_id = get_jwt_identity()
+    at = request.args.get('at')
+    
+    try:
+        at_datetime = datetime.fromisoformat(at) if at else datetime.utcnow()
+    except ValueError:
+        return jsonify({'message': '时间格式不正确'}), 400
+    
+    return jsonify({
+        'at': at_datetime.isoformat(),
+        'balance': checkpoints.balance_at(user_id, at_datetime)
+    }), 200
+
+
+@user_bp.route('/coins/summary', methods=['GET'])
+@jwt_required()
+def get_coin_summary():
+    """获取校园币月度收支汇总"""
+    user_id = get_jwt_identity()
+    months = min(max(request.args.get('months', 12, type=int), 1), 36)
+    
+    return jsonify({'months': checkpoints.monthly_summary(user_id, months)}), 200
 
 
 @user_bp.route('/schools', methods=['GET'])
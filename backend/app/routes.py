@@ -1,5 +1,7 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, jsonify, request, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from werkzeug.exceptions import HTTPException
 
 # 创建main蓝图
 main = Blueprint('main', __name__)
@@ -144,7 +146,7 @@ def after_request(response):
     # 添加CORS头
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Idempotency-Key'
     return response
 
 
@@ -180,4 +182,140 @@ def get_constants():
         'max_page_size': 100,
         'jwt_expiration_hours': 24,
         'cache_ttl_seconds': 3600
-    })
\ No newline at end of file
+    })
+
+
+# 批量接口中视为只读、可以并发执行的请求方法
+BATCH_READ_METHODS = ('GET', 'HEAD')
+
+
+@main.route('/api/batch', methods=['POST'])
+def batch():
+    """批量执行多个API请求，一次往返返回全部结果
+
+    请求体格式:
+    {
+        "requests": [
+            {"id": "hot", "method": "GET", "path": "/api/items/hot"},
+            {"id": "offer", "method": "POST", "path": "/api/transaction/offers", "body": {...}}
+        ]
+    }
+
+    子请求通过Flask的URL映射在进程内分发，转发本次请求的认证头，由各视图的装饰器照常校验；
+    相邻的只读请求并发执行，写请求按顺序在同一个数据库会话中执行。
+    """
+    data = request.get_json(silent=True) or {}
+    sub_requests = data.get('requests')
+
+    if not isinstance(sub_requests, list) or not sub_requests:
+        return jsonify({'message': '请提供requests列表'}), 400
+
+    max_requests = current_app.config.get('BATCH_MAX_REQUESTS', 20)
+    if len(sub_requests) > max_requests:
+        return jsonify({'message': f'单次最多执行{max_requests}个请求'}), 400
+
+    for index, sub_request in enumerate(sub_requests):
+        if not isinstance(sub_request, dict) or not isinstance(sub_request.get('path'), str):
+            return jsonify({'message': f'第{index + 1}个请求缺少path'}), 400
+        if not sub_request['path'].startswith('/'):
+            return jsonify({'message': f'第{index + 1}个请求的path必须以/开头'}), 400
+        if sub_request['path'].split('?', 1)[0].rstrip('/') == '/api/batch':
+            return jsonify({'message': '不支持嵌套批量请求'}), 400
+
+    # 入口先校验令牌，无效或过期的令牌直接拒绝，而不是让每个子请求各自返回401；
+    # 子请求的视图仍会按各自的装饰器（fresh、管理员等要求）再解码一次，只做签名校验，不查询数据库
+    verify_jwt_in_request(optional=True)
+
+    responses = [None] * len(sub_requests)
+    environs = [_sub_request_environ(sub_request) for sub_request in sub_requests]
+    app = current_app._get_current_object()
+    max_workers = current_app.config.get('BATCH_MAX_WORKERS', 4)
+
+    # 按顺序切分：连续的只读请求为一组并发执行，写请求作为屏障单独执行
+    index = 0
+    while index < len(sub_requests):
+        if environs[index]['method'] not in BATCH_READ_METHODS:
+            responses[index] = _run_sub_request(app, sub_requests[index], environs[index])
+            index += 1
+            continue
+
+        group_end = index
+        while group_end < len(sub_requests) and environs[group_end]['method'] in BATCH_READ_METHODS:
+            group_end += 1
+
+        if group_end - index == 1 or max_workers <= 1:
+            for position in range(index, group_end):
+                responses[position] = _run_sub_request(app, sub_requests[position], environs[position])
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, group_end - index)) as executor:
+                futures = {
+                    position: executor.submit(
+                        _run_in_new_context, app, sub_requests[position], environs[position]
+                    )
+                    for position in range(index, group_end)
+                }
+                for position, future in futures.items():
+                    responses[position] = future.result()
+
+        index = group_end
+
+    return jsonify({'responses': responses}), 200
+
+
+def _sub_request_environ(sub_request):
+    """根据子请求构造请求上下文参数，转发批量请求的认证头"""
+    headers = {}
+    if request.headers.get('Authorization'):
+        headers['Authorization'] = request.headers['Authorization']
+
+    environ = {
+        'path': sub_request['path'],
+        'base_url': request.host_url,
+        'method': str(sub_request.get('method', 'GET')).upper(),
+        'headers': headers
+    }
+    if sub_request.get('body') is not None:
+        environ['json'] = sub_request['body']
+    return environ
+
+
+def _run_in_new_context(app, sub_request, environ):
+    """在独立的应用上下文中执行子请求（并发的只读请求各自持有数据库会话）"""
+    with app.app_context():
+        return _run_sub_request(app, sub_request, environ)
+
+
+def _run_sub_request(app, sub_request, environ):
+    """匹配URL映射并直接调用视图函数，跳过before/after_request钩子
+
+    在已有应用上下文中调用时，子请求与批量请求共享同一个数据库会话。
+    """
+    from app import db
+
+    result = {'id': sub_request.get('id')}
+
+    with app.test_request_context(**environ):
+        try:
+            adapter = app.url_map.bind_to_environ(request.environ)
+            endpoint, view_args = adapter.match()
+            response = app.make_response(app.view_functions[endpoint](**view_args))
+        except HTTPException as e:
+            response = app.make_response(app.handle_user_exception(e))
+        except Exception as e:
+            db.session.rollback()
+            try:
+                # flask-jwt-extended等扩展的异常交给已注册的错误处理器转换
+                response = app.make_response(app.handle_user_exception(e))
+            except Exception:
+                app.logger.error(f"批量子请求执行失败: {sub_request.get('path')} - {str(e)}")
+                response = app.make_response((jsonify({
+                    'error': 'Internal Server Error',
+                    'message': '服务器内部错误，请稍后重试',
+                    'status_code': 500
+                }), 500))
+
+        result['status'] = response.status_code
+        body = response.get_json(silent=True)
+        result['body'] = body if body is not None else response.get_data(as_text=True)
+
+    return result
@@ -0,0 +1,60 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配自动机
+
+    patterns为{模式串: 附带数据}。构建一次后，在文本中查找全部模式串的时间
+    与文本长度加命中次数成正比，与模式串数量无关。
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        self._size = 0
+
+        for pattern, value in patterns.items():
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                node = next_node
+            if not self._output[node]:
+                self._size += 1
+            self._output[node] = ((len(pattern), value),)
+
+        # 按层构建失败指针，并把失败指针所指状态的输出合并进来
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self._goto[node].items():
+                queue.append(next_node)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_node] = self._goto[fail].get(char, 0)
+                self._output[next_node] += self._output[self._fail[next_node]]
+
+    def __len__(self):
+        return self._size
+
+    def iter(self, text):
+        """依次产生(起始位置, 结束位置, 附带数据)，结束位置不含"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in output[node]:
+                yield index + 1 - length, index + 1, value
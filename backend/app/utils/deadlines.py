@@ -0,0 +1,193 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.modules.admin.models import Deadline
+
+
+# 截止时间处理函数注册表：kind -> handler(target_ids, now)
+_handlers = {}
+
+
+def handler(kind):
+    """注册截止时间处理函数的装饰器
+
+    处理函数签名为handler(target_ids, now)，在调度器开启的事务内批量处理到期记录，
+    不需要自行提交；业务状态已变化的记录应直接跳过。
+    """
+    def decorator(f):
+        _handlers[kind] = f
+        return f
+    return decorator
+
+
+def schedule(kind, target_id, due_at):
+    """登记（或重新登记）截止时间，与业务数据处于同一事务，由调用方提交"""
+    deadline = Deadline.query.filter_by(kind=kind, target_id=target_id).first()
+    if deadline:
+        deadline.due_at = due_at
+        deadline.status = 'pending'
+        deadline.attempts = 0
+        deadline.fired_at = None
+    else:
+        db.session.add(Deadline(kind=kind, target_id=target_id, due_at=due_at, status='pending'))
+
+
+def cancel(kind, target_id):
+    """取消尚未触发的截止时间，由调用方提交"""
+    Deadline.query.filter_by(kind=kind, target_id=target_id, status='pending').update(
+        {'status': 'canceled'}, synchronize_session=False
+    )
+
+
+def fire_due_deadlines(now=None, batch_size=None, deadline_ids=None):
+    """触发已到期的截止时间，按类型分组批量调用处理函数
+
+    每批使用FOR UPDATE SKIP LOCKED锁定，多个进程同时运行也不会重复处理。
+    deadline_ids不为空时只处理其中已到期的记录（供调度器使用）。
+    返回本次运行的统计信息。
+    """
+    now = now or datetime.utcnow()
+    if batch_size is None:
+        batch_size = current_app.config.get('DEADLINE_BATCH_SIZE', 200)
+
+    metrics = {'fired': 0, 'failed': 0, 'batches': 0}
+    while True:
+        query = Deadline.query.filter(Deadline.status == 'pending', Deadline.due_at <= now)
+        if deadline_ids is not None:
+            query = query.filter(Deadline.id.in_(deadline_ids))
+        deadlines = query.order_by(Deadline.due_at, Deadline.id).limit(batch_size).with_for_update(
+            skip_locked=True
+        ).all()
+        if not deadlines:
+            db.session.rollback()
+            break
+
+        by_kind = {}
+        for deadline in deadlines:
+            by_kind.setdefault(deadline.kind, []).append(deadline)
+
+        # 所有类型处理完后统一提交，整批记录在提交前一直持有行锁
+        for kind, group in by_kind.items():
+            if _fire_group(kind, group, now):
+                metrics['fired'] += len(group)
+            else:
+                metrics['failed'] += len(group)
+        db.session.commit()
+        metrics['batches'] += 1
+
+        if len(deadlines) < batch_size:
+            break
+
+    return metrics
+
+
+def _fire_group(kind, group, now):
+    """在保存点内处理同一类型的一组截止时间；失败时回滚保存点并推迟重试"""
+    try:
+        with db.session.begin_nested():
+            if kind not in _handlers:
+                raise LookupError(f'未注册的截止时间类型: {kind}')
+            _handlers[kind]([deadline.target_id for deadline in group], now)
+            Deadline.query.filter(Deadline.id.in_([deadline.id for deadline in group])).update(
+                {'status': 'fired', 'fired_at': now}, synchronize_session=False
+            )
+        return True
+    except Exception as e:
+        current_app.logger.error(f'截止时间处理失败({kind}): {str(e)}')
+        # 失败次数越多推迟越久，避免反复失败的记录阻塞其他记录
+        retry_minutes = current_app.config.get('DEADLINE_RETRY_MINUTES', 5)
+        for deadline in group:
+            deadline.attempts += 1
+            deadline.last_error = str(e)[:255]
+            deadline.due_at = now + timedelta(minutes=retry_minutes * deadline.attempts)
+        return False
+
+
+class DeadlineScheduler:
+    """进程内截止时间调度器
+
+    截止时间持久化在deadlines表中，调度器只把未来window_seconds秒内到期的记录
+    （包括重启期间已过期的）加载到内存最小堆，到期时分批触发；
+    每隔半个窗口重新加载一次，以纳入新登记或被修改的截止时间。
+    进程重启后从表中重新加载，不会遗漏；多个进程同时运行时由行锁保证只处理一次。
+    """
+
+    def __init__(self, app, window_seconds=None, batch_size=None):
+        self.app = app
+        self.window_seconds = window_seconds or app.config.get('DEADLINE_WINDOW_SECONDS', 300)
+        self.batch_size = batch_size or app.config.get('DEADLINE_BATCH_SIZE', 200)
+        self.max_loaded = app.config.get('DEADLINE_MAX_LOADED', 10000)
+        self._heap = []
+        self._next_reload = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """在后台线程中启动调度器"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name='deadline-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """停止调度器并等待后台线程退出"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def run(self):
+        """调度主循环，可在前台直接调用"""
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self.tick()
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.error(f'截止时间调度异常: {str(e)}')
+                    self._next_reload = 0
+                self._stop.wait(self._sleep_seconds())
+                db.session.remove()
+
+    def tick(self, now=None):
+        """执行一次调度：必要时重新加载窗口，并触发已到期的截止时间，返回触发数量"""
+        now = now or datetime.utcnow()
+        if time.monotonic() >= self._next_reload:
+            self._load_window(now)
+
+        due_ids = []
+        while self._heap and self._heap[0][0] <= now and len(due_ids) < self.batch_size:
+            _, deadline_id = heapq.heappop(self._heap)
+            due_ids.append(deadline_id)
+
+        if not due_ids:
+            return 0
+
+        metrics = fire_due_deadlines(now=now, batch_size=self.batch_size, deadline_ids=due_ids)
+        if metrics['failed']:
+            # 失败的记录已被推迟，重新加载以获取新的到期时间
+            self._next_reload = 0
+        return metrics['fired']
+
+    def _load_window(self, now):
+        """加载窗口内到期的截止时间（走(status, due_at)索引）"""
+        rows = db.session.query(Deadline.id, Deadline.due_at).filter(
+            Deadline.status == 'pending',
+            Deadline.due_at <= now + timedelta(seconds=self.window_seconds)
+        ).order_by(Deadline.due_at).limit(self.max_loaded).all()
+        db.session.rollback()
+
+        self._heap = [(due_at, deadline_id) for deadline_id, due_at in rows]
+        heapq.heapify(self._heap)
+        self._next_reload = time.monotonic() + self.window_seconds / 2
+
+    def _sleep_seconds(self):
+        """距离下一个到期时间或下一次重新加载的秒数"""
+        wait = max(self._next_reload - time.monotonic(), 0)
+        if self._heap:
+            until_due = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+            wait = min(wait, max(until_due, 0))
+        return min(wait, self.window_seconds)
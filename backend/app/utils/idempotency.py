@@ -0,0 +1,158 @@
+import time
+import hashlib
+import functools
+from datetime import datetime, timedelta
+from flask import request, jsonify, current_app, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.modules.admin.models import IdempotencyRecord
+
+
+def idempotent(f):
+    """幂等请求装饰器，需放在jwt_required之后
+
+    客户端在请求头携带Idempotency-Key时：
+    - 首次请求正常执行，并保存响应
+    - 相同键的重复请求不再执行处理函数，直接回放保存的响应
+    - 首次请求仍在执行时，重复请求等待其完成后回放
+    未携带该请求头时按普通请求处理。
+    """
+    @functools.wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+
+        if len(key) > 64:
+            return jsonify({'message': 'Idempotency-Key长度不能超过64个字符'}), 400
+
+        user_id = get_jwt_identity()
+        fingerprint = _request_fingerprint()
+
+        record_id = _claim(user_id, key, fingerprint)
+        if record_id is None:
+            return _replay_existing(user_id, key, fingerprint)
+
+        try:
+            response = make_response(f(*args, **kwargs))
+        except Exception:
+            _release(record_id)
+            raise
+
+        # 服务器错误不保存，允许客户端重试
+        if response.status_code >= 500:
+            _release(record_id)
+            return response
+
+        db.session.rollback()
+        IdempotencyRecord.query.filter_by(id=record_id).update({
+            'status': 'completed',
+            'response_status': response.status_code,
+            'response_body': response.get_data(as_text=True)
+        }, synchronize_session=False)
+        db.session.commit()
+
+        return response
+    return decorated_function
+
+
+def purge_expired_idempotency_keys(batch_size=1000, now=None):
+    """分批删除已过期的幂等键记录，返回删除的数量"""
+    now = now or datetime.utcnow()
+    deleted = 0
+
+    while True:
+        expired_ids = [row.id for row in db.session.query(IdempotencyRecord.id).filter(
+            IdempotencyRecord.expires_at < now
+        ).limit(batch_size)]
+        if not expired_ids:
+            break
+
+        deleted += IdempotencyRecord.query.filter(IdempotencyRecord.id.in_(expired_ids)).delete(
+            synchronize_session=False
+        )
+        db.session.commit()
+
+    return deleted
+
+
+def _request_fingerprint():
+    """计算请求指纹，缓存请求体以便后续表单或JSON解析"""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode('utf-8'))
+    digest.update(request.full_path.encode('utf-8'))
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _claim(user_id, key, fingerprint):
+    """插入处理中的记录占用幂等键，成功返回记录ID，键已被占用返回None"""
+    now = datetime.utcnow()
+    ttl_hours = current_app.config.get('IDEMPOTENCY_KEY_TTL_HOURS', 24)
+
+    for _ in range(2):
+        record = IdempotencyRecord(
+            user_id=user_id,
+            idempotency_key=key,
+            fingerprint=fingerprint,
+            status='processing',
+            created_at=now,
+            expires_at=now + timedelta(hours=ttl_hours)
+        )
+        try:
+            db.session.add(record)
+            db.session.commit()
+            return record.id
+        except IntegrityError:
+            db.session.rollback()
+
+        # 已过期的记录视为不存在，删除后重新占用
+        removed = IdempotencyRecord.query.filter(
+            IdempotencyRecord.user_id == user_id,
+            IdempotencyRecord.idempotency_key == key,
+            IdempotencyRecord.expires_at < now
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        if not removed:
+            return None
+
+    return None
+
+
+def _release(record_id):
+    """处理失败时删除占用的记录，允许客户端使用同一个键重试"""
+    db.session.rollback()
+    IdempotencyRecord.query.filter_by(id=record_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _replay_existing(user_id, key, fingerprint):
+    """等待首次请求完成后回放其响应"""
+    deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10)
+
+    while True:
+        # 结束当前事务，确保每次轮询都能读到其他请求已提交的数据
+        db.session.rollback()
+        record = IdempotencyRecord.query.filter_by(user_id=user_id, idempotency_key=key).first()
+
+        if record is None:
+            # 首次请求失败后释放了键
+            return jsonify({'message': '原请求处理失败，请重试'}), 409
+
+        if record.fingerprint != fingerprint:
+            return jsonify({'message': 'Idempotency-Key已被用于不同的请求'}), 422
+
+        if record.status == 'completed':
+            response = Response(
+                record.response_body,
+                status=record.response_status,
+                mimetype='application/json'
+            )
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        if time.monotonic() >= deadline:
+            return jsonify({'message': '相同请求正在处理中，请稍后重试'}), 409
+
+        time.sleep(0.1)
@@ -0,0 +1,135 @@
+import threading
+import time
+import uuid
+from collections import namedtuple
+from flask import current_app
+from app import db
+
+
+# 缓存中的只读快照，与数据库会话无关，可在任意线程中使用
+CategoryRef = namedtuple('CategoryRef', ['id', 'name', 'parent_id'])
+SchoolRef = namedtuple('SchoolRef', ['id', 'name', 'province'])
+CampusRef = namedtuple('CampusRef', ['id', 'name', 'school_id'])
+MajorRef = namedtuple('MajorRef', ['id', 'name', 'campus_id'])
+
+# 版本号保存在系统配置表中，管理员修改基础数据时更新，各进程据此判断缓存是否过期
+VERSION_KEY = 'reference_data_version'
+
+
+class _Snapshot:
+    """一次加载的全部基础数据"""
+
+    def __init__(self, version, categories, schools, campuses, majors):
+        self.version = version
+        self.categories = categories
+        self.schools = schools
+        self.campuses = campuses
+        self.majors = majors
+        self.checked_at = time.monotonic()
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def categories(parent_id=None):
+    """返回parent_id下的子分类（默认一级分类），按ID排序"""
+    return [category for category in _current().categories.values() if category.parent_id == parent_id]
+
+
+def category(category_id):
+    return _current().categories.get(category_id)
+
+
+def school(school_id):
+    return _current().schools.get(school_id)
+
+
+def campus(campus_id):
+    return _current().campuses.get(campus_id)
+
+
+def major(major_id):
+    return _current().majors.get(major_id)
+
+
+def category_name(category_id):
+    ref = category(category_id)
+    return ref.name if ref else None
+
+
+def campus_name(campus_id):
+    ref = campus(campus_id)
+    return ref.name if ref else None
+
+
+def major_name(major_id):
+    ref = major(major_id)
+    return ref.name if ref else None
+
+
+def invalidate():
+    """标记基础数据已变更：写入新版本号（随调用方的事务提交），并丢弃本进程的缓存
+
+    其他进程最多在REFERENCE_DATA_CHECK_SECONDS秒后发现版本号变化并重新加载。
+    """
+    global _snapshot
+    from app.modules.admin.models import SystemConfig
+
+    version = uuid.uuid4().hex
+    updated = SystemConfig.query.filter_by(key=VERSION_KEY).update(
+        {'value': version}, synchronize_session=False
+    )
+    if not updated:
+        db.session.add(SystemConfig(key=VERSION_KEY, value=version, description='基础数据缓存版本号'))
+    _snapshot = None
+
+
+def _current():
+    """返回当前有效的快照；超过检查间隔时读取一次版本号，版本变化才重新加载"""
+    global _snapshot
+    snapshot = _snapshot
+    interval = current_app.config.get('REFERENCE_DATA_CHECK_SECONDS', 5)
+    if snapshot is not None and time.monotonic() - snapshot.checked_at < interval:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is not None and time.monotonic() - snapshot.checked_at < interval:
+            return snapshot
+
+        version = _read_version()
+        if snapshot is not None and snapshot.version == version:
+            snapshot.checked_at = time.monotonic()
+            return snapshot
+
+        _snapshot = _load(version)
+        return _snapshot
+
+
+def _read_version():
+    from app.modules.admin.models import SystemConfig
+    return db.session.query(SystemConfig.value).filter_by(key=VERSION_KEY).scalar()
+
+
+def _load(version):
+    """一次性加载全部分类、学校、校区和专业"""
+    from app.modules.item.models import ItemCategory
+    from app.modules.user.models import School, Campus, Major
+
+    def load(model, ref, *columns):
+        rows = db.session.query(*columns).order_by(model.id).all()
+        return {row[0]: ref(*row) for row in rows}
+
+    snapshot = _Snapshot(
+        version,
+        load(ItemCategory, CategoryRef, ItemCategory.id, ItemCategory.name, ItemCategory.parent_id),
+        load(School, SchoolRef, School.id, School.name, School.province),
+        load(Campus, CampusRef, Campus.id, Campus.name, Campus.school_id),
+        load(Major, MajorRef, Major.id, Major.name, Major.campus_id)
+    )
+    current_app.logger.info(
+        f'基础数据缓存已加载: 分类 {len(snapshot.categories)} 个, 学校 {len(snapshot.schools)} 个, '
+        f'校区 {len(snapshot.campuses)} 个, 专业 {len(snapshot.majors)} 个'
+    )
+    return snapshot
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+比价价格提取器基准测试
+
+对compare_fixtures下录制的商品页面运行注册表中所有需要页面的提取器，输出每个提取器的
+页面吞吐量（页/秒）和提取正确率；同时运行改造前的实现（BeautifulSoup html.parser
+解析整个页面后依次尝试六个选择器）作为对照。
+
+    python bench_extractors.py --iterations 200
+    python bench_extractors.py --extractor generic --page review_heavy_keyboard.html
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+from app.modules.compare import extractors
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compare_fixtures')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='比价价格提取器基准测试')
+    parser.add_argument('--iterations', type=int, default=200, help='每个页面重复提取的次数')
+    parser.add_argument('--extractor', action='append', help='只测试指定名称的提取器（可重复）')
+    parser.add_argument('--page', action='append', help='只使用指定的页面（可重复）')
+    parser.add_argument('--no-baseline', action='store_true', help='不运行改造前的实现')
+    return parser.parse_args()
+
+
+def load_corpus(pages=None):
+    """返回[(页面名称, HTML, 期望价格)]"""
+    with open(os.path.join(FIXTURE_DIR, 'manifest.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+    corpus = []
+    for name, price in sorted(expected.items()):
+        if pages and name not in pages:
+            continue
+        with open(os.path.join(FIXTURE_DIR, 'pages', name), encoding='utf-8') as f:
+            corpus.append((name, f.read(), price))
+    return corpus
+
+
+def baseline_extract(html, url=None):
+    """改造前的通用价格提取：BeautifulSoup解析整个页面，依次尝试选择器"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for selector in ('.price', '.current-price', '.original-price', '#price', 'span[class*="price"]', 'div[class*="price"]'):
+        element = soup.select_one(selector)
+        if element:
+            match = re.search(r'\d+\.?\d*', element.get_text().strip())
+            return round(float(match.group()) * 100) if match else None
+    return None
+
+
+def bench(extract, corpus, iterations):
+    """返回(正确页面数, 页/秒, 每个页面的结果)"""
+    outcomes = {name: extract(html, 'http://fixture.local/' + name) for name, html, _ in corpus}
+    correct = sum(1 for name, _, price in corpus if outcomes[name] == price)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for name, html, _ in corpus:
+            extract(html, 'http://fixture.local/' + name)
+    elapsed = time.perf_counter() - started
+    return correct, len(corpus) * iterations / elapsed, outcomes
+
+
+def main():
+    args = parse_args()
+    corpus = load_corpus(args.page)
+    if not corpus:
+        print('没有可用的页面')
+        sys.exit(1)
+
+    candidates = []
+    if not args.no_baseline:
+        candidates.append(('baseline-bs4', baseline_extract))
+    for extractor in extractors.registered():
+        # 平台示例提取器不解析页面，不参与测试
+        if extractor.needs_page and (not args.extractor or extractor.name in args.extractor):
+            candidates.append((extractor.name, extractor.extract))
+
+    total_bytes = sum(len(html.encode('utf-8')) for _, html, _ in corpus)
+    print(f'页面: {len(corpus)} 个, 共 {total_bytes / 1024:.1f} KB, 每个页面重复 {args.iterations} 次')
+    print(f"{'提取器':<16}{'正确':>8}{'页/秒':>12}")
+
+    failed = False
+    for name, extract in candidates:
+        correct, rate, outcomes = bench(extract, corpus, args.iterations)
+        print(f'{name:<16}{correct:>5}/{len(corpus):<2}{rate:>12.0f}')
+        for page, _, price in corpus:
+            if outcomes[page] != price:
+                print(f'    {page}: 期望 {price}, 实际 {outcomes[page]}')
+                failed = failed or name != 'baseline-bs4'
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
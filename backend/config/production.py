@@ -19,4 +19,76 @@ class ProductionConfig:
     
     # 虚拟币配置
     INITIAL_COINS = 100  # 新用户初始校园币
-    REVIEW_REWARD_COINS = 5  # 评价奖励校园币
\ No newline at end of file
+    REVIEW_REWARD_COINS = 5  # 评价奖励校园币
+    
+    # 批量接口配置
+    BATCH_MAX_REQUESTS = 20  # 单次批量请求最多包含的子请求数
+    BATCH_MAX_WORKERS = 4  # 并发执行只读子请求的线程数
+    
+    # 托管自动结算配置
+    ESCROW_AUTO_SETTLE_DAYS = 7  # 付款后超过该天数未确认的交易自动确认收货
+    ESCROW_SETTLE_BATCH_SIZE = 200  # 每批结算的交易数量
+    
+    # 校园币余额检查点配置
+    COIN_CHECKPOINT_LAG_SECONDS = 60  # 只为早于该秒数的变动生成检查点，避免漏记未提交的事务
+    
+    # 幂等键配置
+    IDEMPOTENCY_KEY_TTL_HOURS = 24  # 幂等键保留时长
+    IDEMPOTENCY_WAIT_SECONDS = 10  # 重复请求等待首次请求完成的最长时间
+    
+    # 还价配置
+    OFFER_EXPIRE_HOURS = 72  # 还价超过该小时数未回应自动过期
+    OFFER_EXPIRE_BATCH_SIZE = 500  # 每批处理的过期还价数量
+    
+    # 截止时间调度配置
+    DEADLINE_SCHEDULER_ENABLED = False  # 是否在python run.py开发服务器进程内启动调度线程；生产环境用flask run-deadlines单独运行
+    DEADLINE_WINDOW_SECONDS = 300  # 每次加载未来多少秒内到期的截止时间
+    DEADLINE_BATCH_SIZE = 200  # 每批触发的截止时间数量
+    DEADLINE_RETRY_MINUTES = 5  # 处理失败后的重试间隔（按失败次数递增）
+    RENTAL_CONFIRM_TIMEOUT_HOURS = 24  # 租赁请求超过该小时数未被卖家确认自动取消
+    
+    # 租赁档期配置
+    RENTAL_BOOKING_HORIZON_DAYS = 180  # 最多可提前预订的天数
+    
+    # 逾期租赁结算配置
+    RENTAL_OVERDUE_PENALTY_PERCENT = 10  # 每逾期一天扣除押金的百分比
+    RENTAL_OVERDUE_BATCH_SIZE = 200  # 每批处理的逾期合同数量
+    
+    # 租赁分析配置
+    RENTAL_ANALYTICS_ITEM_CHUNK = 2000  # 每次载入内存计算的商品数量
+    
+    # 基础数据缓存配置
+    REFERENCE_DATA_CHECK_SECONDS = 5  # 检查基础数据版本号的间隔（秒），决定其他进程多久后看到管理员的修改
+    
+    # 最新求购动态配置
+    LATEST_REQUESTS_RING_SIZE = 50  # 每个校区在内存中保留的最新求购数量
+    LATEST_REQUESTS_TTL_SECONDS = 60  # 内存中的动态多久后重新从数据库加载（同步其他进程的写入）
+    
+    # 比价任务队列配置
+    COMPARE_WORKER_ENABLED = False  # 是否在python run.py开发服务器进程内启动比价线程池；生产环境用flask run-compare-workers单独运行
+    COMPARE_WORKERS = 4  # 比价工作线程数
+    COMPARE_LEASE_SECONDS = 60  # 任务租约时长，工作线程每1/3租约发送一次心跳续期
+    COMPARE_MAX_ATTEMPTS = 3  # 最大尝试次数，超过后标记为失败
+    COMPARE_RETRY_BASE_SECONDS = 30  # 失败重试的初始推迟时间，之后每次翻倍
+    COMPARE_POLL_SECONDS = 2  # 队列为空时的轮询间隔
+    COMPARE_METRICS_INTERVAL_SECONDS = 60  # 输出吞吐量和队列深度的间隔
+    COMPARE_CACHE_TTL_SECONDS = 3600  # 抓取结果按规范化链接缓存的时长，期间同一商品不重复抓取
+    COMPARE_CLAIM_BATCH = 10  # 每个工作线程一次领取的任务数，同批链接并发抓取
+    COMPARE_FETCH_USER_AGENT = 'CampusTradeBot/1.0'  # 抓取时使用的User-Agent，也用于匹配robots.txt规则
+    COMPARE_FETCH_TOTAL_CONCURRENCY = 20  # 每个工作线程连接池的最大连接数
+    COMPARE_FETCH_PER_HOST_CONCURRENCY = 2  # 同一主机的最大并发请求数
+    COMPARE_FETCH_PER_HOST_RATE = 1.0  # 同一主机每秒最多发起的请求数（进程内所有线程共享；robots.txt的Crawl-delay更长时以其为准）
+    COMPARE_FETCH_TIMEOUT_SECONDS = 10  # 单个请求的超时时间
+    COMPARE_FETCH_BUDGET_SECONDS = 30  # 一批链接的总抓取时间预算，超出后未完成的请求被取消
+    COMPARE_RESPECT_ROBOTS = True  # 是否遵守robots.txt
+    COMPARE_ROBOTS_TTL_SECONDS = 3600  # robots.txt的缓存时长
+    COMPARE_HISTORY_RAW_DAYS = 7  # 价格历史原始数据的保留天数
+    COMPARE_HISTORY_HOURLY_DAYS = 90  # 价格历史小时汇总的保留天数
+    COMPARE_HISTORY_DAILY_DAYS = 730  # 价格历史天汇总的保留天数
+    COMPARE_HOT_BOARD_SIZE = 20  # 热门比价榜缓存的条目数
+    COMPARE_HOT_BOARD_DAYS = 7  # 热门比价榜只统计最近几天完成的任务
+    COMPARE_HOT_BOARD_TTL_SECONDS = 60  # 热门比价榜在进程内的缓存时长，本进程有任务完成时立即失效
+    
+    # 商品自动预审配置
+    MODERATION_AUTO_APPROVE = True  # 未命中敏感词的商品是否直接上架（敏感词表为空时始终等待人工审核）
+    MODERATION_KEYWORDS_CHECK_SECONDS = 5  # 检查敏感词表版本号的间隔，其他进程修改词表后最多延迟这么久生效
\ No newline at end of file
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+比价抓取本地测试服务器
+
+在本地提供compare_fixtures/pages下录制的商品页面，用于在不访问真实电商网站的情况下测试异步抓取器：
+- /products/<页面>       正常返回页面
+- /slow/<页面>           延迟--slow秒后返回，用于测试超时和时间预算
+- /private/<页面>        robots.txt禁止抓取
+- /robots.txt            Disallow: /private/，可用--crawl-delay设置Crawl-delay
+
+服务器使用HTTP/1.1长连接，并记录每个请求来自哪条TCP连接，用于确认连接池复用。
+
+只启动服务器（其他进程可以把链接指向它）：
+    python crawl_fixture_server.py --port 8765
+
+启动服务器并运行抓取器检查（价格提取、robots协议、按主机限速、时间预算、连接复用）：
+    python crawl_fixture_server.py --check
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compare_fixtures')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='比价抓取本地测试服务器')
+    parser.add_argument('--port', type=int, default=0, help='监听端口，0表示随机端口')
+    parser.add_argument('--slow', type=float, default=3.0, help='/slow/下页面的延迟秒数')
+    parser.add_argument('--crawl-delay', type=float, default=0, help='robots.txt中的Crawl-delay')
+    parser.add_argument('--check', action='store_true', help='启动后运行抓取器检查并退出')
+    return parser.parse_args()
+
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port, slow, crawl_delay):
+        super().__init__(('127.0.0.1', port), FixtureHandler)
+        self.slow = slow
+        self.crawl_delay = crawl_delay
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def record(self, client_address, host, path):
+        with self.lock:
+            self.requests.append((client_address, host, path, time.monotonic()))
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.record(self.client_address, self.headers.get('Host'), self.path)
+        prefix, _, name = self.path.lstrip('/').partition('/')
+
+        if self.path == '/robots.txt':
+            lines = ['User-agent: *', 'Disallow: /private/']
+            if self.server.crawl_delay:
+                lines.append(f'Crawl-delay: {self.server.crawl_delay}')
+            return self._send(200, '\n'.join(lines), 'text/plain')
+
+        page = os.path.join(FIXTURE_DIR, 'pages', os.path.basename(name))
+        if prefix not in ('products', 'slow', 'private') or not os.path.isfile(page):
+            return self._send(404, 'not found', 'text/plain')
+        if prefix == 'slow':
+            time.sleep(self.server.slow)
+        with open(page, encoding='utf-8') as f:
+            return self._send(200, f.read(), 'text/html')
+
+    def _send(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0, slow=3.0, crawl_delay=0):
+    server = FixtureServer(port, slow, crawl_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_check(server):
+    """对本地服务器运行抓取器，返回失败的检查项列表"""
+    # 未指定测试库时使用内存SQLite（抓取器本身不访问数据库，只需要应用配置）
+    os.environ.setdefault('TEST_DATABASE_URL', 'sqlite://')
+    from app import create_app
+    from app.modules.compare import fetcher
+    from app.modules.compare.crawler import crawl_many
+
+    with open(os.path.join(FIXTURE_DIR, 'manifest.json'), encoding='utf-8') as f:
+        expected = json.load(f)
+
+    app = create_app('testing')
+    port = server.server_address[1]
+    failures = []
+
+    def check(name, ok, detail=''):
+        print(f"{'通过' if ok else '失败'}  {name}  {detail}")
+        if not ok:
+            failures.append(name)
+
+    with app.app_context():
+        # 两个主机名指向同一服务器，用于观察按主机限速
+        hosts = [f'http://127.0.0.1:{port}', f'http://localhost:{port}']
+        urls = {f'{host}/products/{page}': price for host in hosts for page, price in sorted(expected.items())}
+
+        app.config['COMPARE_FETCH_PER_HOST_RATE'] = 4.0
+        started = time.monotonic()
+        results, errors = crawl_many(list(urls), budget_seconds=10)
+        elapsed = time.monotonic() - started
+        wrong = [url for url, price in urls.items() if [r['price'] for r in results[url]] != [price]]
+        check('价格提取', not wrong, f'{len(urls) - len(wrong)}/{len(urls)} 个链接, 耗时 {elapsed:.2f}s')
+
+        # 每个主机4个请求，每秒最多4个：同一主机相邻请求的间隔约0.25秒（服务端计时留出误差）
+        by_host = {}
+        for _, host, path, at in server.requests:
+            if path.startswith('/products/'):
+                by_host.setdefault(host, []).append(at)
+        min_gap = min(b - a for times in by_host.values() for a, b in zip(sorted(times), sorted(times)[1:]))
+        check('按主机限速', min_gap >= 0.2, f'同一主机相邻请求最小间隔 {min_gap:.3f}s')
+
+        # 同一主机的请求复用长连接：TCP连接数远少于请求数
+        connections = {r[0] for r in server.requests}
+        check('连接复用', len(connections) < len(server.requests),
+              f'{len(server.requests)} 个请求使用了 {len(connections)} 条连接')
+
+        robots_requests = [r for r in server.requests if r[2] == '/robots.txt']
+        check('robots.txt缓存', len(robots_requests) == len(hosts), f'读取 {len(robots_requests)} 次')
+
+        private = f'{hosts[0]}/private/{sorted(expected)[0]}'
+        pages = fetcher.fetch_pages([private], budget_seconds=5)
+        check('robots协议', pages[private].error == 'robots.txt禁止抓取', str(pages[private].error))
+        check('禁止抓取的链接未发送请求', not [r for r in server.requests if r[2].startswith('/private/')])
+
+        missing = f'{hosts[0]}/missing/{sorted(expected)[0]}'
+        _, errors = crawl_many([private, missing], budget_seconds=5)
+        check('失败原因', 'robots' in errors.get(private, '') and 'HTTP 404' in errors.get(missing, ''),
+              f'{errors.get(private)}, {errors.get(missing)}')
+
+        slow = f'{hosts[0]}/slow/{sorted(expected)[0]}'
+        fast = f'{hosts[1]}/products/{sorted(expected)[1]}'
+        started = time.monotonic()
+        pages = fetcher.fetch_pages([slow, fast], budget_seconds=1)
+        elapsed = time.monotonic() - started
+        check('时间预算', pages[slow].error is not None and pages[fast].error is None and elapsed < 2,
+              f'慢页面: {pages[slow].error}, 正常页面: {pages[fast].status}, 耗时 {elapsed:.2f}s')
+
+        fetcher.close_thread_fetcher()
+
+    return failures
+
+
+def main():
+    args = parse_args()
+    server = start_server(args.port, args.slow, args.crawl_delay)
+    print(f'测试服务器: http://127.0.0.1:{server.server_address[1]}/products/<页面>')
+
+    if args.check:
+        failures = run_check(server)
+        server.shutdown()
+        print('全部通过' if not failures else f'失败: {", ".join(failures)}')
+        sys.exit(1 if failures else 0)
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
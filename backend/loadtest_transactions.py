@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+交易模块并发抢购压测
+
+模拟大量学生同时抢购少量低价教材，通过Flask测试客户端并发调用：
+1. 抢购阶段：所有买家同时 POST /api/transaction/
+2. 收尾阶段：成功下单的买家随机确认或取消，部分订单同时发起确认和取消以制造竞争
+
+输出吞吐量、各接口p50/p99延迟、状态码分布、锁等待与事务重试次数，并检查不变量：
+- 余额不为负数
+- 每件商品最多只有一笔有效的出售交易（不会超卖）
+- 校园币总量守恒（用户余额 + 托管中的金额 = 初始总额）
+- 每个用户余额等于其CoinLog变动之和
+- 已完成交易的商品为已售出，已取消交易都有对应的退款记录
+
+默认使用临时SQLite数据库，设置TEST_DATABASE_URL可对MySQL测试库运行：
+    python loadtest_transactions.py --buyers 500 --threads 50 --items 1
+"""
+
+import os
+import sys
+import random
+import argparse
+import logging
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# 未指定测试库时使用临时SQLite文件（需在创建应用前设置）
+if not os.environ.get('TEST_DATABASE_URL'):
+    _db_file = os.path.join(tempfile.mkdtemp(), 'loadtest_transactions.db')
+    os.environ['TEST_DATABASE_URL'] = f'sqlite:///{_db_file}'
+
+from sqlalchemy import func, text
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.modules.user.models import User, CoinLog
+from app.modules.item.models import Item, ItemCategory
+from app.modules.transaction.models import Transaction
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='交易模块并发抢购压测')
+    parser.add_argument('--buyers', type=int, default=500, help='买家数量')
+    parser.add_argument('--threads', type=int, default=50, help='并发线程数')
+    parser.add_argument('--items', type=int, default=1, help='参与抢购的商品数量')
+    parser.add_argument('--price', type=int, default=30, help='商品价格')
+    parser.add_argument('--balance', type=int, default=100, help='买家初始余额')
+    parser.add_argument('--cancel-ratio', type=float, default=0.3, help='成功下单后取消的比例')
+    parser.add_argument('--race-ratio', type=float, default=0.2, help='同时发起确认和取消的订单比例')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子，保证结果可复现')
+    return parser.parse_args()
+
+
+def seed_data(args):
+    """创建卖家、买家和抢购商品，返回(买家ID列表, 商品ID列表, 初始校园币总额)"""
+    db.drop_all()
+    db.create_all()
+
+    seller = User(student_id='seller', email='seller@example.com', username='seller', password='loadtest', coins=0)
+    category = ItemCategory(name='教材')
+    db.session.add_all([seller, category])
+    db.session.flush()
+
+    buyers = [
+        User(student_id=f'buyer{i}', email=f'buyer{i}@example.com', username=f'buyer{i}', password='loadtest',
+             coins=args.balance)
+        for i in range(args.buyers)
+    ]
+    items = [
+        Item(name=f'特价教材{i}', description='压测商品', price=args.price, user_id=seller.id,
+             category_id=category.id, transaction_type='sale', status='active')
+        for i in range(args.items)
+    ]
+    db.session.add_all(buyers + items)
+    db.session.flush()
+
+    # 初始余额写入变动记录，便于核对余额与CoinLog
+    db.session.bulk_insert_mappings(CoinLog, [{
+        'user_id': buyer.id, 'amount': args.balance, 'type': 'register_reward', 'description': '压测初始余额'
+    } for buyer in buyers])
+    db.session.commit()
+
+    return [buyer.id for buyer in buyers], [item.id for item in items], args.balance * args.buyers
+
+
+def lock_wait_counter():
+    """返回读取锁等待计数的函数；MySQL读取InnoDB统计，其他数据库返回None"""
+    if db.engine.dialect.name != 'mysql':
+        return lambda: None
+
+    def read():
+        row = db.session.execute(text("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock_waits'")).first()
+        db.session.rollback()
+        return int(row[1]) if row else None
+    return read
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class ConflictCounter(logging.Handler):
+    """统计账本因死锁、锁等待或数据库锁定而重试的次数"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        if '事务冲突' in record.getMessage():
+            self.count += 1
+
+
+class Recorder:
+    """线程安全地记录每次请求的延迟和状态码"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+
+    def record(self, endpoint, status, elapsed):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            self.statuses.setdefault(endpoint, Counter())[status] += 1
+
+    def report(self):
+        for endpoint in self.latencies:
+            latencies = self.latencies[endpoint]
+            print(f'  {endpoint:<10} 请求: {len(latencies):>5}, '
+                  f'p50: {percentile(latencies, 50) * 1000:7.1f}ms, '
+                  f'p99: {percentile(latencies, 99) * 1000:7.1f}ms, '
+                  f'状态码: {dict(self.statuses[endpoint])}')
+
+
+def check_invariants(initial_total):
+    """检查压测结束后的数据不变量，返回违反项列表"""
+    failures = []
+
+    negative = User.query.filter(User.coins < 0).count()
+    if negative:
+        failures.append(f'{negative} 个用户余额为负数')
+
+    live_sales = db.session.query(Transaction.item_id, func.count(Transaction.id)).filter(
+        Transaction.transaction_type == 'sale',
+        Transaction.status != 'canceled'
+    ).group_by(Transaction.item_id).having(func.count(Transaction.id) > 1).all()
+    if live_sales:
+        failures.append(f'{len(live_sales)} 件商品被重复售出: {dict(live_sales)}')
+
+    coins = db.session.query(func.coalesce(func.sum(User.coins), 0)).scalar()
+    escrowed = db.session.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
+        Transaction.status == 'paid'
+    ).scalar()
+    if coins + escrowed != initial_total:
+        failures.append(f'校园币总量不守恒: 余额 {coins} + 托管 {escrowed} != 初始 {initial_total}')
+
+    log_totals = dict(db.session.query(CoinLog.user_id, func.sum(CoinLog.amount)).group_by(CoinLog.user_id).all())
+    mismatched = [user.id for user in User.query if user.coins != log_totals.get(user.id, 0)]
+    if mismatched:
+        failures.append(f'{len(mismatched)} 个用户余额与CoinLog合计不一致')
+
+    completed_unsold = Transaction.query.join(Item, Item.id == Transaction.item_id).filter(
+        Transaction.status == 'completed',
+        Item.status != 'sold'
+    ).count()
+    if completed_unsold:
+        failures.append(f'{completed_unsold} 笔已完成交易的商品未标记为已售出')
+
+    refunds = Counter(row.related_id for row in db.session.query(CoinLog.related_id).filter(
+        CoinLog.type == 'transaction_refund'
+    ))
+    canceled_ids = [row.id for row in db.session.query(Transaction.id).filter(Transaction.status == 'canceled')]
+    bad_refunds = [tid for tid in canceled_ids if refunds.get(tid) != 1]
+    if bad_refunds:
+        failures.append(f'{len(bad_refunds)} 笔已取消交易的退款次数不为1')
+
+    return failures
+
+
+def main():
+    args = parse_args()
+    random.seed(args.seed)
+    app = create_app('testing')
+    conflicts = ConflictCounter()
+    app.logger.addHandler(conflicts)
+
+    with app.app_context():
+        buyer_ids, item_ids, initial_total = seed_data(args)
+        tokens = {buyer_id: create_access_token(identity=buyer_id) for buyer_id in buyer_ids}
+        read_lock_waits = lock_wait_counter()
+        lock_waits_before = read_lock_waits()
+
+    recorder = Recorder()
+
+    def call(endpoint, method, url, buyer_id, json=None):
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.open(url, method=method, json=json,
+                               headers={'Authorization': f'Bearer {tokens[buyer_id]}'})
+        recorder.record(endpoint, response.status_code, time.perf_counter() - started)
+        return response
+
+    # 抢购阶段
+    orders = {}
+    orders_lock = threading.Lock()
+
+    def purchase(buyer_id):
+        response = call('purchase', 'POST', '/api/transaction/', buyer_id,
+                        json={'item_id': random.choice(item_ids)})
+        if response.status_code == 201:
+            with orders_lock:
+                orders[response.get_json()['transaction_id']] = buyer_id
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(purchase, buyer_ids))
+    purchase_elapsed = time.perf_counter() - started
+
+    # 收尾阶段：确认、取消，以及同一订单上的确认与取消竞争
+    jobs = []
+    for transaction_id, buyer_id in orders.items():
+        roll = random.random()
+        if roll < args.race_ratio:
+            jobs.append(('confirm', transaction_id, buyer_id))
+            jobs.append(('cancel', transaction_id, buyer_id))
+        elif roll < args.race_ratio + args.cancel_ratio:
+            jobs.append(('cancel', transaction_id, buyer_id))
+        else:
+            jobs.append(('confirm', transaction_id, buyer_id))
+    random.shuffle(jobs)
+
+    def settle(job):
+        action, transaction_id, buyer_id = job
+        call(action, 'POST', f'/api/transaction/{transaction_id}/{action}', buyer_id)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(settle, jobs))
+    settle_elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        lock_waits_after = read_lock_waits()
+        failures = check_invariants(initial_total)
+        status_counts = dict(db.session.query(Transaction.status, func.count(Transaction.id)).group_by(
+            Transaction.status
+        ).all())
+        dialect = db.engine.dialect.name
+
+    total_requests = len(buyer_ids) + len(jobs)
+    total_elapsed = purchase_elapsed + settle_elapsed
+
+    print('===== 交易模块并发抢购压测 =====')
+    print(f'数据库: {dialect}, 买家: {args.buyers}, 商品: {args.items}, 线程数: {args.threads}, 随机种子: {args.seed}')
+    print(f'抢购阶段: {len(buyer_ids)} 请求, {purchase_elapsed:.2f}s, {len(buyer_ids) / purchase_elapsed:.1f} req/s')
+    print(f'收尾阶段: {len(jobs)} 请求, {settle_elapsed:.2f}s, '
+          f'{len(jobs) / settle_elapsed if settle_elapsed else 0:.1f} req/s')
+    print(f'总吞吐: {total_requests / total_elapsed:.1f} req/s')
+    recorder.report()
+    if lock_waits_before is not None and lock_waits_after is not None:
+        print(f'InnoDB行锁等待: {lock_waits_after - lock_waits_before} 次')
+    else:
+        print('InnoDB行锁等待: 当前数据库不提供统计（可在MySQL测试库上运行）')
+    print(f'事务冲突重试: {conflicts.count} 次')
+    print(f'成功下单: {len(orders)}, 交易状态分布: {status_counts}')
+
+    if failures:
+        print('❌ 不变量检查失败:')
+        for failure in failures:
+            print(f'  - {failure}')
+        return 1
+
+    print('✅ 不变量检查通过')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+"""add transactions status/end_date index
+
+Revision ID: 1f6b8e2d9c35
+Revises: d9a3f07e12c4
+Create Date: 2026-10-19 19:15:27.093341
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f6b8e2d9c35'
+down_revision = 'd9a3f07e12c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 逾期租赁结算按status、end_date扫描
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_status_end_date', ['status', 'end_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_status_end_date')
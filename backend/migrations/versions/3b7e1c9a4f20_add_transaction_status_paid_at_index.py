@@ -0,0 +1,27 @@
+"""add transactions status/paid_at index
+
+Revision ID: 3b7e1c9a4f20
+Revises: 5d2038d88554
+Create Date: 2026-10-19 19:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c9a4f20'
+down_revision = '5d2038d88554'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 托管超时自动结算按status、paid_at扫描
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_status_paid_at', ['status', 'paid_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_status_paid_at')
@@ -0,0 +1,72 @@
+"""add compare task queue columns
+
+Revision ID: 4d8f1b6a0e73
+Revises: a5c07d3e8f91
+Create Date: 2026-10-19 19:31:55.742089
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d8f1b6a0e73'
+down_revision = 'a5c07d3e8f91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('compare_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('item_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('worker_id', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+    # 旧表没有创建者，这些任务无法被任何用户查看，也无法归属到队列，直接删除
+    op.execute("DELETE FROM compare_tasks WHERE user_id IS NULL")
+    op.execute("UPDATE compare_tasks SET priority = 0 WHERE priority IS NULL")
+    op.execute("UPDATE compare_tasks SET next_attempt_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE next_attempt_at IS NULL")
+
+    with op.batch_alter_table('compare_tasks', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('priority', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('next_attempt_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_foreign_key('fk_compare_tasks_user_id_users', 'users', ['user_id'], ['id'])
+        batch_op.create_foreign_key('fk_compare_tasks_item_id_items', 'items', ['item_id'], ['id'])
+        batch_op.create_index('ix_compare_tasks_claim', ['status', 'priority', 'next_attempt_at'], unique=False)
+        batch_op.create_index('ix_compare_tasks_lease', ['status', 'lease_expires_at'], unique=False)
+
+    with op.batch_alter_table('price_compares', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('task_id', sa.Integer(), nullable=True))
+        batch_op.alter_column('item_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.create_foreign_key('fk_price_compares_task_id_compare_tasks', 'compare_tasks', ['task_id'], ['id'])
+        batch_op.create_index('ix_price_compares_task_id', ['task_id'], unique=False)
+
+
+def downgrade():
+    # 按链接直接比价的结果没有商品，旧表结构无法保存
+    op.execute("DELETE FROM price_compares WHERE item_id IS NULL")
+
+    with op.batch_alter_table('price_compares', schema=None) as batch_op:
+        batch_op.drop_index('ix_price_compares_task_id')
+        batch_op.drop_constraint('fk_price_compares_task_id_compare_tasks', type_='foreignkey')
+        batch_op.alter_column('item_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_column('task_id')
+
+    with op.batch_alter_table('compare_tasks', schema=None) as batch_op:
+        batch_op.drop_index('ix_compare_tasks_lease')
+        batch_op.drop_index('ix_compare_tasks_claim')
+        batch_op.drop_constraint('fk_compare_tasks_item_id_items', type_='foreignkey')
+        batch_op.drop_constraint('fk_compare_tasks_user_id_users', type_='foreignkey')
+        batch_op.alter_column('priority', existing_type=sa.Integer(), nullable=True)
+        batch_op.drop_column('heartbeat_at')
+        batch_op.drop_column('lease_expires_at')
+        batch_op.drop_column('worker_id')
+        batch_op.drop_column('next_attempt_at')
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('item_id')
+        batch_op.drop_column('user_id')
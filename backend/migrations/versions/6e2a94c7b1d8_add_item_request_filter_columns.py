@@ -0,0 +1,32 @@
+"""add item_requests filter columns
+
+Revision ID: 6e2a94c7b1d8
+Revises: 1f6b8e2d9c35
+Create Date: 2026-10-19 19:19:46.580112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2a94c7b1d8'
+down_revision = '1f6b8e2d9c35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('item_requests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('min_price', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('max_price', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('tags', sa.String(length=200), nullable=True))
+        batch_op.create_index('ix_item_requests_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('item_requests', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_requests_status_created_at')
+        batch_op.drop_column('tags')
+        batch_op.drop_column('max_price')
+        batch_op.drop_column('min_price')
@@ -0,0 +1,27 @@
+"""add compare_tasks like_count
+
+Revision ID: 7a1c5e3f9b42
+Revises: b2e97c4d1a06
+Create Date: 2026-10-19 19:42:10.338754
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a1c5e3f9b42'
+down_revision = 'b2e97c4d1a06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 点赞记录表由create_all创建，升级前没有点赞，初始为0
+    with op.batch_alter_table('compare_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('like_count', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('compare_tasks', schema=None) as batch_op:
+        batch_op.drop_column('like_count')
@@ -0,0 +1,27 @@
+"""add coin_logs user_id/id index
+
+Revision ID: 8c41d2e6b5a7
+Revises: 3b7e1c9a4f20
+Create Date: 2026-10-19 19:08:40.251907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2e6b5a7'
+down_revision = '3b7e1c9a4f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 校园币流水按用户游标分页
+    with op.batch_alter_table('coin_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_coin_logs_user_id_id', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('coin_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_coin_logs_user_id_id')
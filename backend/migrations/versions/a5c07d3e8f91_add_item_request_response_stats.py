@@ -0,0 +1,41 @@
+"""add item_requests response stats
+
+Revision ID: a5c07d3e8f91
+Revises: 6e2a94c7b1d8
+Create Date: 2026-10-19 19:23:08.311476
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c07d3e8f91'
+down_revision = '6e2a94c7b1d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('item_requests', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('response_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('best_offer_amount', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_response_at', sa.DateTime(), nullable=True))
+
+    # 根据已有报价回填汇总，与flask rebuild_request_stats的计算一致
+    op.execute(
+        "UPDATE item_requests SET "
+        "response_count = (SELECT COUNT(*) FROM request_responses "
+        "WHERE request_responses.request_id = item_requests.id), "
+        "best_offer_amount = (SELECT MIN(offer_amount) FROM request_responses "
+        "WHERE request_responses.request_id = item_requests.id AND request_responses.status != 'rejected'), "
+        "last_response_at = (SELECT MAX(created_at) FROM request_responses "
+        "WHERE request_responses.request_id = item_requests.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('item_requests', schema=None) as batch_op:
+        batch_op.drop_column('last_response_at')
+        batch_op.drop_column('best_offer_amount')
+        batch_op.drop_column('response_count')
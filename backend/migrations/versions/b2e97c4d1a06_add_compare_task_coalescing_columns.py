@@ -0,0 +1,37 @@
+"""add compare task coalescing columns
+
+Revision ID: b2e97c4d1a06
+Revises: 4d8f1b6a0e73
+Create Date: 2026-10-19 19:38:21.905617
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e97c4d1a06'
+down_revision = '4d8f1b6a0e73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # canonical_url、url_hash为空时工作线程会按link计算，无需回填
+    with op.batch_alter_table('compare_tasks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('canonical_url', sa.String(length=500), nullable=True))
+        batch_op.add_column(sa.Column('url_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('leader_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_compare_tasks_leader_id_compare_tasks', 'compare_tasks', ['leader_id'], ['id'])
+        batch_op.create_index('ix_compare_tasks_leader_id', ['leader_id'], unique=False)
+        batch_op.create_index('ix_compare_tasks_url_hash', ['url_hash', 'status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('compare_tasks', schema=None) as batch_op:
+        batch_op.drop_index('ix_compare_tasks_url_hash')
+        batch_op.drop_index('ix_compare_tasks_leader_id')
+        batch_op.drop_constraint('fk_compare_tasks_leader_id_compare_tasks', type_='foreignkey')
+        batch_op.drop_column('leader_id')
+        batch_op.drop_column('url_hash')
+        batch_op.drop_column('canonical_url')
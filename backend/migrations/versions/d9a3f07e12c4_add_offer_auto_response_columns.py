@@ -0,0 +1,37 @@
+"""add offer auto response columns
+
+Revision ID: d9a3f07e12c4
+Revises: 8c41d2e6b5a7
+Create Date: 2026-10-19 19:12:03.667514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a3f07e12c4'
+down_revision = '8c41d2e6b5a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('auto_accept_price', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('auto_reject_price', sa.Integer(), nullable=True))
+
+    # 已有还价均为人工回应
+    with op.batch_alter_table('offers', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('auto_responded', sa.Boolean(), nullable=True, server_default=sa.text('0')))
+        batch_op.create_index('ix_offers_status_created_at', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('offers', schema=None) as batch_op:
+        batch_op.drop_index('ix_offers_status_created_at')
+        batch_op.drop_column('auto_responded')
+
+    with op.batch_alter_table('items', schema=None) as batch_op:
+        batch_op.drop_column('auto_reject_price')
+        batch_op.drop_column('auto_accept_price')
@@ -0,0 +1,37 @@
+"""add item review prefilter columns
+
+Revision ID: e4b6d0a8c217
+Revises: 7a1c5e3f9b42
+Create Date: 2026-10-19 19:46:37.120458
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b6d0a8c217'
+down_revision = '7a1c5e3f9b42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('item_reviews', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('priority', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('match_reasons', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('auto_reviewed', sa.Boolean(), nullable=False, server_default=sa.text('0')))
+        batch_op.add_column(sa.Column('manual_required', sa.Boolean(), nullable=False, server_default=sa.text('0')))
+        batch_op.create_index('ix_item_reviews_queue', ['status', 'priority', 'created_at'], unique=False)
+
+    # 已被驳回的商品重新提交后必须人工审核
+    op.execute("UPDATE item_reviews SET manual_required = 1 WHERE status = 'rejected'")
+
+
+def downgrade():
+    with op.batch_alter_table('item_reviews', schema=None) as batch_op:
+        batch_op.drop_index('ix_item_reviews_queue')
+        batch_op.drop_column('manual_required')
+        batch_op.drop_column('auto_reviewed')
+        batch_op.drop_column('match_reasons')
+        batch_op.drop_column('priority')
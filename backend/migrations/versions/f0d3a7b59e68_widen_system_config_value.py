@@ -0,0 +1,32 @@
+"""widen system_configs value to LONGTEXT
+
+Revision ID: f0d3a7b59e68
+Revises: e4b6d0a8c217
+Create Date: 2026-10-19 19:53:44.586201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0d3a7b59e68'
+down_revision = 'e4b6d0a8c217'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 商品预审词表存于system_configs，MySQL的TEXT最多64KB；其他数据库的TEXT没有该限制
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    with op.batch_alter_table('system_configs', schema=None) as batch_op:
+        batch_op.alter_column('value', existing_type=mysql.TEXT(), type_=mysql.LONGTEXT(), existing_nullable=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    with op.batch_alter_table('system_configs', schema=None) as batch_op:
+        batch_op.alter_column('value', existing_type=mysql.LONGTEXT(), type_=mysql.TEXT(), existing_nullable=False)
@@ -1,5 +1,6 @@
 import os
-from app import create_app, db
+import click
+from app import create_app, db, start_background_workers
 from flask_migrate import Migrate
 from app.modules.user.models import User
 from app.modules.admin.models import AdminUser, SystemConfig
@@ -80,7 +81,146 @@ def apply_migration():
     print('数据库迁移已应用！')
 
 
+@app.cli.command()
+@click.option('--dry-run', is_flag=True, help='只统计将被结算的交易，不做修改')
+@click.option('--days', type=int, default=None, help='付款后超过多少天自动确认（默认读取配置）')
+@click.option('--batch-size', type=int, default=None, help='每批结算的交易数量（默认读取配置）')
+def settle_escrows(dry_run, days, batch_size):
+    """自动结算超时未确认的托管交易（可由cron定时调用）"""
+    from app.modules.transaction.settlement import settle_stale_escrows
+    metrics = settle_stale_escrows(window_days=days, batch_size=batch_size, dry_run=dry_run)
+    print(f"{'[演练] ' if dry_run else ''}截止时间: {metrics['cutoff']}")
+    if metrics['backfilled']:
+        print(f"{'将' if dry_run else '已'}用创建时间回填付款时间: {metrics['backfilled']} 笔")
+    print(f"结算交易: {metrics['settled']} 笔, 金额: {metrics['settled_amount']}, 批次: {metrics['chunks']}")
+    print(f"耗时: {metrics['elapsed_seconds']}s, 吞吐: {metrics['per_second']} 笔/秒")
+
+
+@app.cli.command()
+def checkpoint_coins():
+    """生成校园币余额检查点并更新月度汇总（可由cron定时调用）"""
+    from app.modules.user.checkpoints import create_balance_checkpoints
+    metrics = create_balance_checkpoints()
+    print(f"变动记录区间: ({metrics['from_log_id']}, {metrics['to_log_id']}], 共 {metrics['logs']} 条")
+    print(f"更新用户: {metrics['users']} 个, 月度汇总: {metrics['months']} 条, 耗时: {metrics['elapsed_seconds']}s")
+
+
+@app.cli.command()
+def purge_idempotency_keys():
+    """清理已过期的幂等键记录（可由cron定时调用）"""
+    from app.utils.idempotency import purge_expired_idempotency_keys
+    deleted = purge_expired_idempotency_keys()
+    print(f'已清理过期幂等键: {deleted} 条')
+
+
+
+@app.cli.command()
+@click.option('--hours', type=int, default=None, help='还价超过多少小时未回应自动过期（默认读取配置）')
+def expire_offers(hours):
+    """将长期未回应的还价标记为已过期（可由cron定时调用）"""
+    from app.modules.transaction.offers import expire_stale_offers
+    metrics = expire_stale_offers(expire_hours=hours)
+    print(f"过期还价: {metrics['expired']} 条, 批次: {metrics['chunks']}, 耗时: {metrics['elapsed_seconds']}s")
+
+
+@app.cli.command()
+@click.option('--once', is_flag=True, help='只触发当前已到期的截止时间后退出（适合cron）')
+def run_deadlines(once):
+    """运行截止时间调度器（超时取消、逾期标记等）"""
+    from app.utils.deadlines import DeadlineScheduler, fire_due_deadlines
+    if once:
+        metrics = fire_due_deadlines()
+        print(f"触发: {metrics['fired']} 条, 失败: {metrics['failed']} 条, 批次: {metrics['batches']}")
+        return
+    
+    print('截止时间调度器已启动，按Ctrl+C退出')
+    try:
+        DeadlineScheduler(app).run()
+    except KeyboardInterrupt:
+        pass
+
+
+@app.cli.command()
+@click.option('--batch-size', type=int, default=None, help='每批处理的合同数量（默认读取配置）')
+def settle_overdue_rentals(batch_size):
+    """标记逾期租赁并从押金中结算违约金（可由cron定时调用）"""
+    from app.modules.rental.overdue import settle_overdue_rentals as settle
+    metrics = settle(batch_size=batch_size)
+    print(f"扫描: {metrics['scanned']} 笔, 新增逾期: {metrics['newly_overdue']} 笔, 违约: {metrics['broken']} 笔")
+    print(f"扣除违约金: {metrics['penalized']} 笔, 共 {metrics['penalty_total']}, 耗时: {metrics['elapsed_seconds']}s")
+
+
+@app.cli.command()
+@click.option('--workers', type=int, default=None, help='工作线程数（默认读取配置）')
+@click.option('--once', is_flag=True, help='处理完当前可领取的任务后退出（适合cron）')
+def run_compare_workers(workers, once):
+    """运行比价工作线程池，从比价任务队列按优先级领取任务"""
+    from app.modules.compare.worker import CompareWorkerPool
+    pool = CompareWorkerPool(app, workers=workers)
+    if once:
+        metrics = pool.drain()
+        print(f"领取: {metrics['claimed']} 个, 完成: {metrics['completed']} 个, "
+              f"重试: {metrics['retry']} 个, 失败: {metrics['failed']} 个")
+        return
+    
+    print('比价工作线程池已启动，按Ctrl+C退出')
+    try:
+        pool.run()
+    except KeyboardInterrupt:
+        pass
+
+
+@app.cli.command()
+def rebuild_request_stats():
+    """根据报价记录全量重建求购信息的报价汇总"""
+    from app.modules.request.stats import rebuild_request_stats as rebuild
+    count = rebuild()
+    print(f'已重建求购报价汇总: {count} 条')
+
+
+@app.cli.command()
+@click.option('--months', type=int, default=12, help='统计最近多少个月（含当月）')
+def compute_rental_analytics(months):
+    """计算租赁商品月度出租率和分类季节性，写入汇总表（可由cron每日调用）"""
+    from app.modules.rental.analytics import compute_rental_analytics as compute
+    metrics = compute(months=months)
+    print(f"商品: {metrics['items']} 个, 租赁: {metrics['rentals']} 笔, 月份: {metrics['months']} 个")
+    print(f"写入商品汇总: {metrics['item_rows']} 行, 分类汇总: {metrics['category_rows']} 行, 耗时: {metrics['elapsed_seconds']}s")
+
+
+@app.cli.command()
+def rebuild_reputation():
+    """根据交易记录全量重建用户信誉汇总"""
+    from app.modules.user.reputation import rebuild_reputations
+    count = rebuild_reputations()
+    print(f'已重建用户信誉: {count} 个')
+
+
+@app.cli.command()
+def rollup_price_history():
+    """汇总比价价格历史（原始→小时→天）并按保留期清理（比价线程池运行时会定期自动执行）"""
+    from app.modules.compare.history import rollup
+    stats = rollup()
+    if not stats:
+        print('其他进程正在汇总，本次跳过')
+        return
+    print(f"写入小时数据: {stats['hour']} 条, 天数据: {stats['day']} 条")
+    print(f"删除原始数据: {stats['raw_deleted']} 条, 小时数据: {stats['hour_deleted']} 条, 天数据: {stats['day_deleted']} 条")
+
+
+@app.cli.command()
+def rebuild_compare_board():
+    """根据点赞记录和已完成的比价任务全量重建点赞数和热门比价榜"""
+    from app.modules.compare.board import rebuild
+    count = rebuild()
+    print(f'已重建热门比价榜: {count} 条')
+
+
 if __name__ == '__main__':
+    # 调试模式下重载器会再启动一个子进程，后台线程只在实际处理请求的子进程中启动
+    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_workers(app)
+    
     # 启动Flask应用
     app.run(host='0.0.0.0', port=5000)
 
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+校园币账本并发压力测试
+
+多个线程同时对同一用户扣款和入账，检查：
+1. 余额永远不会变为负数
+2. 成功扣款次数与初始余额一致（不会超扣）
+3. 用户余额等于其全部CoinLog变动之和
+
+默认使用临时SQLite数据库，设置TEST_DATABASE_URL可对MySQL测试库运行：
+    python stress_coin_ledger.py --threads 50 --debits 400
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 未指定测试库时使用临时SQLite文件（需在创建应用前设置）
+if not os.environ.get('TEST_DATABASE_URL'):
+    _db_file = os.path.join(tempfile.mkdtemp(), 'stress_coin_ledger.db')
+    os.environ['TEST_DATABASE_URL'] = f'sqlite:///{_db_file}'
+
+from sqlalchemy import func
+from app import create_app, db
+from app.modules.user.models import User, CoinLog
+from app.modules.user import ledger
+from app.modules.user.ledger import InsufficientCoinsError
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='校园币账本并发压力测试')
+    parser.add_argument('--threads', type=int, default=20, help='并发线程数')
+    parser.add_argument('--debits', type=int, default=200, help='扣款请求总数')
+    parser.add_argument('--credits', type=int, default=50, help='入账请求总数')
+    parser.add_argument('--balance', type=int, default=1000, help='初始余额')
+    parser.add_argument('--amount', type=int, default=7, help='每次扣款/入账金额')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = create_app('testing')
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(student_id='stress001', email='stress@example.com', username='stress', password='stress', coins=0)
+        db.session.add(user)
+        db.session.flush()
+        ledger.credit(user.id, args.balance, 'register_reward', description='压力测试初始余额')
+        db.session.commit()
+        user_id = user.id
+
+    counters = {'debit_ok': 0, 'debit_rejected': 0, 'credit_ok': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def worker(kind):
+        with app.app_context():
+            try:
+                if kind == 'debit':
+                    ledger.run_atomic(lambda: ledger.debit(user_id, args.amount, 'stress_debit', description='压力测试扣款'))
+                    key = 'debit_ok'
+                else:
+                    ledger.run_atomic(lambda: ledger.credit(user_id, args.amount, 'stress_credit', description='压力测试入账'))
+                    key = 'credit_ok'
+            except InsufficientCoinsError:
+                key = 'debit_rejected'
+            except Exception as e:
+                print(f'请求失败: {str(e)}')
+                key = 'errors'
+        with lock:
+            counters[key] += 1
+
+    jobs = ['debit'] * args.debits + ['credit'] * args.credits
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        list(executor.map(worker, jobs))
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        balance = db.session.get(User, user_id).coins
+        log_total = db.session.query(func.coalesce(func.sum(CoinLog.amount), 0)).filter_by(user_id=user_id).scalar()
+
+    expected_balance = args.balance + counters['credit_ok'] * args.amount - counters['debit_ok'] * args.amount
+    max_debits = (args.balance + counters['credit_ok'] * args.amount) // args.amount
+
+    print('===== 校园币账本压力测试 =====')
+    print(f"请求总数: {len(jobs)}, 线程数: {args.threads}, 耗时: {elapsed:.2f}s, 吞吐: {len(jobs) / elapsed:.1f} req/s")
+    print(f"扣款成功: {counters['debit_ok']}, 余额不足拒绝: {counters['debit_rejected']}, "
+          f"入账成功: {counters['credit_ok']}, 异常: {counters['errors']}")
+    print(f'最终余额: {balance}, 变动记录合计: {log_total}, 期望余额: {expected_balance}')
+
+    failures = []
+    if balance < 0:
+        failures.append('余额为负数')
+    if balance != expected_balance:
+        failures.append('余额与成功请求不一致')
+    if balance != log_total:
+        failures.append('余额与CoinLog合计不一致')
+    if counters['debit_ok'] > max_debits:
+        failures.append('扣款次数超过余额允许的上限')
+    if counters['errors']:
+        failures.append('存在未预期的异常')
+
+    if failures:
+        print('❌ 测试失败: ' + '；'.join(failures))
+        return 1
+
+    print('✅ 测试通过')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())